@@ -65,6 +65,56 @@ const API = {
       method: 'POST',
       body: JSON.stringify({ bot_id: botId, question })
     });
+  },
+
+  // Chat với RAG backend, nhận câu trả lời dạng stream (NDJSON)
+  // handlers: { onMeta(meta), onToken(text), onDone(done), onError(message) }
+  // signal: AbortSignal để huỷ request (vd. khi gửi câu hỏi mới hoặc rời trang)
+  async streamChat(botId, query, handlers = {}, signal) {
+    const token = await Auth.getToken();
+    const response = await fetch(`${window.CONFIG.api.ragHost}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(token && { 'Authorization': `Bearer ${token}` })
+      },
+      body: JSON.stringify({ bot_id: botId, query }),
+      signal
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({}));
+      throw new Error(error.detail || `HTTP ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    const handleLine = (line) => {
+      if (!line.trim()) return;
+      const event = JSON.parse(line);
+      if (event.type === 'meta' && handlers.onMeta) handlers.onMeta(event);
+      else if (event.type === 'token' && handlers.onToken) handlers.onToken(event.text);
+      else if (event.type === 'done' && handlers.onDone) handlers.onDone(event);
+      else if (event.type === 'error' && handlers.onError) handlers.onError(event.message);
+    };
+
+    try {
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.forEach(handleLine);
+      }
+      handleLine(buffer + decoder.decode());
+    } catch (error) {
+      // Lỗi, sự kiện error hoặc abort: đóng stream để server dừng sinh câu trả lời
+      reader.cancel().catch(() => {});
+      throw error;
+    }
   }
 };
 
@@ -1,6 +1,17 @@
 // Chat page logic
 let botId = '';
 let chatFace = '';
+// AbortController của câu trả lời đang stream
+let streamController = null;
+
+const ERROR_MESSAGE = 'Xin lỗi, có lỗi xảy ra. Vui lòng thử lại.';
+
+// Rời trang chat: huỷ câu trả lời đang stream
+window.addEventListener('pagehide', () => {
+    if (streamController) {
+        streamController.abort();
+    }
+});
 
 document.addEventListener('DOMContentLoaded', async () => {
     await loadConfig();
@@ -50,6 +61,44 @@ function addMessage({ text, isUser }) {
 
     messagesContainer.appendChild(messageDiv);
     messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return messageDiv;
+}
+
+// Stream câu trả lời từ RAG backend vào một message bot
+async function streamDocumentAnswer(message, signal) {
+    const messagesContainer = document.getElementById('chatMessages');
+    let messageText = null;
+    let answer = '';
+
+    const appendText = (text) => {
+        if (!messageText) {
+            hideTyping();
+            messageText = addMessage({ text: '', isUser: false }).querySelector('.message-text');
+        }
+        answer += text;
+        messageText.textContent = answer;
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    };
+
+    try {
+        await API.streamChat(botId, message, {
+            onToken: appendText,
+            onError: (error) => {
+                throw new Error(error);
+            }
+        }, signal);
+    } catch (error) {
+        if (!messageText || error.name === 'AbortError') {
+            throw error;
+        }
+        // Đã hiện một phần câu trả lời: thay nội dung message đó bằng thông báo lỗi
+        messageText.textContent = ERROR_MESSAGE;
+        return;
+    }
+
+    if (!messageText) {
+        throw new Error('Empty response');
+    }
 }
 
 function showTyping() {
@@ -83,6 +132,14 @@ async function sendMessage() {
     
     if (!message || !botId) return;
 
+    // Câu hỏi mới: huỷ câu trả lời trước nếu vẫn đang stream
+    if (streamController) {
+        streamController.abort();
+        hideTyping();
+    }
+    const controller = new AbortController();
+    streamController = controller;
+
     // Add user message
     addMessage({ text: message, isUser: true });
     input.value = '';
@@ -93,6 +150,11 @@ async function sendMessage() {
     showTyping();
 
     try {
+        if (botId !== 'tc' && botId !== 'chung' && window.CONFIG.api.ragHost) {
+            await streamDocumentAnswer(message, controller.signal);
+            return;
+        }
+
         let response;
         
         if (botId === 'tc') {
@@ -119,15 +181,20 @@ async function sendMessage() {
 
         addMessage({ text: answer, isUser: false });
     } catch (error) {
+        if (error.name === 'AbortError') return;
         hideTyping();
         addMessage({ 
-            text: 'Xin lỗi, có lỗi xảy ra. Vui lòng thử lại.', 
+            text: ERROR_MESSAGE, 
             isUser: false 
         });
     } finally {
-        input.disabled = false;
-        document.getElementById('sendButton').disabled = false;
-        input.focus();
+        // Request đã bị thay bởi câu hỏi mới thì để request mới quản lý ô nhập
+        if (streamController === controller) {
+            streamController = null;
+            input.disabled = false;
+            document.getElementById('sendButton').disabled = false;
+            input.focus();
+        }
     }
 }
 
@@ -2,7 +2,8 @@
 window.CONFIG = {
   api: {
     host: "https://chatbot-api-g88f.onrender.com/chat",
-    customHost: "https://7128-113-160-170-187.ngrok-free.app/chat"
+    customHost: "https://7128-113-160-170-187.ngrok-free.app/chat",
+    ragHost: "/api/v1"
   },
   chatbots: []
 };
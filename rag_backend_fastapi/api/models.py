@@ -3,7 +3,14 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
 
-class ChatRequest(BaseModel):
+class SearchFilters(BaseModel):
+    """Optional search scope; every given field must match"""
+    doc_ids: Optional[List[str]] = None
+    file_type: Optional[str] = None
+    owner: Optional[str] = None
+
+
+class ChatRequest(SearchFilters):
     query: str = Field(..., min_length=1)
 
 
@@ -11,12 +18,60 @@ class ChatResponse(BaseModel):
     answer: str
     context_used: bool
     chunks_count: int
+    cached: bool = False
+    context: Optional[Dict[str, int]] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+class SearchBatchRequest(SearchFilters):
+    queries: List[str] = Field(..., min_length=1)
+    top_k: Optional[int] = Field(None, ge=1)
+
+
+class SearchHit(BaseModel):
+    chunk_id: str
+    doc_id: str
+    index: int
+    text: str
+    distance: Optional[float] = None
+    page: Optional[int] = None
+    page_end: Optional[int] = None
+
+
+class SearchResult(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchResult]
+    timings: Optional[Dict[str, float]] = None
 
 
 class UploadResponse(BaseModel):
     doc_id: str
     file_url: str
     chunks_count: int
+    chunks_unchanged: int = 0
+    chunks_deleted: int = 0
+    status: str
+    message: str
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    doc_id: str
+    filename: str
+    status: str
+    chunks_processed: int
+    owner: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class DeleteResponse(BaseModel):
+    doc_id: str
     status: str
     message: str
 
@@ -36,4 +91,16 @@ class HistoryResponse(BaseModel):
 class HealthResponse(BaseModel):
     status: str
     vectorstore: Optional[Dict] = None
+    executor: Optional[Dict] = None
+    embedding: Optional[Dict] = None
+    answer_cache: Optional[Dict] = None
+    llm: Optional[Dict] = None
+    lexical: Optional[Dict] = None
+    rerank: Optional[Dict] = None
+    startup: Optional[Dict] = None
+
+
+class ReadinessResponse(BaseModel):
+    ready: bool
+    startup: Dict
 
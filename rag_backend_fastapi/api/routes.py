@@ -1,87 +1,180 @@
 """API Routes for FastAPI backend"""
+import hashlib
+import json
 import logging
+import os
 import uuid
-from io import BytesIO
-from typing import Optional
+from typing import Dict, List, Optional
 
-import PyPDF2
-import docx
-from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from api.models import (
     ChatRequest,
     ChatResponse,
+    DeleteResponse,
     HealthResponse,
     HistoryResponse,
+    JobResponse,
+    ReadinessResponse,
+    SearchBatchRequest,
+    SearchBatchResponse,
+    SearchFilters,
     UploadResponse,
 )
+from config import settings
+from services.document_loader import DocumentLoader
+from services.embedding_service import EmbeddingService
+from services.executor_service import ExecutorBusyError, ExecutorService
 from services.firebase_service import FirebaseService
-from services.rag_service import RAGService
+from services.job_service import JobService
+from services.lexical_service import LexicalService
+from services.llm_service import LLMError, LLMService, LLMUnavailableError
+from services.metrics import Metrics
+from services.rag_service import DocumentNotFoundError, RAGService
+from services.rerank_service import RerankService
+from services.startup_service import StartupService
 from services.vectorstore_service import VectorstoreService
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.post("/upload-document", response_model=UploadResponse, status_code=201)
-async def upload_document(file: UploadFile = File(...)):
-    """Upload document và xử lý RAG pipeline"""
+def _service_unavailable(error: ExecutorBusyError) -> HTTPException:
+    """Build a 503 response telling the client when to retry"""
+    logger.warning(f"Rejecting request: {str(error)}")
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy. Please retry later.",
+        headers={'Retry-After': str(error.retry_after)}
+    )
+
+
+def _llm_failed(error: LLMError) -> HTTPException:
+    """Map LLM provider failures to 503 (circuit open) or 502 (upstream error)"""
+    if isinstance(error, LLMUnavailableError):
+        return HTTPException(
+            status_code=503,
+            detail="LLM provider is temporarily unavailable. Please retry later.",
+            headers={'Retry-After': str(error.retry_after)}
+        )
+    return HTTPException(status_code=502, detail=f"LLM provider error: {str(error)}")
+
+
+def _file_hash(fileobj) -> str:
+    """SHA-256 of an uploaded file, read in blocks"""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(1024 * 1024), b''):
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+async def _validate_upload(file: UploadFile):
+    """Check file type, size and extractable text; returns (filename, file_type, file_size, content_hash)"""
     if not file.filename:
         raise HTTPException(status_code=400, detail="Filename is required")
     
     filename = file.filename
     file_type = filename.split('.')[-1].lower() if '.' in filename else ''
     
-    allowed_types = ['pdf', 'txt', 'md', 'docx']
+    allowed_types = DocumentLoader.SUPPORTED_TYPES
     if file_type not in allowed_types:
         raise HTTPException(
             status_code=400,
             detail=f"File type '{file_type}' not allowed. Allowed types: {allowed_types}"
         )
     
+    # The upload is already spooled to a temp file; measure it without reading it into memory
+    file.file.seek(0, os.SEEK_END)
+    file_size = file.file.tell()
+    file.file.seek(0)
+    if file_size == 0:
+        raise HTTPException(status_code=400, detail="File is empty")
+    
     try:
-        contents = await file.read()
-        if len(contents) == 0:
-            raise HTTPException(status_code=400, detail="File is empty")
-        
-        file_content = ""
-        
-        try:
-            if file_type == 'pdf':
-                pdf_reader = PyPDF2.PdfReader(BytesIO(contents))
-                file_content = "\n".join([
-                    page.extract_text() for page in pdf_reader.pages if page.extract_text()
-                ])
-            elif file_type in ['txt', 'md']:
-                file_content = contents.decode('utf-8')
-            elif file_type == 'docx':
-                doc = docx.Document(BytesIO(contents))
-                file_content = "\n".join([para.text for para in doc.paragraphs if para.text])
-        except Exception as e:
-            logger.error(f"Error reading file content: {str(e)}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Could not read file content: {str(e)}"
-            )
+        has_text = await ExecutorService.run_cpu(DocumentLoader.has_text, file.file, file_type)
+    except ExecutorBusyError:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading file content: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Could not read file content: {str(e)}"
+        )
+    
+    if not has_text:
+        raise HTTPException(
+            status_code=400,
+            detail="File is empty or could not extract text content"
+        )
+    
+    content_hash = await ExecutorService.run_io(_file_hash, file.file)
+    return filename, file_type, file_size, content_hash
+
+
+def _job_response(job: Dict) -> JobResponse:
+    return JobResponse(
+        job_id=job['id'],
+        doc_id=job['doc_id'],
+        filename=job['filename'],
+        status=job['status'],
+        chunks_processed=job['chunks_processed'],
+        owner=job.get('owner'),
+        error=job['error'],
+        created_at=job['created_at'],
+        updated_at=job['updated_at']
+    )
+
+
+@router.post("/upload-document", response_model=UploadResponse, status_code=201)
+async def upload_document(
+    file: UploadFile = File(...),
+    owner: Optional[str] = Form(None),
+    doc_id: Optional[str] = Form(None)
+):
+    """Upload document và xử lý RAG pipeline; `doc_id` cập nhật document đã có"""
+    try:
+        filename, file_type, file_size, content_hash = await _validate_upload(file)
         
-        if not file_content.strip():
-            raise HTTPException(
-                status_code=400,
-                detail="File is empty or could not extract text content"
+        duplicate, previous = await RAGService.find_existing_document(content_hash, owner or None, doc_id or None)
+        if duplicate is not None:
+            logger.info(f"Upload of {filename} is identical to document {duplicate['doc_id']}; skipped")
+            return UploadResponse(
+                doc_id=duplicate['doc_id'],
+                file_url=duplicate.get('file_url', ''),
+                chunks_count=duplicate.get('chunks_count', 0),
+                chunks_unchanged=duplicate.get('chunks_count', 0),
+                status='unchanged',
+                message='Identical document already uploaded; nothing was re-processed'
             )
         
-        file.file.seek(0)
-        file_url = FirebaseService.upload_file(file.file, filename)
-        doc_id = str(uuid.uuid4())
+        file_url = await ExecutorService.run_io(FirebaseService.upload_file, file.file, filename)
+        # A replacing upload keeps the document ID
+        doc_id = previous['doc_id'] if previous is not None else str(uuid.uuid4())
         
         metadata = {
             'filename': filename,
             'file_type': file_type,
-            'file_size': len(contents)
+            'file_size': file_size
         }
+        if owner:
+            metadata['owner'] = owner
         
-        FirebaseService.save_document_metadata(doc_id, file_url, metadata)
-        result = RAGService.process_document(file_content, doc_id, metadata)
+        async with RAGService.document_lock(doc_id):
+            await ExecutorService.run_io(
+                FirebaseService.save_document_metadata, doc_id, file_url, metadata
+            )
+            file.file.seek(0)
+            segments = DocumentLoader.iter_text(file.file, file_type)
+            result = await RAGService.process_document(segments, doc_id, metadata)
+            # Only a fully processed document is matched by later identical uploads
+            await ExecutorService.run_io(
+                FirebaseService.update_document_metadata,
+                doc_id,
+                {'content_hash': content_hash, 'chunks_count': result['chunks_count']}
+            )
         
         logger.info(f"Document uploaded successfully: {doc_id} ({result['chunks_count']} chunks)")
         
@@ -89,11 +182,20 @@ async def upload_document(file: UploadFile = File(...)):
             doc_id=doc_id,
             file_url=file_url,
             chunks_count=result['chunks_count'],
-            status='success',
-            message='Document uploaded and processed successfully'
+            chunks_unchanged=result['chunks_unchanged'],
+            chunks_deleted=result['chunks_deleted'],
+            status='updated' if previous is not None else 'success',
+            message=(
+                'Document updated; only changed chunks were re-processed' if previous is not None
+                else 'Document uploaded and processed successfully'
+            )
         )
     except HTTPException:
         raise
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -102,9 +204,90 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Chat với RAG"""
+@router.post("/upload-document/async", response_model=JobResponse, status_code=202)
+async def upload_document_async(
+    file: UploadFile = File(...),
+    owner: Optional[str] = Form(None),
+    doc_id: Optional[str] = Form(None)
+):
+    """Upload document và xử lý RAG pipeline trong nền; theo dõi qua /jobs/{job_id}"""
+    try:
+        filename, file_type, file_size, content_hash = await _validate_upload(file)
+        job = await JobService.submit(
+            file.file,
+            filename,
+            file_type,
+            file_size,
+            owner=owner or None,
+            content_hash=content_hash,
+            doc_id=doc_id or None
+        )
+        return _job_response(job)
+    except HTTPException:
+        raise
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error queueing document: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error queueing document: {str(e)}"
+        )
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """Trạng thái job xử lý document"""
+    try:
+        job = await ExecutorService.run_io(JobService.get_job, job_id)
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return _job_response(job)
+
+
+@router.delete("/documents/{doc_id}", response_model=DeleteResponse)
+async def delete_document(doc_id: str):
+    """Xóa document khỏi Firestore, ChromaDB và Storage"""
+    try:
+        deleted = await RAGService.delete_document(doc_id)
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error deleting document {doc_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error deleting document: {str(e)}"
+        )
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Document '{doc_id}' not found")
+    
+    return DeleteResponse(
+        doc_id=doc_id,
+        status='deleted',
+        message='Document and its chunks deleted successfully'
+    )
+
+
+def _search_filters(request: SearchFilters) -> Optional[Dict[str, List[str]]]:
+    """Vector store filter from the request scope (None searches everything)"""
+    filters = {}
+    if request.doc_ids:
+        filters['doc_id'] = list(dict.fromkeys(request.doc_ids))
+    if request.file_type:
+        filters['file_type'] = [request.file_type.lower().lstrip('.')]
+    if request.owner:
+        filters['owner'] = [request.owner]
+    return filters or None
+
+
+def _validate_query(request: ChatRequest) -> str:
+    """Strip and validate the chat query"""
     query = request.query.strip()
     
     if not query:
@@ -115,16 +298,30 @@ async def chat(request: ChatRequest):
             status_code=400,
             detail="Query is too long. Maximum length is 5000 characters"
         )
+    return query
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Chat với RAG"""
+    query = _validate_query(request)
     
     try:
         logger.info(f"Processing chat query: {query[:100]}...")
-        result = RAGService.query_rag(query)
+        result = await RAGService.query_rag(query, _search_filters(request))
         
         return ChatResponse(
             answer=result['answer'],
             context_used=result['context_used'],
-            chunks_count=result.get('chunks_count', 0)
+            chunks_count=result.get('chunks_count', 0),
+            cached=result.get('cached', False),
+            context=result.get('context'),
+            timings=result.get('timings')
         )
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    except LLMError as e:
+        raise _llm_failed(e)
     except Exception as e:
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -133,11 +330,82 @@ async def chat(request: ChatRequest):
         )
 
 
+@router.post("/search/batch", response_model=SearchBatchResponse)
+async def search_batch(request: SearchBatchRequest):
+    """Tìm kiếm nhiều câu hỏi cùng lúc, trả về top-k chunks kèm distance cho từng câu"""
+    if len(request.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries. Maximum is {settings.SEARCH_BATCH_MAX_QUERIES} per request"
+        )
+    
+    queries = [query.strip() for query in request.queries]
+    if any(not query for query in queries):
+        raise HTTPException(status_code=400, detail="Queries must not be empty")
+    if any(len(query) > 5000 for query in queries):
+        raise HTTPException(
+            status_code=400,
+            detail="Query is too long. Maximum length is 5000 characters"
+        )
+    top_k = min(request.top_k or settings.TOP_K_CHUNKS, settings.SEARCH_MAX_TOP_K)
+    
+    try:
+        result = await RAGService.search_batch(queries, top_k, _search_filters(request))
+        return SearchBatchResponse(**result)
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error processing batch search: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch search: {str(e)}"
+        )
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """Chat với RAG, trả về NDJSON: meta → token... → done"""
+    query = _validate_query(request)
+    logger.info(f"Processing streaming chat query: {query[:100]}...")
+    events = RAGService.stream_rag(query, _search_filters(request))
+    
+    # Run retrieval before sending headers so overload and errors still map to HTTP status codes
+    try:
+        first_event = await events.__anext__()
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
+    except Exception as e:
+        logger.error(f"Error processing query: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing query: {str(e)}"
+        )
+    
+    async def ndjson():
+        try:
+            yield json.dumps(first_event, ensure_ascii=False) + "\n"
+            async for event in events:
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, stopping chat stream")
+                    break
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        except ExecutorBusyError as e:
+            yield json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False) + "\n"
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @router.get("/history", response_model=HistoryResponse)
 async def get_history(limit: int = Query(50, ge=1, le=100)):
     """Lấy lịch sử chat từ Firestore"""
     try:
-        history_data = FirebaseService.get_chat_history(limit=limit)
+        history_data = await ExecutorService.run_io(FirebaseService.get_chat_history, limit=limit)
         history_items = []
         
         for item in history_data:
@@ -157,6 +425,8 @@ async def get_history(limit: int = Query(50, ge=1, le=100)):
         
         logger.info(f"Retrieved {len(history_items)} history items")
         return HistoryResponse(history=history_items, count=len(history_items))
+    except ExecutorBusyError as e:
+        raise _service_unavailable(e)
     except Exception as e:
         logger.error(f"Error fetching history: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -165,12 +435,41 @@ async def get_history(limit: int = Query(50, ge=1, le=100)):
         )
 
 
-@router.get("/health", response_model=HealthResponse)
+@router.get("/health", response_model=HealthResponse, responses={503: {"model": HealthResponse}})
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint (liveness: answers while the models are still warming up, 503 once warm-up failed)"""
+    if not StartupService.is_live():
+        response = HealthResponse(status='unhealthy', startup=StartupService.status())
+        return JSONResponse(status_code=503, content=response.model_dump())
     try:
-        stats = VectorstoreService.get_collection_stats()
-        return HealthResponse(status='healthy', vectorstore=stats)
+        # Takes the collection pool lock and counts every open collection
+        stats = await ExecutorService.run_io(VectorstoreService.get_collection_stats)
+        answer_cache = RAGService.get_answer_cache()
+        return HealthResponse(
+            status='healthy',
+            vectorstore=stats,
+            executor=ExecutorService.get_stats(),
+            embedding=EmbeddingService.get_stats(),
+            answer_cache=answer_cache.stats() if answer_cache else None,
+            llm=LLMService.get_stats(),
+            lexical=LexicalService.get_stats(),
+            rerank=RerankService.get_stats(),
+            startup=StartupService.status()
+        )
     except Exception as e:
         return HealthResponse(status='error', vectorstore={'error': str(e)})
 
+
+@router.get("/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check():
+    """Readiness endpoint: 200 once startup warm-up has finished, 503 before (or if it failed)"""
+    response = ReadinessResponse(ready=StartupService.is_ready(), startup=StartupService.status())
+    if not response.ready:
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """In-process latency histograms and counters"""
+    return Metrics.snapshot()
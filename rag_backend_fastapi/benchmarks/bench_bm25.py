@@ -0,0 +1,95 @@
+"""Benchmark the BM25 index: incremental indexing throughput, query latency, reload time and size
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_bm25.py --chunks 100000
+    python benchmarks/bench_bm25.py --chunks 500000 --batch 64 --queries 200
+
+Chunks are synthetic ~150-token texts drawn from a Zipf-distributed vocabulary, added in
+ingestion-sized batches the way RAGService.process_document does.
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.bm25_index import BM25Index  # noqa: E402
+
+SYLLABLES = ['mã', 'số', 'thuế', 'hợp', 'đồng', 'khách', 'hàng', 'dữ', 'liệu', 'hệ', 'thống', 'quy', 'định']
+
+
+def make_vocabulary(size: int, rng) -> list:
+    words = [f"{rng.choice(SYLLABLES)}{i}" for i in range(size)]
+    return words
+
+
+def make_texts(rng, vocabulary, count: int, length: int):
+    ranks = np.minimum(rng.zipf(1.2, size=(count, length)), len(vocabulary)) - 1
+    return [' '.join(vocabulary[rank] for rank in row) for row in ranks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=100000)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--length', type=int, default=150)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    workdir = Path(tempfile.mkdtemp(prefix="bench-bm25-"))
+    try:
+        index = BM25Index(workdir)
+        started = time.perf_counter()
+        for start in range(0, args.chunks, args.batch):
+            count = min(args.batch, args.chunks - start)
+            texts = make_texts(rng, vocabulary, count, args.length)
+            ids = [f"doc{(start + i) // 500}_{start + i}" for i in range(count)]
+            metadatas = [{'doc_id': chunk_id.split('_')[0], 'owner': f"user{(start + i) % 10}"} for i, chunk_id in enumerate(ids)]
+            index.add(ids, texts, metadatas)
+        build_seconds = time.perf_counter() - started
+        index.close()
+
+        started = time.perf_counter()
+        index = BM25Index(workdir)
+        reload_seconds = time.perf_counter() - started
+        stats = index.stats()
+
+        # Queries mix common and rare terms, like a question naming a specific code
+        queries = [
+            ' '.join(vocabulary[rank] for rank in rng.integers(0, 200, size=3))
+            + ' ' + vocabulary[int(rng.integers(1000, args.vocabulary))]
+            for _ in range(args.queries)
+        ]
+        for label, where in (('all', None), ('owner', {'owner': ['user3']})):
+            index.search(queries[0], args.top_k, where)
+            latencies = []
+            for query in queries:
+                query_started = time.perf_counter()
+                index.search(query, args.top_k, where)
+                latencies.append((time.perf_counter() - query_started) * 1000)
+            print(f"query[{label:<5}] p50={statistics.median(latencies):7.2f}ms  "
+                  f"p99={sorted(latencies)[int(len(latencies) * 0.99) - 1]:7.2f}ms")
+        index.close()
+
+        disk_bytes = sum(path.stat().st_size for path in workdir.iterdir())
+        print(f"chunks={args.chunks:,} batch={args.batch}  index={build_seconds:6.1f}s "
+              f"({args.chunks / build_seconds:,.0f} chunks/s)  reload={reload_seconds:5.2f}s")
+        print(f"terms={stats['terms']:,} segments={stats['segments']} postings={stats['postings']:,} "
+              f"postings={stats['postings_bytes'] / 1e6:.1f}MB  disk={disk_bytes / 1e6:.1f}MB (incl. chunk log)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark bulk chunk embedding throughput versus encoding worker processes
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_embedding.py --texts 4096 --processes 0,4,8,16
+    python benchmarks/bench_embedding.py --texts 4096 --processes 0,8 --batch-sizes 16,32,64
+
+Texts are chunk-like passages of varying length (a quarter to all of CHUNK_SIZE). Each
+configuration embeds them with EmbeddingService.generate_embeddings_batch; worker
+processes are started and warmed up before timing. "baseline" is the previous call:
+model.encode with default arguments followed by .tolist().
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.embedding_service import EmbeddingService  # noqa: E402
+
+PASSAGE = (
+    "FastAPI là một web framework hiện đại cho Python, dùng type hints để kiểm tra dữ liệu "
+    "và tự động sinh tài liệu OpenAPI. Ứng dụng chạy trên Uvicorn, một ASGI server hiệu năng cao. "
+)
+
+
+def make_texts(count: int, max_chars: int, rng: random.Random):
+    corpus = PASSAGE * (max_chars // len(PASSAGE) + 2)
+    texts = []
+    for i in range(count):
+        start = rng.randrange(len(PASSAGE))
+        texts.append(f"{i} " + corpus[start:start + rng.randint(max_chars // 4, max_chars)])
+    return texts
+
+
+def timed(func, texts, repeats: int) -> float:
+    seconds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(texts)
+        seconds.append(time.perf_counter() - started)
+    return min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--texts', type=int, default=4096)
+    parser.add_argument('--chars', type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument('--processes', default='0,2,4,8')
+    parser.add_argument('--batch-sizes', default=str(settings.EMBEDDING_ENCODE_BATCH_SIZE))
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.chars, random.Random(args.seed))
+    model = EmbeddingService.get_model()
+    print(f"model={settings.EMBEDDING_MODEL} texts={len(texts):,} chars<={args.chars}")
+
+    def baseline(batch):
+        return model.encode(batch, convert_to_numpy=True, show_progress_bar=False).tolist()
+
+    baseline(texts[:64])
+    seconds = timed(baseline, texts, args.repeats)
+    print(f"  {'baseline':<24} {len(texts) / seconds:9.1f} chunks/s")
+
+    for processes in (int(value) for value in args.processes.split(',')):
+        for batch_size in (int(value) for value in args.batch_sizes.split(',')):
+            EmbeddingService.shutdown()
+            settings.EMBEDDING_PROCESSES = processes
+            settings.EMBEDDING_ENCODE_BATCH_SIZE = batch_size
+            # Starts the workers and loads their models
+            EmbeddingService.generate_embeddings_batch(texts[:max(processes, 1) * batch_size])
+            seconds = timed(EmbeddingService.generate_embeddings_batch, texts, args.repeats)
+            label = f"processes={processes} batch={batch_size}"
+            print(f"  {label:<24} {len(texts) / seconds:9.1f} chunks/s")
+    EmbeddingService.shutdown()
+
+
+if __name__ == '__main__':
+    main()
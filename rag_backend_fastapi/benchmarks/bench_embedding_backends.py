@@ -0,0 +1,127 @@
+"""Benchmark embedding backends: parity with the PyTorch model, query latency and bulk throughput
+
+Usage (from rag_backend_fastapi/):
+    python export_onnx.py   # once, writes EMBEDDING_ONNX_PATH
+    python benchmarks/bench_embedding_backends.py
+    python benchmarks/bench_embedding_backends.py --backends torch,onnx-int8 --texts 2048 --min-cosine 0.99
+
+Every backend embeds the same chunk-like texts and short queries. Parity is measured against
+"torch": the mean and minimum cosine between a backend's vectors and the PyTorch ones, and how
+many of each query's top-10 texts it ranks the same. The script exits with status 1 when a
+backend's mean cosine is below --min-cosine. Latency is one query per encode call (p50/p95);
+throughput embeds all texts with EMBEDDING_ENCODE_BATCH_SIZE.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.embedding_backends import load_embedding_model  # noqa: E402
+
+PASSAGE = (
+    "FastAPI là một web framework hiện đại cho Python, dùng type hints để kiểm tra dữ liệu "
+    "và tự động sinh tài liệu OpenAPI. Ứng dụng chạy trên Uvicorn, một ASGI server hiệu năng cao. "
+)
+TOP_K = 10
+
+
+def make_texts(count: int, min_chars: int, max_chars: int, rng: random.Random):
+    corpus = PASSAGE * (max_chars // len(PASSAGE) + 2)
+    texts = []
+    for i in range(count):
+        start = rng.randrange(len(PASSAGE))
+        texts.append(f"{i} " + corpus[start:start + rng.randint(min_chars, max_chars)])
+    return texts
+
+
+def encode(model, texts):
+    embeddings = model.encode(
+        texts,
+        batch_size=settings.EMBEDDING_ENCODE_BATCH_SIZE,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def top_k(queries: np.ndarray, texts: np.ndarray) -> np.ndarray:
+    return np.argsort(-(normalized(queries) @ normalized(texts).T), axis=1)[:, :TOP_K]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='torch,onnx,onnx-int8')
+    parser.add_argument('--texts', type=int, default=1024)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--chars', type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument('--min-cosine', type=float, default=0.98)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    texts = make_texts(args.texts, args.chars // 4, args.chars, rng)
+    queries = make_texts(args.queries, 20, 80, rng)
+    backends = args.backends.split(',')
+    if 'torch' in backends:
+        # The reference goes first
+        backends.remove('torch')
+        backends.insert(0, 'torch')
+    print(f"model={settings.EMBEDDING_MODEL} texts={len(texts):,} queries={len(queries):,} "
+          f"batch={settings.EMBEDDING_ENCODE_BATCH_SIZE}")
+
+    reference = None
+    failed = False
+    for backend in backends:
+        started = time.perf_counter()
+        model = load_embedding_model(backend)
+        load_seconds = time.perf_counter() - started
+        encode(model, texts[:64])
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            started = time.perf_counter()
+            query_vectors.append(encode(model, [query])[0])
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_vectors = np.stack(query_vectors)
+
+        started = time.perf_counter()
+        text_vectors = encode(model, texts)
+        seconds = time.perf_counter() - started
+
+        print(f"  {backend:<10} load={load_seconds:5.1f}s  query p50={np.percentile(latencies, 50):6.2f}ms "
+              f"p95={np.percentile(latencies, 95):6.2f}ms  bulk={len(texts) / seconds:8.1f} chunks/s")
+
+        if reference is None:
+            if backend == 'torch':
+                reference = (text_vectors, query_vectors, top_k(query_vectors, text_vectors))
+            continue
+        ref_texts, ref_queries, ref_top = reference
+        cosines = np.concatenate([
+            np.sum(normalized(text_vectors) * normalized(ref_texts), axis=1),
+            np.sum(normalized(query_vectors) * normalized(ref_queries), axis=1)
+        ])
+        ranked = top_k(query_vectors, text_vectors)
+        overlap = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(ranked, ref_top)])
+        status = 'ok' if cosines.mean() >= args.min_cosine else 'FAIL'
+        failed = failed or status == 'FAIL'
+        print(f"  {'':<10} vs torch: cosine mean={cosines.mean():.5f} min={cosines.min():.5f}  "
+              f"top-{TOP_K} overlap={overlap:.1%}  {status}")
+
+    if reference is None:
+        print("  (parity skipped: include torch in --backends)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
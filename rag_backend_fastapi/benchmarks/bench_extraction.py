@@ -0,0 +1,130 @@
+"""Benchmark PDF text extraction: old double extraction vs single pass vs process pool
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_extraction.py --pages 400 --processes 4
+    python benchmarks/bench_extraction.py --pdf path/to/file.pdf
+
+Without --pdf a text-only PDF with the requested number of pages is generated.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import PyPDF2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = (
+    "tài liệu hệ thống truy xuất câu hỏi trả lời mô hình ngôn ngữ dữ liệu vector "
+    "retrieval augmented generation embedding chunk context document page index"
+).split()
+
+
+def build_pdf(pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+    """Write a minimal PDF with Helvetica text lines on every page"""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page in range(pages):
+        lines = [f"Page {page + 1}."] + [
+            ' '.join(rng.choice(WORDS) for _ in range(12)).encode('ascii', 'ignore').decode() + '.'
+            for _ in range(lines_per_page)
+        ]
+        text_ops = ''.join(
+            f"({line.replace('(', '').replace(')', '')}) '\n" for line in lines
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td\n{text_ops}ET".encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_num = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_num
+        )
+        page_refs.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [" + b" ".join(page_refs) + b"] /Count %d >>" % pages
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+    xref_offset = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset))
+    return out.getvalue()
+
+
+def timed(label: str, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed:8.2f}s")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pdf', type=str, default=None)
+    parser.add_argument('--pages', type=int, default=400)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    os.environ['EXTRACTION_PROCESSES'] = str(args.processes)
+    os.environ['PDF_PARALLEL_MIN_PAGES'] = '1'
+    from services.document_loader import DocumentLoader  # noqa: E402
+
+    if args.pdf:
+        path = args.pdf
+    else:
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+            temp_file.write(build_pdf(args.pages))
+            path = temp_file.name
+
+    try:
+        with open(path, 'rb') as fileobj:
+            page_count = len(PyPDF2.PdfReader(fileobj).pages)
+        print(f"pdf={path} pages={page_count} size={os.path.getsize(path) / 1e6:.1f}MB processes={args.processes}")
+
+        def double_extraction():
+            # Previous upload path: extract_text() in the filter and again for the value
+            with open(path, 'rb') as fileobj:
+                pdf_reader = PyPDF2.PdfReader(fileobj)
+                return "\n".join(page.extract_text() for page in pdf_reader.pages if page.extract_text())
+
+        def single_pass():
+            with open(path, 'rb') as fileobj:
+                return [segment.text for segment in DocumentLoader.iter_text(fileobj, 'pdf', parallel=False)]
+
+        def process_pool():
+            with open(path, 'rb') as fileobj:
+                return [segment.text for segment in DocumentLoader.iter_text(fileobj, 'pdf')]
+
+        _, double_time = timed('double extraction (old)', double_extraction)
+        serial, serial_time = timed('single pass', single_pass)
+        # First pool run pays for spawning workers; time a warm run as well
+        _, cold_time = timed('process pool (cold)', process_pool)
+        parallel, warm_time = timed('process pool (warm)', process_pool)
+        DocumentLoader.shutdown()
+
+        print(f"  same text and page order: {serial == parallel}")
+        print(f"  speedup vs old: single={double_time / serial_time:.2f}x "
+              f"pool={double_time / warm_time:.2f}x (cold {double_time / cold_time:.2f}x)")
+    finally:
+        if not args.pdf:
+            os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Benchmark the Firestore side of ingestion: write + read-back of chunk IDs vs a single write pass
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_ingestion.py --chunks 1000 --rtt-ms 25 --bandwidth-mbps 20
+
+Firestore is replaced by an in-memory client that sleeps for one round trip per RPC
+plus the payload size over the given bandwidth, so results model network cost only.
+"""
+import argparse
+import itertools
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+
+# Firestore streams query results in pages of roughly this many documents
+QUERY_PAGE_SIZE = 300
+_auto_ids = itertools.count()
+
+
+def doc_size(data: dict) -> int:
+    """Approximate wire size: 9 bytes per double, UTF-8 length for strings"""
+    size = 0
+    for key, value in data.items():
+        size += len(key)
+        if isinstance(value, list):
+            size += 9 * len(value)
+        elif isinstance(value, str):
+            size += len(value.encode('utf-8'))
+        else:
+            size += 8
+    return size
+
+
+class FakeNetwork:
+    def __init__(self, rtt_ms: float, bandwidth_mbps: float):
+        self.rtt = rtt_ms / 1000.0
+        self.bytes_per_second = bandwidth_mbps * 1e6
+        self.rpcs = 0
+        self.bytes = 0
+
+    def call(self, payload_bytes: int, round_trips: int = 1):
+        self.rpcs += round_trips
+        self.bytes += payload_bytes
+        time.sleep(self.rtt * round_trips + payload_bytes / self.bytes_per_second)
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: dict):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeDocument:
+    def __init__(self, doc_id: str):
+        self.id = doc_id
+        self.path = f"chunks/{doc_id}"
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append((ref.id, data))
+
+    def commit(self):
+        self._db.network.call(sum(doc_size(data) for _, data in self._writes))
+        self._db.docs.update(self._writes)
+
+
+class FakeQuery:
+    def __init__(self, db, doc_id: str):
+        self._db = db
+        self._doc_id = doc_id
+
+    def order_by(self, field):
+        return self
+
+    def stream(self):
+        matches = sorted(
+            ((doc_id, data) for doc_id, data in self._db.docs.items() if data['doc_id'] == self._doc_id),
+            key=lambda item: item[1]['index']
+        )
+        pages = max(1, -(-len(matches) // QUERY_PAGE_SIZE))
+        self._db.network.call(sum(doc_size(data) for _, data in matches), round_trips=pages)
+        return [FakeSnapshot(doc_id, data) for doc_id, data in matches]
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self._db = db
+
+    def document(self, doc_id: str = None):
+        return FakeDocument(doc_id or f"auto{next(_auto_ids):020d}")
+
+    def where(self, field, op, value):
+        return FakeQuery(self._db, value)
+
+
+class FakeFirestore:
+    def __init__(self, network: FakeNetwork):
+        self.network = network
+        self.docs = {}
+
+    def collection(self, name):
+        return FakeCollection(self)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def make_chunks(count: int, dimension: int):
+    text = "Nội dung chunk mẫu cho benchmark ingestion. " * 22
+    vector = [0.125] * dimension
+    return [{'text': text[:settings.CHUNK_SIZE], 'vector': vector} for _ in range(count)]
+
+
+def ingest(chunks, read_back: bool) -> float:
+    doc_id = f"bench-{next(_auto_ids)}"
+    started = time.perf_counter()
+    for start in range(0, len(chunks), settings.INGEST_BATCH_SIZE):
+        FirebaseService.save_chunks(doc_id, chunks[start:start + settings.INGEST_BATCH_SIZE], start)
+    if read_back:
+        # Previous flow: stream every chunk (vectors included) back to learn its ID
+        chunk_ids = [snapshot.id for snapshot in FirebaseService.get_db().collection('chunks')
+                     .where('doc_id', '==', doc_id).order_by('index').stream()]
+        assert len(chunk_ids) == len(chunks)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=1000)
+    parser.add_argument('--rtt-ms', type=float, default=25.0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=20.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    network = FakeNetwork(args.rtt_ms, args.bandwidth_mbps)
+    FirebaseService._db = FakeFirestore(network)
+    FirebaseService._initialized = True
+    chunks = make_chunks(args.chunks, settings.EMBEDDING_DIMENSION)
+
+    print(f"chunks={args.chunks} batch={settings.INGEST_BATCH_SIZE} rtt={args.rtt_ms}ms "
+          f"bandwidth={args.bandwidth_mbps}MB/s")
+    results = {}
+    for label, read_back in (('write + read-back (old)', True), ('single write pass', False)):
+        network.rpcs = network.bytes = 0
+        elapsed = min(ingest(chunks, read_back) for _ in range(args.repeat))
+        rpcs, transferred = network.rpcs // args.repeat, network.bytes // args.repeat
+        results[label] = elapsed
+        print(f"  {label:<26} {elapsed:7.3f}s  rpcs={rpcs} transferred={transferred / 1e6:.1f}MB")
+
+    old, new = results.values()
+    print(f"  saved per 1,000 chunks: {(old - new) * 1000 / args.chunks * 1000:.0f}ms "
+          f"({(1 - new / old) * 100:.0f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark LLMService throughput against the local fake LLM (no network)
+
+Usage (from rag_backend_fastapi/):
+    LLM_BACKEND=fake python benchmarks/bench_llm.py --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+from services.llm_service import LLMService  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(mode: str, total: int, concurrency: int):
+    gate = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with gate:
+            started = time.perf_counter()
+            prompt = f"Context:\n...\n\nQuestion: câu hỏi số {i}\n\nAnswer:"
+            if mode == 'stream':
+                async for _ in LLMService.stream(prompt):
+                    pass
+            else:
+                await LLMService.generate(prompt)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(f"mode={mode} requests={total} concurrency={concurrency}")
+    print(f"  throughput: {total / elapsed:.1f} req/s")
+    print(f"  latency ms: p50={statistics.median(latencies):.1f} "
+          f"p99={percentile(latencies, 99):.1f} max={max(latencies):.1f}")
+    print(f"  llm stats: {LLMService.get_stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--mode', choices=['generate', 'stream'], default='generate')
+    args = parser.parse_args()
+    asyncio.run(run(args.mode, args.requests, args.concurrency))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark re-ingesting an edited document with and without content-hash deduplication
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_reingest.py --chunks 2000 --edit 0.05
+
+A synthetic document is ingested with RAGService.process_document into a temporary NumPy
+vector store and BM25 index, then processed again unchanged and with a fraction of its
+sentences rewritten. Firestore writes are left out (bench_ingestion.py measures them).
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.embedding_service import EmbeddingService  # noqa: E402
+from services.firebase_service import FirebaseService  # noqa: E402
+from services.lexical_service import LexicalService  # noqa: E402
+from services.rag_service import RAGService  # noqa: E402
+from services.vectorstore_service import VectorstoreService  # noqa: E402
+
+WORDS = ['trí', 'tuệ', 'nhân', 'tạo', 'dữ', 'liệu', 'mô', 'hình', 'học', 'máy', 'FastAPI',
+         'embedding', 'vector', 'truy', 'xuất', 'ngữ', 'cảnh', 'câu', 'trả', 'lời']
+
+
+def make_sentences(count: int, rng: random.Random):
+    return [' '.join(rng.choices(WORDS, k=rng.randint(8, 20))).capitalize() + '.' for _ in range(count)]
+
+
+def edit(sentences, fraction: float, rng: random.Random):
+    edited = list(sentences)
+    for idx in rng.sample(range(len(sentences)), int(len(sentences) * fraction)):
+        edited[idx] = make_sentences(1, rng)[0]
+    return edited
+
+
+def to_segments(sentences):
+    # One paragraph per 5 sentences, fed as a single text segment
+    paragraphs = [' '.join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+    return [('\n\n'.join(paragraphs), None)]
+
+
+class EmbedCounter:
+    """Counts texts that actually go through the embedding model"""
+
+    def __init__(self):
+        self.texts = 0
+        self._generate = EmbeddingService.generate_embeddings_batch
+
+    def __call__(self, texts):
+        self.texts += len(texts)
+        return self._generate(texts)
+
+
+async def process(label: str, doc_id: str, sentences, counter: EmbedCounter):
+    counter.texts = 0
+    started = time.perf_counter()
+    result = await RAGService.process_document(to_segments(sentences), doc_id, {'file_type': 'txt'})
+    seconds = time.perf_counter() - started
+    print(f"  {label:<16} {seconds:7.2f}s  chunks={result['chunks_count']:>6,}  "
+          f"embedded={counter.texts:>6,}  unchanged={result['chunks_unchanged']:>6,}  "
+          f"deleted={result['chunks_deleted']:>4,}")
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    # Roughly CHUNK_SIZE characters per chunk, ~90 characters per sentence
+    sentences = make_sentences(args.chunks * settings.CHUNK_SIZE // 90, rng)
+    edited = edit(sentences, args.edit, rng)
+    truncated = edited[:int(len(edited) * 0.9)]
+    counter = EmbedCounter()
+    EmbeddingService.generate_embeddings_batch = counter
+    EmbeddingService.get_model()
+
+    for dedup in (False, True):
+        settings.INGEST_DEDUP_ENABLED = dedup
+        settings.CHUNK_VECTOR_CACHE_ENABLED = dedup
+        print(f"dedup={'on' if dedup else 'off'}")
+        doc_id = f"bench-{int(dedup)}"
+        await process('initial', doc_id, sentences, counter)
+        await process('unchanged', doc_id, sentences, counter)
+        await process(f"edited {args.edit:.1%}", doc_id, edited, counter)
+        await process('edited + cut 10%', doc_id, truncated, counter)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunks', type=int, default=2000)
+    parser.add_argument('--edit', type=float, default=0.05, help="fraction of sentences rewritten")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-reingest-"))
+    settings.VECTOR_BACKEND = 'numpy'
+    settings.NUMPY_INDEX_PATH = workdir / 'numpy_index'
+    settings.BM25_INDEX_PATH = workdir / 'bm25_index'
+    settings.CHUNK_VECTOR_CACHE_PATH = workdir / 'chunk_vectors.sqlite3'
+    settings.ANSWER_CACHE_ENABLED = False
+    FirebaseService.save_chunks = classmethod(lambda cls, *args: [])
+    FirebaseService.delete_chunks = classmethod(lambda cls, *args: None)
+
+    print(f"chunks~{args.chunks:,} chunk_size={settings.CHUNK_SIZE} batch={settings.INGEST_BATCH_SIZE} "
+          f"backend=numpy")
+    try:
+        asyncio.run(run(args))
+    finally:
+        VectorstoreService.shutdown()
+        LexicalService.shutdown()
+        EmbeddingService.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Benchmark cross-encoder rerank latency per request, to size RERANK_BUDGET_MS
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_rerank.py --candidates 10,20,40
+    python benchmarks/bench_rerank.py --model cross-encoder/mmarco-mMiniLMv2-L12-H384-v1 --max-length 512
+
+Each request scores one query against N chunk-sized passages in a single batch, as
+RerankService.score does.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.rerank_service import RerankService  # noqa: E402
+
+PASSAGE = (
+    "FastAPI là một web framework hiện đại cho Python, dùng type hints để kiểm tra dữ liệu "
+    "và tự động sinh tài liệu OpenAPI. Ứng dụng chạy trên Uvicorn, một ASGI server hiệu năng cao. "
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=settings.RERANK_MODEL)
+    parser.add_argument('--candidates', default='10,20,40')
+    parser.add_argument('--chunk-chars', type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument('--max-length', type=int, default=settings.RERANK_MAX_LENGTH)
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+
+    settings.RERANK_MODEL = args.model
+    settings.RERANK_MAX_LENGTH = args.max_length
+    started = time.perf_counter()
+    RerankService.get_model()
+    print(f"model={args.model} max_length={args.max_length} load={time.perf_counter() - started:.1f}s")
+
+    passage = (PASSAGE * (args.chunk_chars // len(PASSAGE) + 1))[:args.chunk_chars]
+    query = "Uvicorn là gì và chạy FastAPI như thế nào?"
+    for count in (int(value) for value in args.candidates.split(',')):
+        texts = [f"{i} {passage}" for i in range(count)]
+        RerankService.score(query, texts)
+        latencies = []
+        for _ in range(args.requests):
+            request_started = time.perf_counter()
+            RerankService.score(query, texts)
+            latencies.append((time.perf_counter() - request_started) * 1000)
+        latencies.sort()
+        print(f"  candidates={count:<4} p50={statistics.median(latencies):8.1f}ms  "
+              f"p95={latencies[int(len(latencies) * 0.95) - 1]:8.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
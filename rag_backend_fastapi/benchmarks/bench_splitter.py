@@ -0,0 +1,93 @@
+"""Benchmark TextSplitter throughput and chunk shape on multi-MB documents
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_splitter.py --mb 8
+    python benchmarks/bench_splitter.py --mb 4 --tokens model   # real embedding tokenizer
+
+Documents are synthetic: "prose" has sentences, lines and paragraphs; "run-on" has words
+but almost no punctuation or line breaks, which forces word-boundary cuts. Each is fed
+in 64 KB segments like DocumentLoader yields plain text.
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.text_splitter import TextSplitter  # noqa: E402
+
+WORDS = ['trí', 'tuệ', 'nhân', 'tạo', 'dữ', 'liệu', 'mô', 'hình', 'học', 'máy', 'FastAPI',
+         'embedding', 'vector', 'truy', 'xuất', 'ngữ', 'cảnh', 'câu', 'trả', 'lời']
+SEGMENT_SIZE = 64 * 1024
+_WORD_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def make_document(kind: str, size: int, rng: random.Random) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        words = rng.choices(WORDS, k=rng.randint(6, 24))
+        if kind == 'prose':
+            sentence = ' '.join(words).capitalize() + rng.choice(['. ', '. ', '? ', '.\n', '.\n\n'])
+        else:
+            sentence = ' '.join(words) + (' , ' if rng.random() < 0.9 else '. ')
+        parts.append(sentence)
+        length += len(sentence)
+    return ''.join(parts)
+
+
+def regex_token_spans(text: str):
+    return [(match.start(), match.end()) for match in _WORD_RE.finditer(text)]
+
+
+def run(label: str, splitter: TextSplitter, document: str, repeats: int):
+    segments = [document[i:i + SEGMENT_SIZE] for i in range(0, len(document), SEGMENT_SIZE)]
+    timings = []
+    chunks = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        chunks = list(splitter.iter_chunks(segments))
+        timings.append(time.perf_counter() - started)
+    seconds = min(timings)
+    sizes = [len(chunk['text']) for chunk in chunks]
+    covered = sum(sizes)
+    print(f"  {label:<22} {len(document) / 1e6 / seconds:7.1f} MB/s  chunks={len(chunks):>7,}  "
+          f"chars min/median/max={min(sizes)}/{int(statistics.median(sizes))}/{max(sizes)}  "
+          f"overlap={covered / len(document) - 1:6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mb', type=float, default=8)
+    parser.add_argument('--chunk-size', type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument('--chunk-overlap', type=int, default=settings.CHUNK_OVERLAP)
+    parser.add_argument('--tokens', default='regex', choices=['regex', 'model', 'none'],
+                        help="token mode tokenizer: word/punctuation regex, the embedding model's, or skip")
+    parser.add_argument('--chunk-tokens', type=int, default=254)
+    parser.add_argument('--token-overlap', type=int, default=settings.CHUNK_TOKEN_OVERLAP)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    token_spans = regex_token_spans
+    if args.tokens == 'model':
+        from services.embedding_service import EmbeddingService
+        token_spans = EmbeddingService.token_spans
+
+    for kind in ('prose', 'run-on'):
+        document = make_document(kind, int(args.mb * 1e6), rng)
+        print(f"{kind}: {len(document) / 1e6:.1f}M chars")
+        run('chars', TextSplitter(args.chunk_size, args.chunk_overlap), document, args.repeats)
+        if args.tokens != 'none':
+            splitter = TextSplitter(args.chunk_tokens, args.token_overlap, token_spans=token_spans)
+            run(f"tokens ({args.tokens})", splitter, document, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark tenant routing and shard fan-out: small-tenant query latency next to a large tenant
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_tenants.py --large 200000 --small 2000
+    python benchmarks/bench_tenants.py --backend chroma --shards 4
+
+Runs VectorstoreService end to end on a temporary store for three layouts: one shared
+collection, the shared collection with an owner filter, and per-tenant collections
+(VECTOR_TENANT_ISOLATION), each optionally split into --shards shards.
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import settings  # noqa: E402
+from services.vector_backends import CHROMADB_AVAILABLE  # noqa: E402
+from services.vectorstore_service import VectorstoreService  # noqa: E402
+
+BUILD_BATCH = 5000
+DOC_CHUNKS = 500
+
+
+def ingest(owner: str, size: int, dimension: int, rng):
+    for start in range(0, size, BUILD_BATCH):
+        count = min(BUILD_BATCH, size - start)
+        vectors = rng.standard_normal((count, dimension)).astype(np.float32)
+        # Split the batch into documents so shards receive a share each
+        for offset in range(0, count, DOC_CHUNKS):
+            doc_vectors = vectors[offset:offset + DOC_CHUNKS]
+            doc_id = f"{owner}-doc{(start + offset) // DOC_CHUNKS}"
+            VectorstoreService.add_chunks(
+                doc_id,
+                [{'text': ''} for _ in range(len(doc_vectors))],
+                doc_vectors,
+                extra_metadata={'owner': owner}
+            )
+
+
+def measure(queries, where, top_k: int):
+    VectorstoreService.search_similar(queries[0], top_k, where)
+    latencies = []
+    for vector in queries:
+        started = time.perf_counter()
+        VectorstoreService.search_similar(vector, top_k, where)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+def run(layout: str, args):
+    workdir = Path(tempfile.mkdtemp(prefix=f"bench-tenants-{layout}-"))
+    settings.VECTOR_BACKEND = args.backend
+    settings.CHROMA_DB_PATH = workdir / 'chroma_db'
+    settings.NUMPY_INDEX_PATH = workdir / 'numpy_index'
+    settings.VECTOR_TENANT_ISOLATION = layout == 'isolated'
+    settings.VECTOR_SHARDS = args.shards
+    try:
+        VectorstoreService.initialize()
+        rng = np.random.default_rng(args.seed)
+        started = time.perf_counter()
+        ingest('large', args.large, args.dimension, rng)
+        ingest('small', args.small, args.dimension, rng)
+        build_seconds = time.perf_counter() - started
+
+        queries = rng.standard_normal((args.queries, args.dimension)).astype(np.float32)
+        scoped = layout != 'shared'
+        small_p50 = measure(queries, {'owner': ['small']} if scoped else None, args.top_k)
+        large_p50 = measure(queries, {'owner': ['large']} if scoped else None, args.top_k)
+        stats = VectorstoreService.get_collection_stats()
+        print(f"  {layout:<10} build={build_seconds:6.1f}s  small-tenant p50={small_p50:7.2f}ms  "
+              f"large-tenant p50={large_p50:7.2f}ms  collections={stats.get('collections')}")
+    finally:
+        VectorstoreService.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backend', default='numpy', choices=['numpy', 'chroma'])
+    parser.add_argument('--large', type=int, default=200000)
+    parser.add_argument('--small', type=int, default=2000)
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.backend == 'chroma' and not CHROMADB_AVAILABLE:
+        print("chromadb not installed")
+        return
+    print(f"backend={args.backend} large={args.large:,} small={args.small:,} shards={args.shards} "
+          f"dim={args.dimension} queries={args.queries} k={args.top_k}")
+    # "shared" searches everything unfiltered: the baseline before owner scoping
+    for layout in ('shared', 'filtered', 'isolated'):
+        run(layout, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Benchmark vector backends: build time, query latency, batched search and recall@k against exact search
+
+Usage (from rag_backend_fastapi/):
+    python benchmarks/bench_vectorstore.py --sizes 10000,100000,1000000
+    python benchmarks/bench_vectorstore.py --sizes 100000 --backends numpy-float32,chroma
+
+Vectors are synthetic and clustered (384-dim by default). Recall is measured against
+numpy-float32, which is exact, so keep it first in --backends. "batch" is one query_batch
+call over all --queries, reported per query next to the sequential p50. "scoped" is the
+p50 of queries filtered to one of --owners owners (records are spread evenly across them).
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.numpy_backend import NumpyBackend  # noqa: E402
+from services.vector_backends import CHROMADB_AVAILABLE  # noqa: E402
+
+BUILD_BATCH = 5000
+CLUSTERS = 512
+
+
+def make_batch(seed: int, start: int, size: int, centers: np.ndarray) -> np.ndarray:
+    rng = np.random.default_rng(seed * 1_000_003 + start)
+    labels = rng.integers(0, len(centers), size=size)
+    return (centers[labels] + 0.6 * rng.standard_normal((size, centers.shape[1]))).astype(np.float32)
+
+
+def create(name: str, path: Path, dimension: int):
+    if name == 'chroma':
+        from services.vector_backends import ChromaBackend
+        return ChromaBackend(path)
+    dtype = name.split('-', 1)[1]
+    return NumpyBackend(path, dimension=dimension, dtype=dtype)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(size: int, backends, dimension: int, queries: int, top_k: int, seed: int, owners: int):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((CLUSTERS, dimension)).astype(np.float32)
+    query_vectors = make_batch(seed + 1, 0, queries, centers)
+    print(f"\nsize={size:,} dim={dimension} queries={queries} k={top_k}")
+
+    exact = None
+    for name in backends:
+        workdir = Path(tempfile.mkdtemp(prefix=f"bench-{name}-"))
+        try:
+            backend = create(name, workdir, dimension)
+            started = time.perf_counter()
+            for start in range(0, size, BUILD_BATCH):
+                count = min(BUILD_BATCH, size - start)
+                vectors = make_batch(seed, start, count, centers)
+                ids = [str(i) for i in range(start, start + count)]
+                backend.upsert(ids, vectors, [''] * count, [{'doc_id': f"doc{i // 1000}", 'owner': f"user{i % owners}"} for i in range(start, start + count)])
+            build_seconds = time.perf_counter() - started
+
+            # Warm-up query (page cache, lazy index loading)
+            backend.query(query_vectors[0], top_k)
+            latencies, results = [], []
+            for vector in query_vectors:
+                started = time.perf_counter()
+                hits = backend.query(vector, top_k)
+                latencies.append((time.perf_counter() - started) * 1000)
+                results.append({hit['id'] for hit in hits})
+
+            started = time.perf_counter()
+            backend.query_batch(query_vectors, top_k)
+            batch_ms = (time.perf_counter() - started) * 1000
+
+            scoped = []
+            for vector in query_vectors:
+                started = time.perf_counter()
+                backend.query(vector, top_k, where={'owner': ['user0']})
+                scoped.append((time.perf_counter() - started) * 1000)
+
+            if exact is None:
+                exact = results
+                recall = 1.0
+            else:
+                recall = statistics.mean(len(got & truth) / top_k for got, truth in zip(results, exact))
+
+            stats = backend.stats()
+            print(f"  {name:<14} build={build_seconds:7.1f}s  "
+                  f"query p50={statistics.median(latencies):7.2f}ms p99={percentile(latencies, 99):7.2f}ms  "
+                  f"batch={batch_ms / queries:6.2f}ms/query  scoped p50={statistics.median(scoped):7.2f}ms  "
+                  f"recall@{top_k}={recall:.3f}  matrix={stats.get('matrix_bytes', 0) / 1e6:.0f}MB")
+            backend.close()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--backends', default='numpy-float32,numpy-int8,chroma')
+    parser.add_argument('--dimension', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--owners', type=int, default=100)
+    args = parser.parse_args()
+
+    backends = [name for name in args.backends.split(',') if name]
+    if 'chroma' in backends and not CHROMADB_AVAILABLE:
+        print("chromadb not installed; skipping the chroma backend")
+        backends.remove('chroma')
+    for size in (int(value) for value in args.sizes.split(',')):
+        run(size, backends, args.dimension, args.queries, args.top_k, args.seed, args.owners)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,19 +19,158 @@ class Settings(BaseSettings):
     # Paths
     BASE_DIR: Path = Path(__file__).resolve().parent
     CHROMA_DB_PATH: Path = BASE_DIR / 'chroma_db'
+    NUMPY_INDEX_PATH: Optional[Path] = None
+    BM25_INDEX_PATH: Optional[Path] = None
     
     # Embedding Configuration
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION: int = 384
+    # "torch" (sentence-transformers), "onnx" or "onnx-int8" (ONNX Runtime, fp32 or dynamically
+    # quantized int8 weights); the ONNX models are exported once with export_onnx.py
+    EMBEDDING_BACKEND: str = "torch"
+    EMBEDDING_ONNX_PATH: Optional[Path] = None  # export directory (default onnx_models/<model name>)
+    # Model batch size when embedding document chunks and /search/batch queries
+    EMBEDDING_ENCODE_BATCH_SIZE: int = 32
+    # Worker processes (each with its own model copy) for bulk encoding during ingestion;
+    # 0 = encode in the server process. Calls with fewer than one batch per worker stay in-process
+    EMBEDDING_PROCESSES: int = 0
+    EMBEDDING_PROCESS_THREADS: int = 0  # model threads per worker (0 = CPU cores / EMBEDDING_PROCESSES)
+    EMBEDDING_BATCHING_ENABLED: bool = True
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    EMBEDDING_BATCH_QUEUE_SIZE: int = 1024
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_SIZE: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 86400
+    EMBEDDING_CACHE_LOWERCASE: bool = True
+    EMBEDDING_CACHE_PERSIST: bool = False
+    EMBEDDING_CACHE_PATH: Optional[Path] = None
+    EMBEDDING_CACHE_DISK_MAX_ENTRIES: int = 200000
     
     # LLM Configuration
     LLM_MODEL: str = "gemini-pro"
     GOOGLE_API_KEY: Optional[str] = None
+    LLM_BACKEND: str = "gemini"  # "gemini" or "fake" (local stand-in for benchmarks)
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_QUEUE_SIZE: int = 64
+    LLM_TIMEOUT_SECONDS: float = 30.0
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BASE_DELAY: float = 0.5
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    LLM_CIRCUIT_RESET_SECONDS: int = 30
+    FAKE_LLM_LATENCY_MS: float = 200.0
+    FAKE_LLM_TOKEN_DELAY_MS: float = 10.0
+    
+    # Vector Store Configuration
+    VECTOR_BACKEND: str = "chroma"  # "chroma" (HNSW) or "numpy" (exact, memory-mapped matrix)
+    NUMPY_INDEX_DTYPE: str = "float32"  # "float32" or "int8" (4x smaller, scalar-quantized)
+    NUMPY_INDEX_COMPACT_RATIO: float = 0.2
+    # Per-owner collections and doc_id-hashed shards; changing either requires re-ingesting
+    VECTOR_TENANT_ISOLATION: bool = False
+    VECTOR_SHARDS: int = 1
+    VECTOR_MAX_OPEN_COLLECTIONS: int = 32
+    VECTOR_FANOUT_WORKERS: int = 4
+    CHROMA_MEMORY_LIMIT_BYTES: int = 0  # 0 = no limit; otherwise Chroma LRU-unloads HNSW segments
     
     # RAG Configuration
     TOP_K_CHUNKS: int = 5
+    SEARCH_BATCH_MAX_QUERIES: int = 256
+    SEARCH_MAX_TOP_K: int = 50
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    # "chars": CHUNK_SIZE/CHUNK_OVERLAP in characters; "tokens": CHUNK_TOKENS/CHUNK_TOKEN_OVERLAP
+    # in embedding model tokens (0 = the model's whole window, 254 for MiniLM)
+    CHUNK_SIZE_UNIT: str = "chars"
+    CHUNK_TOKENS: int = 0
+    CHUNK_TOKEN_OVERLAP: int = 32
+    INGEST_BATCH_SIZE: int = 64
+    # Identical re-uploads (same file hash and owner) are skipped; a re-upload under the
+    # same filename and owner updates that document, re-embedding only changed chunks
+    INGEST_DEDUP_ENABLED: bool = True
+    # Local chunk-hash -> vector store, so identical chunk text is never embedded twice
+    CHUNK_VECTOR_CACHE_ENABLED: bool = True
+    CHUNK_VECTOR_CACHE_PATH: Optional[Path] = None
+    CHUNK_VECTOR_CACHE_SIZE: int = 4096  # in-memory entries in front of the SQLite file
+    CHUNK_VECTOR_CACHE_MAX_ENTRIES: int = 1000000
+    # "vectorstore": context text comes from the ChromaDB payload
+    # "firestore": context text is re-read from Firestore chunks/
+    RETRIEVAL_SOURCE: str = "vectorstore"
+    RETRIEVAL_VERIFY_FIRESTORE: bool = False
+    # Cosine distance above which vector hits are dropped; when no chunk is left the
+    # LLM is not called (None = keep every hit). BM25 hits have no distance, so with hybrid
+    # search they are kept regardless and only RETRIEVAL_MIN_BM25_SCORE filters them: set
+    # both for queries matching neither semantically nor by keyword to skip the LLM
+    RETRIEVAL_MAX_DISTANCE: Optional[float] = None
+    RETRIEVAL_MIN_BM25_SCORE: Optional[float] = None
+    # Overlapping chunks are merged and the context is capped at CONTEXT_MAX_TOKENS
+    # (estimated; 0 = no cap)
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_MAX_TOKENS: int = 2000
+    
+    # Hybrid Retrieval Configuration
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATES: int = 20  # per retriever, before fusion down to TOP_K_CHUNKS
+    RRF_K: int = 60
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_MERGE_FACTOR: int = 8
+    # Tombstoned share of rows past which the chunk log and postings are rewritten
+    BM25_COMPACT_RATIO: float = 0.2
+    
+    # Reranking Configuration
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20  # over-fetched and scored, then cut to TOP_K_CHUNKS
+    RERANK_BUDGET_MS: float = 250.0  # past this the retrieval order is kept
+    RERANK_WORKERS: int = 1  # dedicated scoring threads; requests finding all busy skip rerank
+    RERANK_MAX_LENGTH: int = 256  # tokens per (query, chunk) pair
+    RERANK_MIN_SCORE: Optional[float] = None  # cross-encoder score below which chunks are dropped
+    
+    # Firestore Write Configuration
+    FIRESTORE_BATCH_MAX_WRITES: int = 500
+    FIRESTORE_BATCH_MAX_BYTES: int = 9 * 1024 * 1024
+    FIRESTORE_WRITE_CONCURRENCY: int = 4
+    FIRESTORE_WRITE_MAX_RETRIES: int = 3
+    FIRESTORE_WRITE_RETRY_BASE_DELAY: float = 0.5
+    # Firestore copy of chunk vectors: "list" (array of doubles), "float32", "float16",
+    # "int8" (scalar-quantized, scale stored in vector_scale) or "none"
+    FIRESTORE_VECTOR_ENCODING: str = "float32"
+    
+    # Extraction Configuration
+    EXTRACTION_PROCESSES: int = 2
+    PDF_PARALLEL_MIN_PAGES: int = 50
+    PDF_PAGES_PER_TASK: int = 16
+    TEXT_FALLBACK_ENCODING: str = "cp1258"
+    
+    # Answer Cache Configuration
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95
+    ANSWER_CACHE_SIZE: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    
+    # Concurrency Configuration
+    CPU_POOL_SIZE: int = 4
+    CPU_QUEUE_SIZE: int = 32
+    IO_POOL_SIZE: int = 16
+    IO_QUEUE_SIZE: int = 64
+    BUSY_RETRY_AFTER_SECONDS: int = 2
+    
+    # Ingestion Job Configuration
+    INGEST_WORKERS: int = 2
+    UPLOAD_DIR: Path = BASE_DIR / 'uploads'
+    JOBS_DB_PATH: Optional[Path] = None
+    # A job that meets a saturated worker pool is re-queued after BUSY_RETRY_AFTER_SECONDS,
+    # doubling per attempt up to this cap, and resumes from its last checkpoint
+    INGEST_BUSY_RETRY_MAX_SECONDS: int = 60
+    
+    # Startup Configuration
+    # Load and run the models (and start encoding processes) right after startup; GET /ready
+    # reports ready only once this finished. Disabled: models load on first use
+    STARTUP_WARMUP_ENABLED: bool = True
+    # A failed warm-up is retried up to STARTUP_WARMUP_RETRIES times, waiting
+    # STARTUP_WARMUP_RETRY_SECONDS doubled per retry; then GET /health fails as well
+    STARTUP_WARMUP_RETRIES: int = 5
+    STARTUP_WARMUP_RETRY_SECONDS: float = 2.0
     
     # API Configuration
     API_V1_PREFIX: str = "/api/v1"
@@ -49,10 +188,22 @@ class Settings(BaseSettings):
         # Resolve relative paths
         if not Path(self.FIREBASE_CREDENTIALS_PATH).is_absolute():
             self.FIREBASE_CREDENTIALS_PATH = str(self.BASE_DIR / self.FIREBASE_CREDENTIALS_PATH)
+        if self.EMBEDDING_ONNX_PATH is None:
+            self.EMBEDDING_ONNX_PATH = self.BASE_DIR / 'onnx_models' / self.EMBEDDING_MODEL.split('/')[-1]
+        if self.EMBEDDING_CACHE_PATH is None:
+            self.EMBEDDING_CACHE_PATH = self.CHROMA_DB_PATH.parent / 'embedding_cache.sqlite3'
+        if self.CHUNK_VECTOR_CACHE_PATH is None:
+            self.CHUNK_VECTOR_CACHE_PATH = self.CHROMA_DB_PATH.parent / 'chunk_vectors.sqlite3'
+        if self.NUMPY_INDEX_PATH is None:
+            self.NUMPY_INDEX_PATH = self.CHROMA_DB_PATH.parent / 'numpy_index'
+        if self.BM25_INDEX_PATH is None:
+            self.BM25_INDEX_PATH = self.CHROMA_DB_PATH.parent / 'bm25_index'
+        if self.JOBS_DB_PATH is None:
+            self.JOBS_DB_PATH = self.BASE_DIR / 'jobs.sqlite3'
     
     def validate_required(self) -> None:
         """Validate required settings"""
-        if not self.GOOGLE_API_KEY:
+        if self.LLM_BACKEND == 'gemini' and not self.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY is required")
         if not Path(self.FIREBASE_CREDENTIALS_PATH).exists():
             raise FileNotFoundError(
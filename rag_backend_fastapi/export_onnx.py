@@ -0,0 +1,152 @@
+"""Script xuất embedding model sang ONNX (fp32 và int8) cho EMBEDDING_BACKEND=onnx / onnx-int8
+
+Chạy một lần trên máy có PyTorch và sentence-transformers (và truy cập được HuggingFace hoặc
+model đã có trong cache). Thư mục kết quả chứa model.onnx, model_int8.onnx, tokenizer và cấu
+hình pooling; server chỉ cần onnxruntime và đọc thư mục này mà không cần mạng.
+
+Sau khi xuất, mỗi file ONNX được so với model PyTorch trên vài câu mẫu: nếu cosine trung bình
+thấp hơn --min-cosine thì file đó bị xoá và script thoát với mã lỗi 1.
+
+Ví dụ:
+    python export_onnx.py
+    python export_onnx.py --model sentence-transformers/all-MiniLM-L6-v2 --output onnx_models/all-MiniLM-L6-v2
+"""
+import argparse
+import inspect
+import logging
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+import numpy as np
+
+from config import settings
+from services.embedding_backends import ONNX_INT8_MODEL_FILE, ONNX_MODEL_FILE, OnnxEmbedder
+
+logger = logging.getLogger(__name__)
+
+# Transformer weights are not needed once exported
+_WEIGHT_FILES = ('model.safetensors', 'pytorch_model.bin')
+# Texts embedded by both the PyTorch model and each export to compare them
+_PARITY_TEXTS = (
+    "Xin chào",
+    "FastAPI là một web framework hiện đại cho Python, dùng type hints để kiểm tra dữ liệu.",
+    "Ứng dụng chạy trên Uvicorn, một ASGI server hiệu năng cao, và lưu tài liệu trên Firebase.",
+    "Retrieval-augmented generation combines vector search with a large language model.",
+    "Chunks are embedded in batches; the query embedding is compared by cosine distance.",
+    "Hướng dẫn cài đặt: tạo virtualenv, cài requirements.txt rồi chạy uvicorn main:app --reload. " * 4,
+)
+
+
+def _cosines(vectors: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    return np.sum(vectors * reference, axis=1)
+
+
+def check_parity(model, output: Path, model_files, min_cosine: float) -> Dict[str, Tuple[float, float]]:
+    """Compare each exported file with the PyTorch model; returns {file: (mean, min) cosine}
+
+    A file whose mean cosine is below `min_cosine` is deleted, so a broken export (typically
+    an int8 model losing too much precision) can never be loaded, and ValueError is raised.
+    """
+    texts = list(_PARITY_TEXTS)
+    reference = np.asarray(
+        model.encode(texts, convert_to_numpy=True, show_progress_bar=False), dtype=np.float32
+    )
+    results = {}
+    failed = []
+    for model_file in model_files:
+        vectors = OnnxEmbedder(output, model_file).encode(texts)
+        cosines = _cosines(vectors, reference)
+        results[model_file] = (float(cosines.mean()), float(cosines.min()))
+        logger.info(f"Parity {model_file}: cosine mean={cosines.mean():.5f} min={cosines.min():.5f}")
+        if cosines.mean() < min_cosine:
+            (output / model_file).unlink()
+            failed.append(f"{model_file} (mean cosine {cosines.mean():.5f})")
+    if failed:
+        raise ValueError(
+            f"ONNX export differs from the PyTorch model, below --min-cosine {min_cosine}: "
+            f"{', '.join(failed)}. The files were deleted"
+        )
+    return results
+
+
+def export(model_name: str, output: Path, opset: int = 17, quantize: bool = True, min_cosine: float = 0.98):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device='cpu')
+    model.save(str(output))
+    for name in _WEIGHT_FILES:
+        (output / name).unlink(missing_ok=True)
+
+    transformer = model[0].auto_model.eval()
+    input_names = [
+        name for name in ('input_ids', 'attention_mask', 'token_type_ids')
+        if name in model.tokenizer.model_input_names
+    ]
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Transformer with positional inputs, returning only the token embeddings"""
+
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, *inputs):
+            return self.transformer(**dict(zip(input_names, inputs))).last_hidden_state
+
+    sample = model.tokenizer(["Xin chào", "Embedding model export"], padding=True, return_tensors='pt')
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles dynamic_axes without onnxscript
+        options['dynamo'] = False
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(),
+            tuple(sample[name] for name in input_names),
+            str(output / ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=['token_embeddings'],
+            dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in input_names + ['token_embeddings']},
+            opset_version=opset,
+            **options
+        )
+    logger.info(f"Exported {output / ONNX_MODEL_FILE}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(output / ONNX_MODEL_FILE),
+            str(output / ONNX_INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8
+        )
+        logger.info(f"Quantized {output / ONNX_INT8_MODEL_FILE}")
+
+    model_files = [ONNX_MODEL_FILE, ONNX_INT8_MODEL_FILE] if quantize else [ONNX_MODEL_FILE]
+    return check_parity(model, output, model_files, min_cosine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 and int8)")
+    parser.add_argument('--model', default=settings.EMBEDDING_MODEL)
+    parser.add_argument('--output', type=Path, default=settings.EMBEDDING_ONNX_PATH)
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--no-quantize', action='store_true', help="Skip the int8 model")
+    parser.add_argument('--min-cosine', type=float, default=0.98,
+                        help="Minimum mean cosine with the PyTorch model for an export to be kept")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    args.output.mkdir(parents=True, exist_ok=True)
+    try:
+        parity = export(args.model, args.output, opset=args.opset, quantize=not args.no_quantize,
+                        min_cosine=args.min_cosine)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    for model_file, (mean, minimum) in parity.items():
+        path = args.output / model_file
+        print(f"{path}: {path.stat().st_size / 1e6:.1f} MB, cosine mean={mean:.5f} min={minimum:.5f}")
@@ -22,21 +22,53 @@ async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
     # Startup
     logger.info("Starting up application...")
+    from services.startup_service import StartupService
     try:
         # Validate settings
-        settings.validate_required()
+        with StartupService.phase('settings'):
+            settings.validate_required()
         logger.info("✅ Settings validated")
         
         # Initialize Firebase
-        from services.firebase_service import FirebaseService
-        FirebaseService.initialize()
+        with StartupService.phase('firebase'):
+            from services.firebase_service import FirebaseService
+            FirebaseService.initialize()
         logger.info("✅ Firebase initialized")
         
-        # Initialize ChromaDB
-        from services.vectorstore_service import VectorstoreService
-        VectorstoreService.initialize()
-        logger.info("✅ ChromaDB initialized")
+        # Initialize vector store (opens the shared collection)
+        with StartupService.phase('vectorstore'):
+            from services.vectorstore_service import VectorstoreService
+            VectorstoreService.initialize()
+        logger.info(f"✅ Vector store initialized ({settings.VECTOR_BACKEND})")
         
+        # Open the BM25 index for hybrid retrieval
+        if settings.HYBRID_SEARCH_ENABLED:
+            with StartupService.phase('bm25_index'):
+                from services.lexical_service import LexicalService
+                LexicalService.initialize()
+            logger.info("✅ BM25 index loaded")
+        
+        # Initialize worker pools
+        with StartupService.phase('worker_pools'):
+            from services.executor_service import ExecutorService
+            ExecutorService.initialize()
+        logger.info("✅ Worker pools initialized")
+        
+        # Initialize shared LLM client
+        with StartupService.phase('llm_client'):
+            from services.llm_service import LLMService
+            LLMService.initialize()
+        logger.info("✅ LLM client initialized")
+        
+        # Start background ingestion workers (resumes unfinished jobs)
+        with StartupService.phase('ingestion_workers'):
+            from services.job_service import JobService
+            await JobService.start()
+        logger.info("✅ Ingestion workers started")
+        
+        # Load and run the embedding (and rerank) models in the background; /ready
+        # flips once they are warm
+        StartupService.started()
         logger.info("🚀 Application started successfully")
     except Exception as e:
         logger.error(f"❌ Error during startup: {str(e)}", exc_info=True)
@@ -46,6 +78,21 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down application...")
+    from services.document_loader import DocumentLoader
+    from services.embedding_service import EmbeddingService
+    from services.executor_service import ExecutorService
+    from services.job_service import JobService
+    from services.lexical_service import LexicalService
+    from services.rerank_service import RerankService
+    from services.vectorstore_service import VectorstoreService
+    await StartupService.shutdown()
+    await JobService.stop()
+    DocumentLoader.shutdown()
+    EmbeddingService.shutdown()
+    VectorstoreService.shutdown()
+    LexicalService.shutdown()
+    RerankService.shutdown()
+    ExecutorService.shutdown()
 
 
 app = FastAPI(
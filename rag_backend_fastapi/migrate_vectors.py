@@ -0,0 +1,31 @@
+"""Script chuyển đổi định dạng vector của chunks trong Firestore
+
+Ví dụ:
+    python migrate_vectors.py --encoding float16 --dry-run
+    python migrate_vectors.py --encoding int8 --doc-id <doc_id>
+"""
+import argparse
+import json
+import logging
+
+from config import settings
+from services.firebase_service import FirebaseService
+from services.vector_codec import ENCODINGS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode chunk vectors stored in Firestore")
+    parser.add_argument('--encoding', choices=ENCODINGS, default=settings.FIRESTORE_VECTOR_ENCODING)
+    parser.add_argument('--doc-id', default=None, help="Only migrate chunks of this document")
+    parser.add_argument('--page-size', type=int, default=500)
+    parser.add_argument('--dry-run', action='store_true', help="Count chunks to migrate without writing")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    FirebaseService.initialize()
+    stats = FirebaseService.migrate_vector_encoding(
+        args.encoding,
+        doc_id=args.doc_id,
+        page_size=args.page_size,
+        dry_run=args.dry_run
+    )
+    print(json.dumps(stats, indent=2))
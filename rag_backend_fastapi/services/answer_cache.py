@@ -0,0 +1,157 @@
+"""Answer Cache - Semantic cache of LLM answers keyed by query embedding"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """Returns a stored answer when a new query is within a cosine threshold of an answered one"""
+
+    def __init__(
+        self,
+        dimension: int,
+        threshold: float = 0.95,
+        max_size: int = 1000,
+        ttl_seconds: float = 0
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+        if not -1.0 <= threshold <= 1.0:
+            raise ValueError("threshold must be between -1 and 1")
+
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Row i of _vectors holds the unit-normalized query embedding of slot i
+        self._vectors = np.zeros((max_size, dimension), dtype=np.float32)
+        self._valid = np.zeros(max_size, dtype=bool)
+        self._entries: "OrderedDict[int, Dict]" = OrderedDict()
+        self._free_slots: List[int] = list(range(max_size - 1, -1, -1))
+        self._slots_by_doc: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(self, embedding) -> Optional[Dict]:
+        """Find the closest cached answer above the threshold"""
+        query = self._normalize(embedding)
+        if query is None or query.shape[0] != self.dimension:
+            return None
+
+        with self._lock:
+            if not self._entries:
+                self._misses += 1
+                return None
+
+            scores = self._vectors @ query
+            scores[~self._valid] = -np.inf
+            slot = int(np.argmax(scores))
+            similarity = float(scores[slot])
+            if similarity < self.threshold:
+                self._misses += 1
+                return None
+
+            entry = self._entries[slot]
+            if self.ttl_seconds > 0 and time.time() - entry['created_at'] > self.ttl_seconds:
+                self._remove_slot(slot)
+                self._misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self._hits += 1
+            return {**entry, 'similarity': similarity}
+
+    def store(
+        self,
+        query: str,
+        embedding,
+        answer: str,
+        doc_ids: Iterable[str],
+        chunk_ids: Iterable[str],
+        chunks_count: int
+    ):
+        """Cache an answer together with the documents and chunks it was built from"""
+        vector = self._normalize(embedding)
+        if vector is None or vector.shape[0] != self.dimension:
+            return
+
+        with self._lock:
+            if not self._free_slots:
+                oldest_slot = next(iter(self._entries))
+                self._remove_slot(oldest_slot)
+                self._evictions += 1
+
+            slot = self._free_slots.pop()
+            entry = {
+                'query': query,
+                'answer': answer,
+                'doc_ids': sorted(set(doc_ids)),
+                'chunk_ids': list(chunk_ids),
+                'chunks_count': chunks_count,
+                'created_at': time.time()
+            }
+            self._vectors[slot] = vector
+            self._valid[slot] = True
+            self._entries[slot] = entry
+            for doc_id in entry['doc_ids']:
+                self._slots_by_doc.setdefault(doc_id, set()).add(slot)
+
+    def _remove_slot(self, slot: int):
+        entry = self._entries.pop(slot)
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+        for doc_id in entry['doc_ids']:
+            slots = self._slots_by_doc.get(doc_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._slots_by_doc[doc_id]
+
+    def invalidate_document(self, doc_id: str) -> int:
+        """Drop every cached answer that used chunks of the given document"""
+        with self._lock:
+            slots = list(self._slots_by_doc.get(doc_id, ()))
+            for slot in slots:
+                self._remove_slot(slot)
+            self._invalidations += len(slots)
+        if slots:
+            logger.info(f"Invalidated {len(slots)} cached answers for document {doc_id}")
+        return len(slots)
+
+    def clear(self):
+        """Remove all cached answers"""
+        with self._lock:
+            for slot in list(self._entries):
+                self._remove_slot(slot)
+
+    def stats(self) -> Dict:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'threshold': self.threshold,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,535 @@
+"""BM25 Index - Persistent inverted index with array-backed postings for lexical search"""
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .vector_backends import FILTER_FIELDS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+INITIAL_CAPACITY = 1024
+# Compaction is not worth a rewrite below this many tombstones
+MIN_COMPACT_TOMBSTONES = 1024
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; Vietnamese syllables keep their diacritics (NFC)"""
+    return TOKEN_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+
+
+class Segment(NamedTuple):
+    """Immutable postings in CSR form: rows/tfs of terms[i] are [offsets[i]:offsets[i + 1]]"""
+    name: str
+    terms: np.ndarray    # int32, sorted term ids
+    offsets: np.ndarray  # int64, len(terms) + 1
+    rows: np.ndarray     # int32, chunk rows
+    tfs: np.ndarray      # uint16, term frequency in the row
+
+    @property
+    def postings(self) -> int:
+        return len(self.rows)
+
+
+def _build_segment(name: str, term_ids: np.ndarray, rows: np.ndarray, tfs: np.ndarray) -> Segment:
+    order = np.lexsort((rows, term_ids))
+    term_ids, rows, tfs = term_ids[order], rows[order], tfs[order]
+    terms, starts = np.unique(term_ids, return_index=True)
+    offsets = np.append(starts, len(term_ids)).astype(np.int64)
+    return Segment(name, terms.astype(np.int32), offsets, rows.astype(np.int32), tfs.astype(np.uint16))
+
+
+class BM25Index:
+    """Okapi BM25 over chunks, updated incrementally and persisted under `path`
+
+    Each added batch becomes an immutable postings segment (`seg_*.npz`); segments of
+    similar size are merged `merge_factor` at a time, so adding N chunks costs
+    O(N log N) and a query reads O(log N) segments. `manifest.json` lists the live
+    segments, `terms.txt` is the append-only vocabulary (term id = line number) and
+    `chunks.jsonl` is an append-only log of chunk records and tombstones. Only lengths,
+    filter codes and log offsets of chunks are kept in memory; texts and metadata of
+    hits are read back from the log. Merges drop postings of deleted chunks; once
+    tombstoned rows exceed `compact_ratio` of all rows, `compact()` rewrites the log and
+    postings with the live rows renumbered, so replaced and deleted chunks stop taking
+    disk and memory.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        k1: float = 1.2,
+        b: float = 0.75,
+        merge_factor: int = 8,
+        compact_ratio: float = 0.2
+    ):
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = max(2, merge_factor)
+        self.compact_ratio = compact_ratio
+        self._manifest_path = path / 'manifest.json'
+        self._terms_path = path / 'terms.txt'
+        self._log_path = path / 'chunks.jsonl'
+        self._compact_marker = path / 'compact.pending'
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+
+        self._segments: Tuple[Segment, ...] = ()
+        self._next_segment = 0
+        self._next_row = 0
+        self._term_ids: Dict[str, int] = {}
+        self._reset_rows()
+        self._load()
+        self._log = open(self._log_path, 'ab')
+        self._terms_log = open(self._terms_path, 'a', encoding='utf-8')
+
+    # ========== Persistence ==========
+
+    def _swap_pairs(self):
+        return [
+            (self.path / 'chunks.jsonl.tmp', self._log_path),
+            (self.path / 'manifest.json.compact', self._manifest_path),
+        ]
+
+    def _load(self):
+        if self._compact_marker.exists():
+            # A compaction finished writing its files but crashed while swapping them in
+            for tmp_path, path in self._swap_pairs():
+                if tmp_path.exists():
+                    os.replace(tmp_path, path)
+            self._compact_marker.unlink()
+            logger.warning(f"Completed interrupted compaction of {self.path}")
+        else:
+            # Left by a compaction that crashed before its swap
+            for tmp_path, _ in self._swap_pairs():
+                tmp_path.unlink(missing_ok=True)
+
+        manifest = {'segments': [], 'next_row': 0, 'next_segment': 0}
+        if self._manifest_path.exists():
+            manifest = json.loads(self._manifest_path.read_text(encoding='utf-8'))
+        self._next_row = manifest['next_row']
+        self._next_segment = manifest['next_segment']
+        segments = []
+        for name in manifest['segments']:
+            with np.load(self.path / name) as data:
+                segments.append(Segment(name, data['terms'], data['offsets'], data['rows'], data['tfs']))
+        self._segments = tuple(segments)
+        # Segments written by a crashed add or merge that never made it into the manifest
+        for orphan in self.path.glob('seg_*.npz*'):
+            if orphan.name not in manifest['segments']:
+                orphan.unlink()
+
+        if self._terms_path.exists():
+            data = self._terms_path.read_bytes()
+            complete = data[:data.rfind(b'\n') + 1]
+            if len(complete) < len(data):
+                with open(self._terms_path, 'r+b') as terms:
+                    terms.truncate(len(complete))
+            for term_id, term in enumerate(complete.decode('utf-8').splitlines()):
+                self._term_ids[term] = term_id
+
+        self._ensure_capacity(self._next_row)
+        if self._log_path.exists():
+            self._replay_log()
+        logger.info(
+            f"BM25 index loaded from {self.path}: {self._live} chunks, "
+            f"{len(self._term_ids)} terms, {len(self._segments)} segments"
+        )
+
+    def _replay_log(self):
+        offset = 0
+        with open(self._log_path, 'rb') as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the end of the log from a crash; drop it
+                    break
+                if 'delete' in record:
+                    self._tombstone(record['delete'])
+                elif record['row'] < self._next_row:
+                    self._add_record(record['row'], record['id'], record['length'], record['metadata'], offset)
+                else:
+                    break
+                offset += len(line)
+        if offset < self._log_path.stat().st_size:
+            logger.warning(f"Truncating {self._log_path.stat().st_size - offset} bytes of incomplete BM25 log")
+            with open(self._log_path, 'r+b') as log:
+                log.truncate(offset)
+
+    def _manifest(self, segments: Iterable[Segment], next_row: int) -> str:
+        return json.dumps({
+            'segments': [segment.name for segment in segments],
+            'next_row': next_row,
+            'next_segment': self._next_segment
+        })
+
+    def _write_manifest(self, segments: Iterable[Segment]):
+        tmp_path = self._manifest_path.with_suffix('.tmp')
+        tmp_path.write_text(self._manifest(segments, self._next_row), encoding='utf-8')
+        os.replace(tmp_path, self._manifest_path)
+
+    def _write_segment(self, segment: Segment):
+        tmp_path = self.path / f"{segment.name}.tmp"
+        with open(tmp_path, 'wb') as out:
+            np.savez(out, terms=segment.terms, offsets=segment.offsets, rows=segment.rows, tfs=segment.tfs)
+        os.replace(tmp_path, self.path / segment.name)
+
+    def _segment_name(self) -> str:
+        self._next_segment += 1
+        return f"seg_{self._next_segment:08d}.npz"
+
+    # ========== In-memory row state ==========
+
+    def _reset_rows(self):
+        # New arrays rather than cleared ones, so searches holding the old ones stay valid
+        self._row_by_id: Dict[str, int] = {}
+        self._lengths = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self._offsets = np.zeros(INITIAL_CAPACITY, dtype=np.int64)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        # Per filter field: value -> code, and the code of every row (-1 = unset)
+        self._codes: Dict[str, Dict[str, int]] = {field: {} for field in FILTER_FIELDS}
+        self._row_codes = {field: np.full(INITIAL_CAPACITY, -1, dtype=np.int32) for field in FILTER_FIELDS}
+        self._live = 0
+        self._total_length = 0
+
+    def _ensure_capacity(self, needed: int):
+        capacity = len(self._lengths)
+        if needed <= capacity:
+            return
+        capacity = max(capacity * 2, needed)
+        # Grow by copying into new arrays, so searches holding the old ones stay valid
+        self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.int32)])
+        self._offsets = np.concatenate([self._offsets, np.zeros(capacity - len(self._offsets), dtype=np.int64)])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        for field, codes in self._row_codes.items():
+            self._row_codes[field] = np.concatenate([codes, np.full(capacity - len(codes), -1, dtype=np.int32)])
+
+    def _add_record(self, row: int, chunk_id: str, length: int, metadata: Dict, offset: int):
+        previous = self._row_by_id.get(chunk_id)
+        if previous is not None:
+            self._tombstone(previous)
+        self._row_by_id[chunk_id] = row
+        self._lengths[row] = length
+        self._offsets[row] = offset
+        self._alive[row] = True
+        for field, codes in self._codes.items():
+            value = metadata.get(field)
+            if value is not None:
+                self._row_codes[field][row] = codes.setdefault(value, len(codes))
+        self._live += 1
+        self._total_length += length
+
+    def _tombstone(self, row: int):
+        if row >= len(self._alive) or not self._alive[row]:
+            return
+        self._alive[row] = False
+        self._live -= 1
+        self._total_length -= int(self._lengths[row])
+
+    # ========== Updates ==========
+
+    def add(self, chunk_ids: List[str], texts: List[str], metadatas: List[Dict]):
+        """Index a batch of chunks; a chunk ID indexed before is replaced"""
+        counts = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            new_terms = []
+            term_ids, rows, tfs = [], [], []
+            first_row = self._next_row
+            for offset, counter in enumerate(counts):
+                for term, tf in counter.items():
+                    term_id = self._term_ids.get(term)
+                    if term_id is None:
+                        term_id = self._term_ids[term] = len(self._term_ids)
+                        new_terms.append(term)
+                    term_ids.append(term_id)
+                    rows.append(first_row + offset)
+                    tfs.append(min(tf, 65535))
+
+            # Terms, then the segment and manifest, then chunk records: after a crash,
+            # rows reserved in the manifest without a record are simply never alive
+            if new_terms:
+                self._terms_log.write(''.join(term + '\n' for term in new_terms))
+                self._terms_log.flush()
+            if term_ids:
+                segment = _build_segment(
+                    self._segment_name(),
+                    np.asarray(term_ids, dtype=np.int32),
+                    np.asarray(rows, dtype=np.int32),
+                    np.asarray(tfs, dtype=np.uint16)
+                )
+                self._write_segment(segment)
+                self._segments = self._segments + (segment,)
+            self._next_row += len(chunk_ids)
+            self._write_manifest(self._segments)
+
+            self._ensure_capacity(self._next_row)
+            offset = self._log.tell()
+            lines = []
+            records = zip(chunk_ids, texts, counts, metadatas)
+            for row, (chunk_id, text, counter, metadata) in enumerate(records, start=first_row):
+                line = json.dumps({
+                    'row': row,
+                    'id': chunk_id,
+                    'length': sum(counter.values()),
+                    'text': text,
+                    'metadata': metadata
+                }, ensure_ascii=False).encode('utf-8') + b'\n'
+                self._add_record(row, chunk_id, sum(counter.values()), metadata, offset)
+                offset += len(line)
+                lines.append(line)
+            self._log.write(b''.join(lines))
+            self._log.flush()
+        self._maybe_merge()
+        # Re-indexed chunk IDs leave their previous rows tombstoned
+        self._maybe_compact()
+
+    def delete_document(self, doc_id: str) -> int:
+        """Tombstone every chunk of a document, returning how many were removed"""
+        with self._lock:
+            code = self._codes['doc_id'].get(doc_id)
+            if code is None:
+                return 0
+            count = self._next_row
+            rows = np.flatnonzero((self._row_codes['doc_id'][:count] == code) & self._alive[:count])
+            if len(rows) == 0:
+                return 0
+            self._log.write(b''.join(json.dumps({'delete': int(row)}).encode('utf-8') + b'\n' for row in rows))
+            self._log.flush()
+            for row in rows:
+                self._tombstone(int(row))
+        self._maybe_compact()
+        return len(rows)
+
+    def delete_ids(self, chunk_ids: List[str]) -> int:
+        """Tombstone chunks by ID (unknown IDs are ignored), returning how many were removed"""
+        with self._lock:
+            rows = sorted({
+                self._row_by_id[chunk_id] for chunk_id in chunk_ids
+                if chunk_id in self._row_by_id and self._alive[self._row_by_id[chunk_id]]
+            })
+            if not rows:
+                return 0
+            self._log.write(b''.join(json.dumps({'delete': row}).encode('utf-8') + b'\n' for row in rows))
+            self._log.flush()
+            for row in rows:
+                self._tombstone(row)
+        self._maybe_compact()
+        return len(rows)
+
+    # ========== Merging ==========
+
+    def _tier(self, segment: Segment) -> int:
+        return int(math.log(max(segment.postings, 1), self.merge_factor))
+
+    def _maybe_merge(self):
+        """Merge `merge_factor` segments of the same size tier until no tier is full"""
+        # A merge already running in another thread picks up the new segments too
+        if not self._merge_lock.acquire(blocking=False):
+            return
+        try:
+            while True:
+                with self._lock:
+                    tiers: Dict[int, List[Segment]] = {}
+                    for segment in self._segments:
+                        tiers.setdefault(self._tier(segment), []).append(segment)
+                    group = next((group for group in tiers.values() if len(group) >= self.merge_factor), None)
+                    alive = self._alive.copy()
+                if group is None:
+                    return
+                self._merge(group[:self.merge_factor], alive)
+        finally:
+            self._merge_lock.release()
+
+    def _merge(self, group: List[Segment], alive: np.ndarray):
+        # Built outside the lock; postings of chunks deleted meanwhile are masked at query time
+        term_ids = np.concatenate([np.repeat(s.terms, np.diff(s.offsets)) for s in group])
+        rows = np.concatenate([s.rows for s in group])
+        tfs = np.concatenate([s.tfs for s in group])
+        keep = alive[rows]
+        with self._lock:
+            name = self._segment_name()
+        merged = _build_segment(name, term_ids[keep], rows[keep], tfs[keep])
+        self._write_segment(merged)
+
+        with self._lock:
+            merged_names = {segment.name for segment in group}
+            remaining = [segment for segment in self._segments if segment.name not in merged_names]
+            self._segments = tuple(remaining + [merged])
+            self._write_manifest(self._segments)
+        for name in merged_names:
+            (self.path / name).unlink(missing_ok=True)
+        logger.debug(f"Merged {len(group)} BM25 segments into {merged.name} ({merged.postings} postings)")
+
+    # ========== Compaction ==========
+
+    def _maybe_compact(self):
+        with self._lock:
+            tombstones = self._next_row - self._live
+            due = tombstones >= MIN_COMPACT_TOMBSTONES and tombstones > self.compact_ratio * self._next_row
+        if due:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the log and postings without tombstoned rows, renumbering the live rows"""
+        # The merge lock keeps merges, which are built outside the index lock, off the old rows
+        with self._merge_lock, self._lock:
+            count = self._next_row
+            keep = np.flatnonzero(self._alive[:count])
+            new_rows = np.full(count, -1, dtype=np.int64)
+            new_rows[keep] = np.arange(len(keep))
+
+            old_segments = self._segments
+            segments = ()
+            if old_segments:
+                term_ids = np.concatenate([np.repeat(s.terms, np.diff(s.offsets)) for s in old_segments])
+                rows = new_rows[np.concatenate([s.rows for s in old_segments])]
+                tfs = np.concatenate([s.tfs for s in old_segments])
+                live = rows >= 0
+                if live.any():
+                    segment = _build_segment(self._segment_name(), term_ids[live], rows[live], tfs[live])
+                    self._write_segment(segment)
+                    segments = (segment,)
+
+            (log_tmp, _), (manifest_tmp, _) = self._swap_pairs()
+            with open(self._log_path, 'rb') as old_log, open(log_tmp, 'wb') as log:
+                for new_row, row in enumerate(keep):
+                    old_log.seek(int(self._offsets[row]))
+                    record = json.loads(old_log.readline())
+                    record['row'] = new_row
+                    log.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            manifest_tmp.write_text(self._manifest(segments, len(keep)), encoding='utf-8')
+
+            # The marker makes the two swaps below roll forward after a crash
+            self._compact_marker.touch()
+            self._log.close()
+            for tmp_path, path in self._swap_pairs():
+                os.replace(tmp_path, path)
+            self._compact_marker.unlink()
+            for segment in old_segments:
+                (self.path / segment.name).unlink(missing_ok=True)
+
+            self._reset_rows()
+            self._load()
+            self._log = open(self._log_path, 'ab')
+            logger.info(f"Compacted BM25 index: removed {count - len(keep)} tombstoned rows, {self._live} left")
+
+    # ========== Search ==========
+
+    def _allowed_codes(self, where: Dict[str, List[str]]) -> Dict[str, List[int]]:
+        """Codes of the filter values per field; the caller holds the lock"""
+        allowed = {}
+        for field, values in where.items():
+            if field not in self._codes:
+                raise ValueError(f"Cannot filter on '{field}'. Indexed fields: {FILTER_FIELDS}")
+            codes = self._codes[field]
+            allowed[field] = [codes[value] for value in values if value in codes]
+        return allowed
+
+    def _score(self, term_ids: List[int], segments, alive, lengths, live: int, avgdl: float):
+        """Candidate rows and their BM25 scores (None when no live row matches)"""
+        score_rows, score_values = [], []
+        for term_id in term_ids:
+            rows_parts, tf_parts = [], []
+            for segment in segments:
+                i = np.searchsorted(segment.terms, term_id)
+                if i < len(segment.terms) and segment.terms[i] == term_id:
+                    start, stop = segment.offsets[i], segment.offsets[i + 1]
+                    rows_parts.append(segment.rows[start:stop])
+                    tf_parts.append(segment.tfs[start:stop])
+            if not rows_parts:
+                continue
+            rows = np.concatenate(rows_parts)
+            tfs = np.concatenate(tf_parts).astype(np.float32)
+            live_rows = alive[rows]
+            rows, tfs = rows[live_rows], tfs[live_rows]
+            df = len(rows)
+            if df == 0:
+                continue
+            idf = math.log(1.0 + (live - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1.0 - self.b + self.b * lengths[rows] / avgdl)
+            score_rows.append(rows)
+            score_values.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+        if not score_rows:
+            return None
+
+        rows = np.concatenate(score_rows)
+        candidates, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_values)).astype(np.float32)
+        return candidates, scores
+
+    def search(self, query: str, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+        """BM25 top-k chunks as {id, text, metadata, score}, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            term_ids = [self._term_ids[term] for term in terms if term in self._term_ids]
+            if not term_ids or top_k <= 0 or self._live == 0:
+                return []
+            segments = self._segments
+            count = self._next_row
+            alive = self._alive[:count].copy()
+            lengths = self._lengths
+            offsets = self._offsets
+            row_codes = dict(self._row_codes)
+            allowed = self._allowed_codes(where) if where else None
+            live, avgdl = self._live, self._total_length / max(self._live, 1)
+            # Opened under the lock: a compaction replaces the log these offsets point into
+            log = open(self._log_path, 'rb')
+
+        with log:
+            scored = self._score(term_ids, segments, alive, lengths, live, avgdl)
+            if scored is None:
+                return []
+            candidates, scores = scored
+            if allowed:
+                mask = np.ones(len(candidates), dtype=bool)
+                for field, field_codes in allowed.items():
+                    mask &= np.isin(row_codes[field][candidates], field_codes)
+                candidates, scores = candidates[mask], scores[mask]
+                if len(candidates) == 0:
+                    return []
+
+            k = min(top_k, len(candidates))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results = []
+            for i in top:
+                log.seek(int(offsets[candidates[i]]))
+                record = json.loads(log.readline())
+                results.append({
+                    'id': record['id'],
+                    'text': record['text'],
+                    'metadata': record['metadata'],
+                    'score': float(scores[i])
+                })
+            return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'total_chunks': self._live,
+                'rows': self._next_row,
+                'terms': len(self._term_ids),
+                'tombstones': self._next_row - self._live,
+                'segments': len(self._segments),
+                'postings': sum(segment.postings for segment in self._segments),
+                'postings_bytes': sum(
+                    segment.rows.nbytes + segment.tfs.nbytes + segment.terms.nbytes + segment.offsets.nbytes
+                    for segment in self._segments
+                )
+            }
+
+    def close(self):
+        with self._lock:
+            self._log.close()
+            self._terms_log.close()
@@ -0,0 +1,187 @@
+"""Document Loader - Lazily extract text segments from uploaded files"""
+import codecs
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+import PyPDF2
+import docx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+TEXT_READ_SIZE = 64 * 1024
+
+
+class TextSegment(NamedTuple):
+    """A consecutive slice of document text; `page` is the 1-based PDF page, None otherwise"""
+    text: str
+    page: Optional[int] = None
+
+
+def _extract_pdf_pages(path: str, start: int, stop: int) -> List[str]:
+    """Extract pages [start, stop) of a PDF; runs in an extraction worker process"""
+    with open(path, 'rb') as fileobj:
+        pdf_reader = PyPDF2.PdfReader(fileobj)
+        return [pdf_reader.pages[idx].extract_text() or '' for idx in range(start, stop)]
+
+
+class DocumentLoader:
+    """Yields text page by page / paragraph by paragraph instead of materializing the whole document
+
+    Segments are consecutive slices of the document text: pages and paragraphs
+    carry their own trailing newline, plain text is cut at arbitrary block boundaries.
+    """
+
+    SUPPORTED_TYPES = ['pdf', 'txt', 'md', 'docx']
+    _process_pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def get_process_pool(cls) -> Optional[ProcessPoolExecutor]:
+        """Lazy create the PDF extraction process pool (None when disabled)"""
+        if cls._process_pool is None and settings.EXTRACTION_PROCESSES > 0:
+            # spawn: forking a process that already runs model and batcher threads is unsafe
+            cls._process_pool = ProcessPoolExecutor(
+                max_workers=settings.EXTRACTION_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            logger.info(f"Extraction process pool started ({settings.EXTRACTION_PROCESSES} processes)")
+        return cls._process_pool
+
+    @classmethod
+    def shutdown(cls):
+        """Stop the extraction process pool"""
+        if cls._process_pool is not None:
+            cls._process_pool.shutdown(wait=False, cancel_futures=True)
+            cls._process_pool = None
+
+    @staticmethod
+    def iter_text(fileobj: BinaryIO, file_type: str, parallel: bool = True) -> Iterator[TextSegment]:
+        """Iterate over text segments of a file"""
+        if file_type == 'pdf':
+            return DocumentLoader._iter_pdf(fileobj, parallel)
+        if file_type in ['txt', 'md']:
+            return DocumentLoader._iter_plain(fileobj)
+        if file_type == 'docx':
+            return DocumentLoader._iter_docx(fileobj)
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    @staticmethod
+    def _iter_pdf(fileobj: BinaryIO, parallel: bool) -> Iterator[TextSegment]:
+        pdf_reader = PyPDF2.PdfReader(fileobj)
+        page_count = len(pdf_reader.pages)
+        pool = None
+        if parallel and page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+            pool = DocumentLoader.get_process_pool()
+
+        if pool is None:
+            for page_number, page in enumerate(pdf_reader.pages, start=1):
+                text = page.extract_text()
+                if text:
+                    yield TextSegment(text + "\n", page_number)
+            return
+
+        yield from DocumentLoader._iter_pdf_parallel(pool, fileobj, page_count)
+
+    @staticmethod
+    def _iter_pdf_parallel(pool: ProcessPoolExecutor, fileobj: BinaryIO, page_count: int) -> Iterator[TextSegment]:
+        """Extract page windows in worker processes, yielding pages in document order"""
+        # Workers reopen the PDF by path; spooled uploads without one are copied to disk first
+        path = getattr(fileobj, 'name', None)
+        temp_path = None
+        if not isinstance(path, str) or not os.path.isfile(path):
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+                fileobj.seek(0)
+                shutil.copyfileobj(fileobj, temp_file)
+                temp_path = path = temp_file.name
+
+        window = settings.PDF_PAGES_PER_TASK
+        starts = iter(range(0, page_count, window))
+        pending = deque()
+        try:
+            # Keep a bounded number of windows in flight so memory does not grow with page count
+            for start in itertools.islice(starts, settings.EXTRACTION_PROCESSES * 2):
+                pending.append((start, pool.submit(_extract_pdf_pages, path, start, min(start + window, page_count))))
+            while pending:
+                start, future = pending.popleft()
+                texts = future.result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    pending.append((next_start, pool.submit(
+                        _extract_pdf_pages, path, next_start, min(next_start + window, page_count)
+                    )))
+                for page_number, text in enumerate(texts, start=start + 1):
+                    if text:
+                        yield TextSegment(text + "\n", page_number)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            if temp_path is not None:
+                os.unlink(temp_path)
+
+    @staticmethod
+    def _iter_docx(fileobj: BinaryIO) -> Iterator[TextSegment]:
+        doc = docx.Document(fileobj)
+        for para in doc.paragraphs:
+            if para.text:
+                yield TextSegment(para.text + "\n")
+
+    @staticmethod
+    def _iter_plain(fileobj: BinaryIO) -> Iterator[TextSegment]:
+        """Decode as UTF-8, switching to TEXT_FALLBACK_ENCODING at the first invalid byte"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        fallback = False
+        bom_checked = False
+        while True:
+            block = fileobj.read(TEXT_READ_SIZE)
+            if not bom_checked:
+                # Drop a BOM once up front, so the error offsets below count from the text bytes
+                bom_checked = True
+                while 0 < len(block) < len(codecs.BOM_UTF8):
+                    more = fileobj.read(TEXT_READ_SIZE)
+                    if not more:
+                        break
+                    block += more
+                if block.startswith(codecs.BOM_UTF8):
+                    block = block[len(codecs.BOM_UTF8):] or fileobj.read(TEXT_READ_SIZE)
+            # Bytes of a multi-byte character split across blocks are held in the decoder
+            buffered, _ = decoder.getstate()
+            try:
+                text = decoder.decode(block, final=not block)
+            except UnicodeDecodeError as e:
+                if fallback:
+                    raise
+                logger.warning(f"File is not valid UTF-8, decoding as {settings.TEXT_FALLBACK_ENCODING}")
+                fallback = True
+                # Everything before the invalid byte is still valid UTF-8
+                data = buffered + block
+                text = data[:e.start].decode('utf-8')
+                decoder = codecs.getincrementaldecoder(settings.TEXT_FALLBACK_ENCODING)(errors='replace')
+                text += decoder.decode(data[e.start:], final=not block)
+            if text:
+                yield TextSegment(text)
+            if not block:
+                break
+
+    @staticmethod
+    def has_text(fileobj: BinaryIO, file_type: str) -> bool:
+        """Check that at least one non-blank segment can be extracted"""
+        fileobj.seek(0)
+        try:
+            segments = DocumentLoader.iter_text(fileobj, file_type, parallel=False)
+            return DocumentLoader.first_text(segments) is not None
+        finally:
+            fileobj.seek(0)
+
+    @staticmethod
+    def first_text(segments: Iterator[TextSegment]) -> Optional[str]:
+        """Return the text of the first non-blank segment, or None"""
+        segment = next(itertools.dropwhile(lambda segment: not segment.text.strip(), segments), None)
+        return segment.text if segment is not None else None
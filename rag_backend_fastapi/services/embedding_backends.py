@@ -0,0 +1,129 @@
+"""Embedding Backends - Models behind EmbeddingService: PyTorch sentence-transformers or ONNX Runtime"""
+import json
+import logging
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Values of EMBEDDING_BACKEND
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+# Files written into EMBEDDING_ONNX_PATH by export_onnx.py
+ONNX_MODEL_FILE = 'model.onnx'
+ONNX_INT8_MODEL_FILE = 'model_int8.onnx'
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+def _read_json(path: Path) -> dict:
+    return json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+
+
+class OnnxEmbedder:
+    """Sentence embeddings from an ONNX export of a sentence-transformers model
+
+    Runs the transformer with ONNX Runtime and applies the model's mean pooling and
+    normalization in NumPy, so PyTorch need not be installed. Provides the part of the
+    SentenceTransformer interface EmbeddingService uses (`encode`, `tokenizer`,
+    `max_seq_length`) and reads only from the local export directory.
+    """
+
+    def __init__(self, path: Path, model_file: str = ONNX_MODEL_FILE, threads: int = 0):
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime is not installed. Install it with: pip install onnxruntime")
+        from transformers import AutoTokenizer
+
+        path = Path(path)
+        if not (path / model_file).exists():
+            raise FileNotFoundError(f"ONNX model not found: {path / model_file}. Export it with export_onnx.py")
+
+        pooling = _read_json(path / '1_Pooling' / 'config.json')
+        # Older sentence-transformers write one flag per mode, newer ones a single name
+        mean_pooling = pooling.get('pooling_mode') == 'mean' or pooling.get('pooling_mode_mean_tokens')
+        if pooling and not mean_pooling:
+            raise ValueError(f"Only mean pooling models are supported, got {pooling}")
+        modules = _read_json(path / 'modules.json') or []
+        self.normalize = any(module.get('type', '').endswith('Normalize') for module in modules)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(path), local_files_only=True)
+        self.max_seq_length = _read_json(path / 'sentence_bert_config.json').get(
+            'max_seq_length', self.tokenizer.model_max_length
+        )
+
+        options = onnxruntime.SessionOptions()
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self._session = onnxruntime.InferenceSession(
+            str(path / model_file),
+            options,
+            providers=['CPUExecutionProvider']
+        )
+        self._input_names = [model_input.name for model_input in self._session.get_inputs()]
+        self._dimension = self._session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors='np'
+        )
+        mask = encoded['attention_mask'].astype(np.int64)
+        inputs = {
+            name: encoded[name].astype(np.int64) if name in encoded else np.zeros_like(mask)
+            for name in self._input_names
+        }
+        token_embeddings = self._session.run(None, inputs)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32, copy=False)
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        convert_to_numpy: bool = True,
+        show_progress_bar: bool = False,
+        **kwargs
+    ) -> np.ndarray:
+        """Embed a text or a list of texts (batched longest first, like SentenceTransformer)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        embeddings = np.empty((len(texts), self._dimension), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([texts[idx] for idx in batch])
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(backend: str = None, threads: int = 0):
+    """Load the embedding model of `backend` (default EMBEDDING_BACKEND)
+
+    `threads` caps the model's intra-op threads (0 keeps the library default).
+    """
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == 'torch':
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        return SentenceTransformer(settings.EMBEDDING_MODEL)
+    if backend in ('onnx', 'onnx-int8'):
+        model_file = ONNX_INT8_MODEL_FILE if backend == 'onnx-int8' else ONNX_MODEL_FILE
+        return OnnxEmbedder(settings.EMBEDDING_ONNX_PATH, model_file, threads)
+    raise ValueError(f"Unsupported embedding backend: {backend}. Choose one of {EMBEDDING_BACKENDS}")
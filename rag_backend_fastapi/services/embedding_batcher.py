@@ -0,0 +1,125 @@
+"""Embedding Batcher - Coalesce concurrent single-text encodes into one batch"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from .executor_service import ExecutorBusyError
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """Collects texts for up to max_wait_ms (or max_batch_size items) and encodes them together"""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], List[List[float]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        retry_after: int = 1
+    ):
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size must be greater than 0")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must be non-negative")
+
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._retry_after = retry_after
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batch_sizes = Metrics.histogram('embedding.batch_size', BATCH_SIZE_BUCKETS)
+        self._queue_wait = Metrics.histogram('embedding.queue_wait_ms')
+        self._encode_time = Metrics.histogram('embedding.batch_encode_ms')
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding; the future resolves to its vector"""
+        self._ensure_started()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((text, future, time.perf_counter()))
+        except queue.Full:
+            raise ExecutorBusyError('embedding', self._retry_after)
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='rag-embedding-batcher',
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _collect_batch(self, first) -> List:
+        """Gather more items until the batch is full or the first item's wait expires"""
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect_batch(first)
+
+            started = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self._queue_wait.observe((started - enqueued_at) * 1000)
+            self._batch_sizes.observe(len(batch))
+
+            try:
+                vectors = self._encode_fn([text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"Batched embedding failed: {str(e)}", exc_info=True)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            self._encode_time.observe((time.perf_counter() - started) * 1000)
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def stats(self) -> Dict:
+        """Get batching statistics"""
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'queue_depth': self._queue.qsize(),
+            'batch_size': self._batch_sizes.snapshot(),
+            'queue_wait_ms': self._queue_wait.snapshot(),
+            'batch_encode_ms': self._encode_time.snapshot()
+        }
+
+    def shutdown(self):
+        """Stop the worker thread after draining queued items"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._thread = None
@@ -0,0 +1,284 @@
+"""Embedding Cache - LRU/TTL cache for embeddings with optional SQLite tier"""
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-memory LRU backed by an optional SQLite file"""
+
+    def __init__(
+        self,
+        namespace: str,
+        max_size: int = 10000,
+        ttl_seconds: float = 0,
+        db_path: Optional[Path] = None,
+        lowercase: bool = False,
+        disk_max_entries: int = 0
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size must be greater than 0")
+
+        self.namespace = namespace
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.lowercase = lowercase
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        # Memory tier lock; SQLite calls hold only _db_lock, so memory lookups never wait on disk
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._puts_since_prune = 0
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+        if db_path is not None:
+            self._open_db(Path(db_path))
+
+    def _open_db(self, db_path: Path):
+        try:
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings(created_at)"
+            )
+            self._conn.commit()
+            logger.info(f"Embedding cache disk tier opened at {db_path}")
+        except Exception as e:
+            logger.error(f"Could not open embedding cache at {db_path}: {str(e)}", exc_info=True)
+            self._conn = None
+
+    def normalize(self, text: str) -> str:
+        """Normalize text so trivially different inputs share an entry"""
+        text = unicodedata.normalize('NFC', text)
+        text = _WHITESPACE_RE.sub(' ', text).strip()
+        return text.lower() if self.lowercase else text
+
+    def make_key(self, text: str) -> str:
+        """Build cache key from namespace (model name) and normalized text"""
+        raw = f"{self.namespace}\x00{self.normalize(text)}".encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    @property
+    def persistent(self) -> bool:
+        """Whether lookups and stores may touch the SQLite tier"""
+        return self._conn is not None
+
+    def _get_memory(self, key: str, now: float) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, created_at = entry
+            if self._is_expired(created_at, now):
+                del self._entries[key]
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def get_memory(self, text: str) -> Optional[np.ndarray]:
+        """Look up the in-memory tier only; never blocks on SQLite, and a miss is not counted"""
+        return self._get_memory(self.make_key(text), time.time())
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Look up an embedding, returning a float32 array or None"""
+        key = self.make_key(text)
+        now = time.time()
+        vector = self._get_memory(key, now)
+        if vector is not None:
+            return vector
+
+        row = None
+        with self._db_lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+        with self._lock:
+            if row is not None and not self._is_expired(row[1], now):
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._store_memory(key, vector, row[1])
+                self._hits += 1
+                self._disk_hits += 1
+                return vector
+            self._misses += 1
+            return None
+
+    def put(self, text: str, vector) -> np.ndarray:
+        """Store an embedding; returns the compact float32 copy that was cached"""
+        key = self.make_key(text)
+        array = np.ascontiguousarray(vector, dtype=np.float32)
+        array.setflags(write=False)
+        now = time.time()
+
+        with self._lock:
+            self._store_memory(key, array, now)
+        with self._db_lock:
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                        (key, array.tobytes(), now)
+                    )
+                    self._conn.commit()
+                    self._maybe_prune_disk()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist embedding cache entry: {str(e)}")
+        return array
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up several embeddings, reading misses from disk in one query"""
+        keys = [self.make_key(text) for text in texts]
+        now = time.time()
+        found: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                vector, created_at = entry
+                if self._is_expired(created_at, now):
+                    del self._entries[key]
+                    self._expirations += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        rows = []
+        with self._db_lock:
+            if missing and self._conn is not None:
+                # Stay well under SQLite's bound-parameter limit
+                for i in range(0, len(missing), 500):
+                    part = missing[i:i + 500]
+                    rows.extend(self._conn.execute(
+                        f"SELECT key, vector, created_at FROM embeddings WHERE key IN ({', '.join('?' for _ in part)})",
+                        part
+                    ).fetchall())
+
+        with self._lock:
+            for key, blob, created_at in rows:
+                if not self._is_expired(created_at, now):
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._store_memory(key, vector, created_at)
+                    found[key] = vector
+                    self._disk_hits += 1
+            vectors = [found.get(key) for key in keys]
+            hits = sum(vector is not None for vector in vectors)
+            self._hits += hits
+            self._misses += len(vectors) - hits
+        return vectors
+
+    def put_many(self, texts: List[str], vectors) -> List[np.ndarray]:
+        """Store several embeddings in one disk transaction; returns the cached float32 copies"""
+        arrays = []
+        rows = []
+        now = time.time()
+        for text, vector in zip(texts, vectors):
+            array = np.ascontiguousarray(vector, dtype=np.float32)
+            array.setflags(write=False)
+            arrays.append(array)
+            rows.append((self.make_key(text), array.tobytes(), now))
+
+        with self._lock:
+            for (key, _, _), array in zip(rows, arrays):
+                self._store_memory(key, array, now)
+        with self._db_lock:
+            if self._conn is not None and rows:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                        rows
+                    )
+                    self._conn.commit()
+                    self._puts_since_prune += len(rows) - 1
+                    self._maybe_prune_disk()
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to persist embedding cache entries: {str(e)}")
+        return arrays
+
+    def _store_memory(self, key: str, vector: np.ndarray, created_at: float):
+        self._entries[key] = (vector, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def _maybe_prune_disk(self):
+        """Drop expired and overflow rows from the disk tier every few hundred writes (under _db_lock)"""
+        self._puts_since_prune += 1
+        if self._puts_since_prune < 500:
+            return
+        self._puts_since_prune = 0
+        if self.ttl_seconds > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE created_at < ?",
+                (time.time() - self.ttl_seconds,)
+            )
+        if self.disk_max_entries > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                "SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,)
+            )
+        self._conn.commit()
+
+    def clear(self):
+        """Remove all entries from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+
+    def stats(self) -> Dict:
+        """Get hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'persistent': self.persistent,
+                'hits': self._hits,
+                'disk_hits': self._disk_hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        """Close the disk tier"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
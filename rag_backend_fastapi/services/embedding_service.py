@@ -1,57 +1,341 @@
 """Embedding Service - Generate embeddings using HuggingFace"""
+import asyncio
 import logging
-from typing import List
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
-from sentence_transformers import SentenceTransformer
+import numpy as np
 
 from config import settings
+from .embedding_backends import load_embedding_model
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache
+from .executor_service import ExecutorService
 
 logger = logging.getLogger(__name__)
 
+# Model of an encoding worker process, loaded once by its initializer
+_worker_model = None
+# Stand-in text for warm-up encodes
+_WARMUP_TEXT = "Warm-up query for the embedding model."
+
+
+def _init_encode_worker(backend: str, threads: int):
+    """Load the embedding model in an encoding worker process"""
+    global _worker_model
+    # Workers share the machine's cores instead of each starting one thread per core
+    _worker_model = load_embedding_model(backend, threads)
+
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    """Encode texts in an encoding worker process"""
+    embeddings = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return embeddings.astype(np.float32, copy=False)
+
 
 class EmbeddingService:
-    """Service for generating text embeddings using sentence transformers"""
+    """Service for generating text embeddings using sentence transformers
+
+    The model runs on the EMBEDDING_BACKEND: PyTorch, or an ONNX Runtime export (see
+    embedding_backends).
+    """
     _model = None
+    _model_lock = threading.Lock()
+    _batcher = None
+    _cache = None
+    _chunk_cache = None
+    _process_pool: Optional[ProcessPoolExecutor] = None
 
     @classmethod
     def get_model(cls):
-        """Lazy load embedding model"""
+        """Lazy load embedding model (once, also when startup warm-up and requests race)"""
         if cls._model is None:
-            try:
-                logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL}")
-                cls._model = SentenceTransformer(settings.EMBEDDING_MODEL)
-                logger.info("Embedding model loaded successfully")
-            except Exception as e:
-                logger.error(f"Failed to load embedding model: {str(e)}", exc_info=True)
-                raise Exception(f"Failed to load embedding model: {str(e)}")
+            with cls._model_lock:
+                if cls._model is None:
+                    try:
+                        logger.info(f"Loading embedding model: {settings.EMBEDDING_MODEL} ({settings.EMBEDDING_BACKEND})")
+                        cls._model = load_embedding_model()
+                        logger.info("Embedding model loaded successfully")
+                    except Exception as e:
+                        logger.error(f"Failed to load embedding model: {str(e)}", exc_info=True)
+                        raise Exception(f"Failed to load embedding model: {str(e)}")
         return cls._model
 
+    @classmethod
+    def get_process_pool(cls) -> Optional[ProcessPoolExecutor]:
+        """Lazy create the bulk encoding process pool (None when EMBEDDING_PROCESSES is 0)"""
+        if cls._process_pool is None and settings.EMBEDDING_PROCESSES > 0:
+            threads = settings.EMBEDDING_PROCESS_THREADS or max(1, (os.cpu_count() or 1) // settings.EMBEDDING_PROCESSES)
+            # spawn: forking a process that already runs model and batcher threads is unsafe
+            cls._process_pool = ProcessPoolExecutor(
+                max_workers=settings.EMBEDDING_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_encode_worker,
+                initargs=(settings.EMBEDDING_BACKEND, threads)
+            )
+            logger.info(
+                f"Embedding process pool started ({settings.EMBEDDING_PROCESSES} processes, "
+                f"{threads} threads each)"
+            )
+        return cls._process_pool
+
+    @classmethod
+    def cache_namespace(cls) -> str:
+        """Key space of stored vectors: backends other than torch give slightly different vectors"""
+        if settings.EMBEDDING_BACKEND == 'torch':
+            return settings.EMBEDDING_MODEL
+        return f"{settings.EMBEDDING_MODEL}:{settings.EMBEDDING_BACKEND}"
+
+    @classmethod
+    def get_batcher(cls) -> EmbeddingBatcher:
+        """Lazy create the micro-batching scheduler for query embeddings"""
+        if cls._batcher is None:
+            cls._batcher = EmbeddingBatcher(
+                cls._encode_batch,
+                max_batch_size=settings.EMBEDDING_BATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_BATCH_MAX_WAIT_MS,
+                max_queue_size=settings.EMBEDDING_BATCH_QUEUE_SIZE,
+                retry_after=settings.BUSY_RETRY_AFTER_SECONDS
+            )
+        return cls._batcher
+
+    @classmethod
+    def get_cache(cls) -> Optional[EmbeddingCache]:
+        """Lazy create the query embedding cache (None when disabled)"""
+        if cls._cache is None and settings.EMBEDDING_CACHE_ENABLED:
+            cls._cache = EmbeddingCache(
+                namespace=cls.cache_namespace(),
+                max_size=settings.EMBEDDING_CACHE_SIZE,
+                ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+                db_path=settings.EMBEDDING_CACHE_PATH if settings.EMBEDDING_CACHE_PERSIST else None,
+                lowercase=settings.EMBEDDING_CACHE_LOWERCASE,
+                disk_max_entries=settings.EMBEDDING_CACHE_DISK_MAX_ENTRIES
+            )
+        return cls._cache
+
+    @classmethod
+    def get_chunk_cache(cls) -> Optional[EmbeddingCache]:
+        """Lazy open the chunk vector store keyed by chunk text hash (None when disabled)"""
+        if cls._chunk_cache is None and settings.CHUNK_VECTOR_CACHE_ENABLED:
+            cls._chunk_cache = EmbeddingCache(
+                namespace=cls.cache_namespace(),
+                max_size=settings.CHUNK_VECTOR_CACHE_SIZE,
+                db_path=settings.CHUNK_VECTOR_CACHE_PATH,
+                disk_max_entries=settings.CHUNK_VECTOR_CACHE_MAX_ENTRIES
+            )
+        return cls._chunk_cache
+
+    @classmethod
+    def _encode_batch(cls, texts: List[str]) -> List[List[float]]:
+        """Encode a micro-batch in a single forward pass"""
+        model = cls.get_model()
+        embeddings = model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return embeddings.tolist()
+
+    @classmethod
+    def submit_embedding(cls, text: str) -> Future:
+        """Queue a text on the batcher; the future resolves to its embedding"""
+        if not text or not text.strip():
+            raise ValueError("Text cannot be empty")
+        return cls.get_batcher().submit(text)
+
     @classmethod
     def generate_embedding(cls, text: str) -> List[float]:
         """Generate embedding for a single text"""
         if not text or not text.strip():
             raise ValueError("Text cannot be empty")
         
-        model = cls.get_model()
-        embedding = model.encode(text, convert_to_numpy=True, show_progress_bar=False)
-        return embedding.tolist()
+        cache = cls.get_cache()
+        if cache is not None:
+            cached = cache.get(text)
+            if cached is not None:
+                return cached.tolist()
+        
+        if settings.EMBEDDING_BATCHING_ENABLED:
+            embedding = cls.submit_embedding(text).result()
+        else:
+            model = cls.get_model()
+            embedding = model.encode(text, convert_to_numpy=True, show_progress_bar=False).tolist()
+        
+        if cache is not None:
+            cache.put(text, embedding)
+        return embedding
+
+    @classmethod
+    async def generate_embedding_async(cls, text: str) -> List[float]:
+        """Generate embedding without blocking the event loop"""
+        if not settings.EMBEDDING_BATCHING_ENABLED:
+            return await ExecutorService.run_cpu(cls.generate_embedding, text)
+        
+        cache = cls.get_cache()
+        if cache is not None:
+            # Only the in-memory tier is read on the event loop; SQLite goes to the I/O pool
+            cached = cache.get_memory(text)
+            if cached is None:
+                cached = await ExecutorService.run_io(cache.get, text) if cache.persistent else cache.get(text)
+            if cached is not None:
+                return cached.tolist()
+        
+        embedding = await asyncio.wrap_future(cls.submit_embedding(text))
+        if cache is not None:
+            if cache.persistent:
+                await ExecutorService.run_io(cache.put, text, embedding)
+            else:
+                cache.put(text, embedding)
+        return embedding
 
     @classmethod
-    def generate_embeddings_batch(cls, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts"""
+    def generate_embeddings_batch(cls, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for multiple texts as a float32 (len(texts), dimension) array
+
+        Texts are encoded longest first, so each model batch holds texts of similar
+        length and little padding. With EMBEDDING_PROCESSES, calls of at least one batch
+        per worker are spread over the encoding process pool.
+        """
         if not texts:
             raise ValueError("Texts list cannot be empty")
         
-        model = cls.get_model()
-        embeddings = model.encode(
-            texts,
+        batch_size = settings.EMBEDDING_ENCODE_BATCH_SIZE
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        ordered = [texts[idx] for idx in order]
+        
+        pool = None
+        if settings.EMBEDDING_PROCESSES > 0 and len(texts) >= settings.EMBEDDING_PROCESSES * batch_size:
+            pool = cls.get_process_pool()
+        if pool is None:
+            embeddings = cls.get_model().encode(
+                ordered,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
+        else:
+            # Whole batches of neighbouring lengths, several per worker so the slower
+            # (longer) slices do not leave the other workers idle at the end
+            slices = settings.EMBEDDING_PROCESSES * 4
+            step = max(batch_size, -(-len(ordered) // slices // batch_size) * batch_size)
+            futures = [
+                pool.submit(_encode_in_worker, ordered[start:start + step], batch_size)
+                for start in range(0, len(ordered), step)
+            ]
+            embeddings = np.concatenate([future.result() for future in futures])
+        
+        result = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+        result[order] = embeddings
+        return result
+
+    @classmethod
+    def embed_chunks(cls, texts: List[str]) -> np.ndarray:
+        """Embeddings of document chunks as a float32 array, reusing stored vectors of identical chunk text
+
+        Only texts missing from the chunk vector store go through the model, in one batch.
+        """
+        cache = cls.get_chunk_cache()
+        if cache is None:
+            return cls.generate_embeddings_batch(texts)
+        
+        vectors = cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, cache.put_many(missing, cls.generate_embeddings_batch(missing))))
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.stack(vectors)
+
+    @classmethod
+    def warm_up(cls) -> List[float]:
+        """Run the model on a query and on a batch of full-length chunks; returns the query embedding
+
+        The first forward passes allocate kernels and buffers. The query goes through the
+        batcher (when enabled) so its thread is started too; nothing is cached.
+        """
+        if settings.EMBEDDING_BATCHING_ENABLED:
+            embedding = cls.submit_embedding(_WARMUP_TEXT).result()
+        else:
+            embedding = cls._encode_batch([_WARMUP_TEXT])[0]
+        # Longer than the model window, so the longest sequences are allocated
+        chunk = ' '.join([_WARMUP_TEXT] * (cls.max_tokens() // 4))
+        cls.get_model().encode(
+            [chunk] * settings.EMBEDDING_ENCODE_BATCH_SIZE,
+            batch_size=settings.EMBEDDING_ENCODE_BATCH_SIZE,
             convert_to_numpy=True,
-            show_progress_bar=len(texts) > 10
+            show_progress_bar=False
         )
-        return embeddings.tolist()
+        return embedding
+
+    @classmethod
+    def warm_up_processes(cls):
+        """Start every encoding worker process and wait for its model to load"""
+        pool = cls.get_process_pool()
+        if pool is None:
+            return
+        futures = [pool.submit(_encode_in_worker, [_WARMUP_TEXT], 1) for _ in range(settings.EMBEDDING_PROCESSES)]
+        for future in futures:
+            future.result()
+
+    @classmethod
+    def token_spans(cls, text: str) -> List[Tuple[int, int]]:
+        """Character span of each model token in text (without special tokens)"""
+        tokenizer = cls.get_model().tokenizer
+        encoding = tokenizer(
+            text,
+            add_special_tokens=False,
+            return_offsets_mapping=True,
+            verbose=False
+        )
+        return encoding['offset_mapping']
+
+    @classmethod
+    def max_tokens(cls) -> int:
+        """Text tokens the model embeds before truncating: its window minus [CLS] and [SEP]"""
+        return cls.get_model().max_seq_length - 2
 
     @classmethod
     def get_embedding_dimension(cls) -> int:
         """Get embedding dimension"""
         return settings.EMBEDDING_DIMENSION
 
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Get embedding statistics"""
+        stats = {
+            'backend': settings.EMBEDDING_BACKEND,
+            'batching_enabled': settings.EMBEDDING_BATCHING_ENABLED,
+            'processes': settings.EMBEDDING_PROCESSES if cls._process_pool is not None else 0
+        }
+        if cls._batcher is not None:
+            stats['batcher'] = cls._batcher.stats()
+        if cls._cache is not None:
+            stats['cache'] = cls._cache.stats()
+        if cls._chunk_cache is not None:
+            stats['chunk_cache'] = cls._chunk_cache.stats()
+        return stats
+
+    @classmethod
+    def shutdown(cls):
+        """Stop background workers"""
+        if cls._batcher is not None:
+            cls._batcher.shutdown()
+            cls._batcher = None
+        if cls._cache is not None:
+            cls._cache.close()
+            cls._cache = None
+        if cls._chunk_cache is not None:
+            cls._chunk_cache.close()
+            cls._chunk_cache = None
+        if cls._process_pool is not None:
+            cls._process_pool.shutdown(wait=False, cancel_futures=True)
+            cls._process_pool = None
+
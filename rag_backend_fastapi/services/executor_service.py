@@ -0,0 +1,144 @@
+"""Executor Service - Bounded worker pools for blocking RAG stages"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusyError(Exception):
+    """Raised when a worker pool queue is full"""
+
+    def __init__(self, pool_name: str, retry_after: int):
+        super().__init__(f"{pool_name} pool is saturated, retry after {retry_after}s")
+        self.pool_name = pool_name
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """Thread pool that rejects work instead of queueing without limit"""
+
+    def __init__(self, name: str, max_workers: int, queue_size: int):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        if queue_size < 0:
+            raise ValueError("queue_size must be non-negative")
+
+        self.name = name
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"rag-{name}"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func in the pool, raising ExecutorBusyError when saturated"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ExecutorBusyError(self.name, settings.BUSY_RETRY_AFTER_SECONDS)
+
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict:
+        """Get pool occupancy statistics"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'queue_size': self.queue_size,
+                'pending': self._pending,
+                'rejected': self._rejected
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the underlying thread pool"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class ExecutorService:
+    """Separate pools for CPU-bound and I/O-bound pipeline stages"""
+    _cpu_pool: Optional[BoundedExecutor] = None
+    _io_pool: Optional[BoundedExecutor] = None
+
+    @classmethod
+    def initialize(cls):
+        """Create worker pools from settings"""
+        if cls._cpu_pool is not None:
+            logger.debug("Executor pools already initialized")
+            return
+
+        cls._cpu_pool = BoundedExecutor(
+            'cpu', settings.CPU_POOL_SIZE, settings.CPU_QUEUE_SIZE
+        )
+        cls._io_pool = BoundedExecutor(
+            'io', settings.IO_POOL_SIZE, settings.IO_QUEUE_SIZE
+        )
+        logger.info(
+            f"Executor pools initialized (cpu={settings.CPU_POOL_SIZE}, "
+            f"io={settings.IO_POOL_SIZE})"
+        )
+
+    @classmethod
+    def get_cpu_pool(cls) -> BoundedExecutor:
+        """Get pool for CPU-bound work (parsing, splitting, embedding)"""
+        if cls._cpu_pool is None:
+            cls.initialize()
+        return cls._cpu_pool
+
+    @classmethod
+    def get_io_pool(cls) -> BoundedExecutor:
+        """Get pool for blocking network calls (Firestore, ChromaDB, LLM)"""
+        if cls._io_pool is None:
+            cls.initialize()
+        return cls._io_pool
+
+    @classmethod
+    async def run_cpu(cls, func: Callable, *args, **kwargs) -> Any:
+        """Run a CPU-bound callable on the CPU pool"""
+        return await cls.get_cpu_pool().run(func, *args, **kwargs)
+
+    @classmethod
+    async def run_io(cls, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking I/O callable on the I/O pool"""
+        return await cls.get_io_pool().run(func, *args, **kwargs)
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Get statistics for all pools"""
+        return {
+            'cpu': cls.get_cpu_pool().stats(),
+            'io': cls.get_io_pool().stats()
+        }
+
+    @classmethod
+    def shutdown(cls):
+        """Shut down all pools"""
+        for pool in (cls._cpu_pool, cls._io_pool):
+            if pool is not None:
+                pool.shutdown(wait=False)
+        cls._cpu_pool = None
+        cls._io_pool = None
+        logger.info("Executor pools shut down")
@@ -2,12 +2,14 @@
 import logging
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
 
 from config import settings
+from .firestore_bulk_writer import FirestoreBulkWriter
+from .vector_codec import decode_vector, encode_vector, vector_encoding_of
 
 logger = logging.getLogger(__name__)
 
@@ -126,70 +128,179 @@ class FirebaseService:
             return doc.to_dict()
         return None
 
+    @classmethod
+    def update_document_metadata(cls, doc_id: str, fields: Dict):
+        """Merge fields into an existing document's metadata"""
+        db = cls.get_db()
+        db.collection('documents').document(doc_id).update(fields)
+
+    @classmethod
+    def find_documents(cls, field: str, value, owner: Optional[str] = None) -> List[Dict]:
+        """Documents of an owner whose metadata `field` equals `value`, most recently uploaded first
+
+        Filtering by owner and ordering happen here, so the query needs no composite index.
+        """
+        db = cls.get_db()
+        documents = []
+        for snapshot in db.collection('documents').where(field, '==', value).stream():
+            data = snapshot.to_dict()
+            if data.get('owner') == owner:
+                documents.append({'doc_id': snapshot.id, **data})
+        # Server timestamps come back as datetimes; documents without one sort last
+        documents.sort(
+            key=lambda document: document['uploaded_at'].timestamp() if document.get('uploaded_at') else 0.0,
+            reverse=True
+        )
+        return documents
+
     @classmethod
     def delete_document(cls, doc_id: str):
         """Delete document and all its chunks from Firestore"""
         db = cls.get_db()
-        # Delete document
-        db.collection('documents').document(doc_id).delete()
-        # Delete all chunks for this document
-        chunks_ref = db.collection('chunks').where('doc_id', '==', doc_id)
-        for chunk in chunks_ref.stream():
-            chunk.reference.delete()
+        with FirestoreBulkWriter(db) as writer:
+            writer.delete(db.collection('documents').document(doc_id))
+            # Select no fields: only the references are needed, not the vectors
+            chunks_ref = db.collection('chunks').where('doc_id', '==', doc_id).select([])
+            for chunk in chunks_ref.stream():
+                writer.delete(chunk.reference)
+        stats = writer.stats()
+        logger.info(
+            f"Deleted document {doc_id} from Firestore: {stats['writes']} writes in "
+            f"{stats['batches']} batches ({stats['writes_per_second']} writes/s)"
+        )
 
     # ========== Firestore - Chunks Collection ==========
 
     @classmethod
-    def save_chunks(cls, doc_id: str, chunks: List[Dict]):
-        """Save chunks with vectors to Firestore chunks/ collection"""
+    def save_chunks(cls, doc_id: str, chunks: List[Dict], start_index: int = 0) -> List[str]:
+        """Save chunks with vectors to Firestore chunks/ collection, returning their IDs"""
         db = cls.get_db()
-        batch = db.batch()
+        chunk_ids = []
         
-        for idx, chunk_data in enumerate(chunks):
-            chunk_ref = db.collection('chunks').document()
-            chunk_doc = {
-                'doc_id': doc_id,
-                'chunk_text': chunk_data['text'],
-                'vector': chunk_data['vector'],
-                'index': idx,
-                'created_at': firestore.SERVER_TIMESTAMP
-            }
-            batch.set(chunk_ref, chunk_doc)
+        with FirestoreBulkWriter(db) as writer:
+            for idx, chunk_data in enumerate(chunks, start=start_index):
+                # Same deterministic ID as the ChromaDB record, so retries overwrite instead of duplicating
+                chunk_ref = db.collection('chunks').document(f"{doc_id}_{idx}")
+                chunk_doc = {
+                    'doc_id': doc_id,
+                    'chunk_text': chunk_data['text'],
+                    'index': idx,
+                    'created_at': firestore.SERVER_TIMESTAMP
+                }
+                chunk_doc.update(encode_vector(chunk_data['vector'], settings.FIRESTORE_VECTOR_ENCODING))
+                for key in ('page', 'page_end', 'start', 'end', 'content_hash'):
+                    if key in chunk_data:
+                        chunk_doc[key] = chunk_data[key]
+                writer.set(chunk_ref, chunk_doc)
+                chunk_ids.append(chunk_ref.id)
         
-        batch.commit()
+        stats = writer.stats()
+        logger.debug(
+            f"Saved {stats['writes']} chunks in {stats['batches']} batches "
+            f"({stats['writes_per_second']} writes/s)"
+        )
+        return chunk_ids
+
+    @classmethod
+    def delete_chunks(cls, chunk_ids: List[str]):
+        """Delete chunks by ID from Firestore chunks/ collection"""
+        if not chunk_ids:
+            return
+        db = cls.get_db()
+        with FirestoreBulkWriter(db) as writer:
+            for chunk_id in chunk_ids:
+                writer.delete(db.collection('chunks').document(chunk_id))
 
     @classmethod
     def get_chunks_by_ids(cls, chunk_ids: List[str]) -> List[Dict]:
-        """Get chunks by their Firestore document IDs"""
+        """Get chunks by their Firestore document IDs in one batched read"""
+        if not chunk_ids:
+            return []
         db = cls.get_db()
+        refs = [db.collection('chunks').document(chunk_id) for chunk_id in chunk_ids]
+        snapshots = {
+            snapshot.id: snapshot
+            for snapshot in db.get_all(refs, field_paths=['chunk_text', 'doc_id', 'index', 'start', 'end'])
+        }
         chunks = []
         for chunk_id in chunk_ids:
-            chunk_ref = db.collection('chunks').document(chunk_id)
-            chunk_doc = chunk_ref.get()
-            if chunk_doc.exists:
+            snapshot = snapshots.get(chunk_id)
+            if snapshot is not None and snapshot.exists:
+                chunk_data = snapshot.to_dict()
                 chunks.append({
                     'id': chunk_id,
-                    'text': chunk_doc.to_dict().get('chunk_text', ''),
-                    'doc_id': chunk_doc.to_dict().get('doc_id', ''),
-                    'index': chunk_doc.to_dict().get('index', 0)
+                    'text': chunk_data.get('chunk_text', ''),
+                    'doc_id': chunk_data.get('doc_id', ''),
+                    'index': chunk_data.get('index', 0),
+                    **{key: chunk_data[key] for key in ('start', 'end') if key in chunk_data}
                 })
         return chunks
 
     @classmethod
-    def get_all_chunks_for_doc(cls, doc_id: str) -> List[Dict]:
-        """Get all chunks for a document"""
+    def get_existing_chunk_ids(cls, chunk_ids: List[str]) -> Set[str]:
+        """Return which of the given chunk IDs still exist in Firestore (one batched read)"""
+        if not chunk_ids:
+            return set()
         db = cls.get_db()
-        chunks_ref = db.collection('chunks').where('doc_id', '==', doc_id).order_by('index')
-        chunks = []
-        for chunk in chunks_ref.stream():
-            chunk_data = chunk.to_dict()
-            chunks.append({
-                'id': chunk.id,
-                'text': chunk_data.get('chunk_text', ''),
-                'vector': chunk_data.get('vector', []),
-                'index': chunk_data.get('index', 0)
-            })
-        return chunks
+        refs = [db.collection('chunks').document(chunk_id) for chunk_id in chunk_ids]
+        return {
+            snapshot.id
+            for snapshot in db.get_all(refs, field_paths=['doc_id'])
+            if snapshot.exists
+        }
+
+    @classmethod
+    def migrate_vector_encoding(
+        cls,
+        encoding: str,
+        doc_id: Optional[str] = None,
+        page_size: int = 500,
+        dry_run: bool = False
+    ) -> Dict:
+        """Re-encode stored chunk vectors (e.g. legacy float lists) into `encoding`"""
+        db = cls.get_db()
+        query = db.collection('chunks')
+        if doc_id:
+            query = query.where('doc_id', '==', doc_id)
+        query = query.select(['vector', 'vector_encoding', 'vector_scale']).order_by('__name__')
+        stats = {'scanned': 0, 'migrated': 0, 'unchanged': 0, 'missing_vector': 0}
+        
+        with FirestoreBulkWriter(db) as writer:
+            last_snapshot = None
+            while True:
+                # Page through the collection so no single stream runs into the RPC deadline
+                page = query.limit(page_size)
+                if last_snapshot is not None:
+                    page = page.start_after(last_snapshot)
+                snapshots = list(page.stream())
+                if not snapshots:
+                    break
+                last_snapshot = snapshots[-1]
+                
+                for snapshot in snapshots:
+                    stats['scanned'] += 1
+                    data = snapshot.to_dict()
+                    current = vector_encoding_of(data)
+                    if current == encoding:
+                        stats['unchanged'] += 1
+                        continue
+                    vector = decode_vector(data)
+                    if vector is None:
+                        stats['missing_vector'] += 1
+                        continue
+                    fields = {
+                        'vector': firestore.DELETE_FIELD,
+                        'vector_encoding': firestore.DELETE_FIELD,
+                        'vector_scale': firestore.DELETE_FIELD,
+                        **encode_vector(vector, encoding)
+                    }
+                    stats['migrated'] += 1
+                    if not dry_run:
+                        writer.update(snapshot.reference, fields)
+        
+        stats.update(writer.stats())
+        logger.info(f"Vector encoding migration to {encoding}: {stats}")
+        return stats
 
     # ========== Firestore - History Collection ==========
 
@@ -0,0 +1,217 @@
+"""Firestore Bulk Writer - Split writes into compliant batches and commit them concurrently"""
+import datetime
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+
+from google.api_core import exceptions as google_exceptions
+
+from config import settings
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Per-document overhead Firestore adds on top of the name and fields
+DOCUMENT_OVERHEAD_BYTES = 32
+
+RETRYABLE_ERRORS = (
+    google_exceptions.Aborted,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+)
+
+
+class BulkWriteError(Exception):
+    """Raised when one or more batches could not be committed after retries"""
+
+
+def estimate_value_size(value) -> int:
+    """Approximate Firestore storage size of a field value"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime.datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(key.encode('utf-8')) + 1 + estimate_value_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_value_size(item) for item in value)
+    # Sentinels (SERVER_TIMESTAMP), references, geo points
+    return 16
+
+
+def estimate_document_size(path: str, data: Optional[Dict]) -> int:
+    """Approximate size of one write in a batch request"""
+    return len(path.encode('utf-8')) + DOCUMENT_OVERHEAD_BYTES + (estimate_value_size(data) if data else 0)
+
+
+class FirestoreBulkWriter:
+    """Queues set/delete writes, cuts them into batches under Firestore's count and size limits
+    and commits up to `max_concurrency` batches at a time.
+
+    Only idempotent writes (set with a known ID, update to fixed values, delete) are
+    queued, so a failed batch is simply committed again.
+    """
+
+    def __init__(
+        self,
+        db,
+        max_batch_writes: Optional[int] = None,
+        max_batch_bytes: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None
+    ):
+        self._db = db
+        self.max_batch_writes = max_batch_writes or settings.FIRESTORE_BATCH_MAX_WRITES
+        self.max_batch_bytes = max_batch_bytes or settings.FIRESTORE_BATCH_MAX_BYTES
+        self.max_concurrency = max_concurrency or settings.FIRESTORE_WRITE_CONCURRENCY
+        self.max_retries = settings.FIRESTORE_WRITE_MAX_RETRIES if max_retries is None else max_retries
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._writes: List[Tuple[str, object, Optional[Dict]]] = []
+        self._batch_bytes = 0
+        self._in_flight: Set[Future] = set()
+        self._errors: List[Exception] = []
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._stats = {'writes': 0, 'batches': 0, 'bytes': 0, 'retries': 0}
+        self._stats_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._shutdown()
+
+    def set(self, ref, data: Dict):
+        """Queue a full-document set"""
+        self._add('set', ref, data)
+
+    def update(self, ref, fields: Dict):
+        """Queue a partial update of existing fields"""
+        self._add('update', ref, fields)
+
+    def delete(self, ref):
+        """Queue a document delete"""
+        self._add('delete', ref, None)
+
+    def _add(self, op: str, ref, data: Optional[Dict]):
+        size = estimate_document_size(ref.path, data)
+        if size > self.max_batch_bytes:
+            raise BulkWriteError(f"Document {ref.path} is too large for a batch ({size} bytes)")
+        if self._writes and (
+            len(self._writes) >= self.max_batch_writes
+            or self._batch_bytes + size > self.max_batch_bytes
+        ):
+            self._submit_batch()
+        self._writes.append((op, ref, data))
+        self._batch_bytes += size
+
+    def _submit_batch(self):
+        if not self._writes:
+            return
+        writes, size = self._writes, self._batch_bytes
+        self._writes, self._batch_bytes = [], 0
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency, thread_name_prefix='firestore-bulk'
+            )
+        # Bound the number of batches held in memory
+        while len(self._in_flight) >= self.max_concurrency:
+            self._collect(wait(self._in_flight, return_when=FIRST_COMPLETED).done)
+        self._in_flight.add(self._executor.submit(self._commit, writes, size))
+
+    def _commit(self, writes: List[Tuple[str, object, Optional[Dict]]], size: int):
+        for attempt in range(self.max_retries + 1):
+            batch = self._db.batch()
+            for op, ref, data in writes:
+                if op == 'set':
+                    batch.set(ref, data)
+                elif op == 'update':
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            started = time.perf_counter()
+            try:
+                batch.commit()
+                Metrics.observe('firestore.batch_commit_ms', (time.perf_counter() - started) * 1000)
+                return len(writes), size
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0, settings.FIRESTORE_WRITE_RETRY_BASE_DELAY * (2 ** attempt))
+                logger.warning(f"Firestore batch of {len(writes)} writes failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                with self._stats_lock:
+                    self._stats['retries'] += 1
+                Metrics.increment('firestore.batch_retries')
+                time.sleep(delay)
+
+    def _collect(self, done: Set[Future]):
+        for future in done:
+            self._in_flight.discard(future)
+            try:
+                count, size = future.result()
+            except Exception as e:
+                self._errors.append(e)
+                continue
+            with self._stats_lock:
+                self._stats['writes'] += count
+                self._stats['batches'] += 1
+                self._stats['bytes'] += size
+
+    def flush(self):
+        """Commit all queued writes and wait for them; raises BulkWriteError on failure"""
+        if self._writes and not self._in_flight:
+            # A single batch is committed on the calling thread
+            writes, size = self._writes, self._batch_bytes
+            self._writes, self._batch_bytes = [], 0
+            future = Future()
+            try:
+                future.set_result(self._commit(writes, size))
+            except Exception as e:
+                future.set_exception(e)
+            self._collect({future})
+        self._submit_batch()
+        if self._in_flight:
+            self._collect(wait(self._in_flight).done)
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise BulkWriteError(
+                f"{len(errors)} Firestore batches failed: {str(errors[0]) or type(errors[0]).__name__}"
+            ) from errors[0]
+
+    def close(self) -> Dict:
+        """Flush, stop the commit threads and return throughput stats"""
+        try:
+            self.flush()
+        finally:
+            self._shutdown()
+            self._finished = time.perf_counter()
+        return self.stats()
+
+    def _shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        """Get write counters and throughput since the writer was created"""
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'seconds': round(elapsed, 3),
+            'writes_per_second': round(stats['writes'] / elapsed, 1) if elapsed > 0 else 0.0
+        }
@@ -0,0 +1,335 @@
+"""Job Service - Background document ingestion with SQLite-persisted job state"""
+import asyncio
+import functools
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Set
+
+from config import settings
+from .document_loader import DocumentLoader
+from .executor_service import ExecutorBusyError, ExecutorService
+from .firebase_service import FirebaseService
+
+logger = logging.getLogger(__name__)
+
+JOB_COLUMNS = [
+    'id', 'doc_id', 'filename', 'file_type', 'file_size', 'file_path', 'file_url',
+    'status', 'chunks_processed', 'error', 'created_at', 'updated_at', 'owner', 'content_hash'
+]
+
+
+class JobStore:
+    """SQLite table of ingestion jobs, so queued and running jobs survive a restart"""
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, doc_id TEXT NOT NULL, filename TEXT NOT NULL, "
+                "file_type TEXT NOT NULL, file_size INTEGER NOT NULL, file_path TEXT NOT NULL, "
+                "file_url TEXT, status TEXT NOT NULL, chunks_processed INTEGER NOT NULL DEFAULT 0, "
+                "error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL, owner TEXT, content_hash TEXT)"
+            )
+            # Job databases created before uploads carried an owner
+            columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if 'owner' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            if 'content_hash' not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+            self._conn.commit()
+
+    def create(self, job: Dict):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO jobs ({', '.join(JOB_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in JOB_COLUMNS)})",
+                [job.get(column) for column in JOB_COLUMNS]
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields):
+        fields['updated_at'] = time.time()
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                [*fields.values(), job_id]
+            )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_unfinished(self) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobService:
+    """Runs RAGService.process_document for uploaded files on a pool of async workers
+
+    Job state is read and written on a dedicated thread rather than the bounded request
+    pools, so a saturated pool can never keep a job's status from being recorded. A job
+    that hits a saturated pool is re-queued with backoff and resumes from its checkpoint.
+    """
+    _store: Optional[JobStore] = None
+    _store_executor: Optional[ThreadPoolExecutor] = None
+    _queue: Optional[asyncio.Queue] = None
+    _workers: List[asyncio.Task] = []
+    # Pending delayed re-queues of jobs that met a saturated pool
+    _retries: Set[asyncio.Task] = set()
+    _busy_attempts: Dict[str, int] = {}
+
+    @classmethod
+    def get_store(cls) -> JobStore:
+        """Get the job store"""
+        if cls._store is None:
+            cls._store = JobStore(settings.JOBS_DB_PATH)
+        return cls._store
+
+    @classmethod
+    async def _store_call(cls, method: str, *args, **kwargs):
+        """Run a JobStore method on the job store thread"""
+        if cls._store_executor is None:
+            cls._store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-jobs")
+        func = functools.partial(getattr(cls.get_store(), method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(cls._store_executor, func)
+
+    @classmethod
+    async def start(cls):
+        """Start workers and re-queue jobs left unfinished by a previous run"""
+        if cls._workers:
+            logger.debug("Ingestion workers already started")
+            return
+
+        settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        cls._queue = asyncio.Queue()
+        cls._workers = [
+            asyncio.create_task(cls._worker(n), name=f"ingest-worker-{n}")
+            for n in range(settings.INGEST_WORKERS)
+        ]
+
+        unfinished = await cls._store_call('list_unfinished')
+        for job in unfinished:
+            cls._queue.put_nowait(job['id'])
+        if unfinished:
+            logger.info(f"Resuming {len(unfinished)} unfinished ingestion jobs")
+        logger.info(f"Started {settings.INGEST_WORKERS} ingestion workers")
+
+    @classmethod
+    async def stop(cls):
+        """Cancel workers; running jobs stay 'running' and resume on next start"""
+        for task in [*cls._workers, *cls._retries]:
+            task.cancel()
+        await asyncio.gather(*cls._workers, *cls._retries, return_exceptions=True)
+        cls._workers = []
+        cls._retries = set()
+        cls._busy_attempts = {}
+        if cls._store_executor is not None:
+            cls._store_executor.shutdown(wait=True)
+            cls._store_executor = None
+        if cls._store is not None:
+            cls._store.close()
+            cls._store = None
+
+    @classmethod
+    async def submit(
+        cls,
+        fileobj: BinaryIO,
+        filename: str,
+        file_type: str,
+        file_size: int,
+        owner: Optional[str] = None,
+        content_hash: Optional[str] = None,
+        doc_id: Optional[str] = None
+    ) -> Dict:
+        """Persist the upload to local disk and queue an ingestion job
+
+        With `doc_id` the job replaces that document of the same owner. An upload identical
+        to a processed document of the same owner is not queued: its job is created
+        'completed' with that document's ID.
+        """
+        from .rag_service import RAGService
+
+        duplicate, previous = None, None
+        if content_hash:
+            duplicate, previous = await RAGService.find_existing_document(content_hash, owner, doc_id)
+
+        job_id = str(uuid.uuid4())
+        file_path = settings.UPLOAD_DIR / f"{job_id}.{file_type}"
+        now = time.time()
+        job = {
+            'id': job_id,
+            # A replacing upload keeps the document ID
+            'doc_id': previous['doc_id'] if previous is not None else str(uuid.uuid4()),
+            'filename': filename,
+            'file_type': file_type,
+            'file_size': file_size,
+            'file_path': str(file_path),
+            'file_url': None,
+            'status': 'queued',
+            'chunks_processed': 0,
+            'error': None,
+            'created_at': now,
+            'updated_at': now,
+            'owner': owner,
+            'content_hash': content_hash
+        }
+        if duplicate is not None:
+            job.update(
+                doc_id=duplicate['doc_id'],
+                file_url=duplicate.get('file_url'),
+                status='completed',
+                chunks_processed=duplicate.get('chunks_count', 0)
+            )
+            await cls._store_call('create', job)
+            logger.info(f"Upload of {filename} is identical to document {duplicate['doc_id']}; not queued")
+            return job
+
+        def _save():
+            settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+            fileobj.seek(0)
+            with open(file_path, 'wb') as out:
+                shutil.copyfileobj(fileobj, out)
+
+        await ExecutorService.run_io(_save)
+
+        await cls._store_call('create', job)
+        if cls._queue is None:
+            await cls.start()
+        cls._queue.put_nowait(job_id)
+        logger.info(f"Queued ingestion job {job_id} for {filename}")
+        return job
+
+    @classmethod
+    def get_job(cls, job_id: str) -> Optional[Dict]:
+        """Get job state"""
+        return cls.get_store().get(job_id)
+
+    @classmethod
+    async def _worker(cls, worker_id: int):
+        while True:
+            job_id = await cls._queue.get()
+            try:
+                await cls._run_job(job_id)
+                cls._busy_attempts.pop(job_id, None)
+            except asyncio.CancelledError:
+                raise
+            except ExecutorBusyError as e:
+                await cls._retry_later(job_id, e)
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} failed: {str(e)}", exc_info=True)
+                await cls._fail(job_id, str(e))
+            finally:
+                cls._queue.task_done()
+
+    @classmethod
+    async def _retry_later(cls, job_id: str, error: ExecutorBusyError):
+        """Re-queue a job that met a saturated pool, with exponential backoff"""
+        attempt = cls._busy_attempts.get(job_id, 0)
+        cls._busy_attempts[job_id] = attempt + 1
+        delay = min(error.retry_after * 2 ** attempt, settings.INGEST_BUSY_RETRY_MAX_SECONDS)
+        logger.warning(
+            f"Ingestion job {job_id} paused, {error.pool_name} pool is saturated; retrying in {delay}s"
+        )
+        try:
+            await cls._store_call('update', job_id, status='queued')
+        except Exception as e:
+            logger.error(f"Could not re-queue ingestion job {job_id}: {str(e)}")
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            cls._queue.put_nowait(job_id)
+
+        task = asyncio.create_task(requeue())
+        cls._retries.add(task)
+        task.add_done_callback(cls._retries.discard)
+
+    @classmethod
+    async def _fail(cls, job_id: str, error: str):
+        """Mark a job failed and delete its spooled upload; never raises"""
+        cls._busy_attempts.pop(job_id, None)
+        try:
+            await cls._store_call('update', job_id, status='failed', error=error)
+            job = await cls._store_call('get', job_id)
+            if job is not None:
+                Path(job['file_path']).unlink(missing_ok=True)
+        except Exception as e:
+            logger.error(f"Could not record failure of ingestion job {job_id}: {str(e)}", exc_info=True)
+
+    @classmethod
+    async def _run_job(cls, job_id: str):
+        # Imported here to avoid a cycle: RAGService does not depend on jobs
+        from .rag_service import RAGService
+
+        job = await cls._store_call('get', job_id)
+        if job is None or job['status'] in ('completed', 'failed'):
+            return
+
+        await cls._store_call('update', job_id, status='running', error=None)
+        metadata = {
+            'filename': job['filename'],
+            'file_type': job['file_type'],
+            'file_size': job['file_size']
+        }
+        if job.get('owner'):
+            metadata['owner'] = job['owner']
+        file_path = Path(job['file_path'])
+
+        async with RAGService.document_lock(job['doc_id']):
+            with open(file_path, 'rb') as fileobj:
+                # Storage upload and document metadata are done once; resumed jobs skip them
+                if not job['file_url']:
+                    file_url = await ExecutorService.run_io(
+                        FirebaseService.upload_file, fileobj, job['filename']
+                    )
+                    await ExecutorService.run_io(
+                        FirebaseService.save_document_metadata, job['doc_id'], file_url, metadata
+                    )
+                    await cls._store_call('update', job_id, file_url=file_url)
+                    fileobj.seek(0)
+
+                async def on_progress(chunks_processed: int):
+                    await cls._store_call('update', job_id, chunks_processed=chunks_processed)
+
+                segments = DocumentLoader.iter_text(fileobj, job['file_type'])
+                result = await RAGService.process_document(
+                    segments,
+                    job['doc_id'],
+                    metadata,
+                    start_chunk=job['chunks_processed'],
+                    on_progress=on_progress
+                )
+
+            if job.get('content_hash'):
+                # Only a fully processed document is matched by later identical uploads
+                await ExecutorService.run_io(
+                    FirebaseService.update_document_metadata,
+                    job['doc_id'],
+                    {'content_hash': job['content_hash'], 'chunks_count': result['chunks_count']}
+                )
+
+        await cls._store_call('update', job_id, status='completed', chunks_processed=result['chunks_count'])
+        file_path.unlink(missing_ok=True)
+        logger.info(f"Ingestion job {job_id} completed ({result['chunks_count']} chunks)")
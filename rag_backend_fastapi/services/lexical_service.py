@@ -0,0 +1,113 @@
+"""Lexical Service - BM25 keyword search over ingested chunks"""
+import logging
+from typing import Dict, List, Optional
+
+from config import settings
+from .bm25_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+class LexicalService:
+    _index: Optional[BM25Index] = None
+    _initialized = False
+
+    @classmethod
+    def initialize(cls):
+        """Open the BM25 index when HYBRID_SEARCH_ENABLED"""
+        if cls._initialized:
+            logger.debug("BM25 index already initialized")
+            return
+
+        cls._initialized = True
+        if not settings.HYBRID_SEARCH_ENABLED:
+            return
+        try:
+            cls._index = BM25Index(
+                settings.BM25_INDEX_PATH,
+                k1=settings.BM25_K1,
+                b=settings.BM25_B,
+                merge_factor=settings.BM25_MERGE_FACTOR,
+                compact_ratio=settings.BM25_COMPACT_RATIO
+            )
+        except Exception as e:
+            logger.error(f"BM25 index initialization failed: {str(e)}", exc_info=True)
+            cls._index = None
+
+    @classmethod
+    def get_index(cls) -> Optional[BM25Index]:
+        """Get the BM25 index (None when hybrid search is disabled or unavailable)"""
+        if not cls._initialized:
+            cls.initialize()
+        return cls._index
+
+    @classmethod
+    def add_chunks(
+        cls,
+        doc_id: str,
+        chunks: List[Dict],
+        start_index: int = 0,
+        extra_metadata: Optional[Dict] = None
+    ):
+        """Index chunks under the same `{doc_id}_{index}` IDs and metadata as the vector store"""
+        index = cls.get_index()
+        if index is None or not chunks:
+            return
+
+        ids = []
+        texts = []
+        metadatas = []
+        for idx, chunk in enumerate(chunks, start=start_index):
+            ids.append(f"{doc_id}_{idx}")
+            texts.append(chunk.get('text', ''))
+            metadata = {'doc_id': doc_id, 'index': idx, **(extra_metadata or {})}
+            for key in ('page', 'page_end', 'start', 'end', 'content_hash'):
+                if key in chunk:
+                    metadata[key] = chunk[key]
+            metadatas.append(metadata)
+        index.add(ids, texts, metadatas)
+
+    @classmethod
+    def search(cls, query: str, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+        """BM25 top-k chunks as {id, text, metadata, score}"""
+        index = cls.get_index()
+        if index is None:
+            return []
+        try:
+            return index.search(query, top_k, where)
+        except Exception as e:
+            logger.error(f"BM25 search failed: {str(e)}", exc_info=True)
+            return []
+
+    @classmethod
+    def delete_document_chunks(cls, doc_id: str):
+        """Remove all chunks of a document from the BM25 index"""
+        index = cls.get_index()
+        if index is None:
+            return
+        try:
+            index.delete_document(doc_id)
+        except Exception as e:
+            logger.warning(f"Failed to delete chunks from BM25 index: {str(e)}")
+
+    @classmethod
+    def delete_chunks(cls, chunk_ids: List[str]):
+        """Remove chunks by ID from the BM25 index"""
+        index = cls.get_index()
+        if index is None or not chunk_ids:
+            return
+        index.delete_ids(chunk_ids)
+
+    @classmethod
+    def get_stats(cls) -> Optional[Dict]:
+        """Get BM25 index statistics"""
+        index = cls.get_index()
+        return index.stats() if index is not None else None
+
+    @classmethod
+    def shutdown(cls):
+        """Close the BM25 index"""
+        if cls._index is not None:
+            cls._index.close()
+            cls._index = None
+        cls._initialized = False
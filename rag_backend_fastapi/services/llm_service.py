@@ -0,0 +1,338 @@
+"""LLM Service - Shared Gemini client with concurrency limits, retries and a circuit breaker"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Dict, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from config import settings
+from .executor_service import ExecutorBusyError
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Raised when the LLM provider fails after retries"""
+
+
+class LLMUnavailableError(LLMError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM provider unavailable, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_call(self):
+        """Raise LLMUnavailableError unless a call may proceed"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            raise LLMUnavailableError(max(1, int(remaining + 0.999)))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_abort(self):
+        """Caller went away mid-call; free the half-open trial slot without judging the provider"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning(f"LLM circuit breaker opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'state': self._state(), 'consecutive_failures': self._failures}
+
+
+class GeminiBackend:
+    """Gemini client created once and reused across requests"""
+
+    def __init__(self, model_name: str, api_key: str):
+        if not api_key:
+            raise LLMError("LLM API key not configured. Please set GOOGLE_API_KEY in environment variables.")
+        if not model_name.startswith('gemini'):
+            raise LLMError("LLM model not supported. Please configure a Gemini model.")
+        genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        response = await self._model.generate_content_async(
+            prompt, request_options={'timeout': timeout}
+        )
+        return response.text
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        response = await self._model.generate_content_async(
+            prompt, stream=True, request_options={'timeout': timeout}
+        )
+        finished = False
+        try:
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk without text parts (e.g. finish reason only)
+                    continue
+                if text:
+                    yield text
+            finished = True
+        finally:
+            if not finished:
+                # The SDK exposes no public cancel; cancelling the underlying gRPC call
+                # stops Gemini from generating tokens nobody will read.
+                cancel = getattr(getattr(response, '_iterator', None), 'cancel', None)
+                if callable(cancel):
+                    cancel()
+                logger.info("LLM stream cancelled before completion")
+
+
+class FakeLLMBackend:
+    """Local stand-in for Gemini with configurable latency, for benchmarks and offline runs"""
+
+    def __init__(self, latency_ms: float = 200, token_delay_ms: float = 10):
+        self.latency = latency_ms / 1000.0
+        self.token_delay = token_delay_ms / 1000.0
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        question = prompt.rsplit("Question:", 1)[-1].split("Answer:", 1)[0].strip()
+        return f"[fake-llm] Trả lời cho câu hỏi: {question[:200]}"
+
+    async def generate(self, prompt: str, timeout: float) -> str:
+        await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def stream(self, prompt: str, timeout: float) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        for word in self._answer(prompt).split(' '):
+            await asyncio.sleep(self.token_delay)
+            yield word + ' '
+
+
+class LLMService:
+    """Entry point for LLM calls: bounded concurrency, deadlines, jittered retries, circuit breaker"""
+    _backend = None
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _breaker: Optional[CircuitBreaker] = None
+    _waiting = 0
+    _in_flight = 0
+
+    @classmethod
+    def initialize(cls):
+        """Create the LLM backend once"""
+        if cls._backend is not None:
+            logger.debug("LLM client already initialized")
+            return
+
+        if settings.LLM_BACKEND == 'fake':
+            cls._backend = FakeLLMBackend(
+                latency_ms=settings.FAKE_LLM_LATENCY_MS,
+                token_delay_ms=settings.FAKE_LLM_TOKEN_DELAY_MS
+            )
+        elif settings.LLM_BACKEND == 'gemini':
+            cls._backend = GeminiBackend(settings.LLM_MODEL, settings.GOOGLE_API_KEY)
+        else:
+            raise LLMError(f"Unsupported LLM backend: {settings.LLM_BACKEND}")
+
+        cls._breaker = CircuitBreaker(
+            settings.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            settings.LLM_CIRCUIT_RESET_SECONDS
+        )
+        logger.info(f"LLM client initialized (backend={settings.LLM_BACKEND}, model={settings.LLM_MODEL})")
+
+    @classmethod
+    def get_backend(cls):
+        """Get the shared LLM backend"""
+        if cls._backend is None:
+            cls.initialize()
+        return cls._backend
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        return cls._semaphore
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, asyncio.TimeoutError):
+            return True
+        if isinstance(error, google_exceptions.GoogleAPICallError):
+            return error.code in RETRYABLE_STATUS_CODES
+        return False
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        cap = settings.LLM_RETRY_BASE_DELAY * (2 ** attempt)
+        return random.uniform(0, cap)
+
+    @classmethod
+    async def _acquire(cls):
+        """Wait for a concurrency slot, rejecting when too many callers are already waiting"""
+        semaphore = cls._get_semaphore()
+        if semaphore.locked() and cls._waiting >= settings.LLM_QUEUE_SIZE:
+            Metrics.increment('llm.rejected')
+            raise ExecutorBusyError('llm', settings.BUSY_RETRY_AFTER_SECONDS)
+        cls._waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            cls._waiting -= 1
+        cls._in_flight += 1
+
+    @classmethod
+    def _release(cls):
+        cls._in_flight -= 1
+        cls._get_semaphore().release()
+
+    @classmethod
+    def _record_error(cls, error: Exception):
+        """Count a failed call against the circuit breaker only when the provider is at fault
+
+        Timeouts and 429/5xx responses count; per-request errors (a 400 for an oversized
+        prompt, a blocked answer) only free a half-open trial slot.
+        """
+        if cls._is_retryable(error):
+            cls._breaker.record_failure()
+        else:
+            cls._breaker.record_abort()
+
+    @classmethod
+    async def generate(cls, prompt: str) -> str:
+        """Generate a full answer"""
+        backend = cls.get_backend()
+        await cls._acquire()
+        try:
+            # The breaker judges the call once, after its retries
+            cls._breaker.before_call()
+            last_error: Optional[Exception] = None
+            try:
+                for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                    started = time.perf_counter()
+                    try:
+                        text = await asyncio.wait_for(
+                            backend.generate(prompt, settings.LLM_TIMEOUT_SECONDS),
+                            timeout=settings.LLM_TIMEOUT_SECONDS
+                        )
+                        cls._breaker.record_success()
+                        Metrics.observe('llm.generate_ms', (time.perf_counter() - started) * 1000)
+                        return text
+                    except Exception as e:
+                        last_error = e
+                        Metrics.increment('llm.errors')
+                        if not cls._is_retryable(e) or attempt == settings.LLM_MAX_RETRIES:
+                            break
+                        delay = cls._backoff_delay(attempt)
+                        logger.warning(f"LLM call failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                        Metrics.increment('llm.retries')
+                        await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cls._breaker.record_abort()
+                raise
+            cls._record_error(last_error)
+            raise LLMError(f"LLM call failed: {str(last_error) or type(last_error).__name__}") from last_error
+        finally:
+            cls._release()
+
+    @classmethod
+    async def stream(cls, prompt: str) -> AsyncIterator[str]:
+        """Stream answer text; retries only happen before the first token is sent"""
+        backend = cls.get_backend()
+        await cls._acquire()
+        try:
+            # The breaker judges the call once, after its retries
+            cls._breaker.before_call()
+            try:
+                for attempt in range(settings.LLM_MAX_RETRIES + 1):
+                    started = time.perf_counter()
+                    iterator = backend.stream(prompt, settings.LLM_TIMEOUT_SECONDS).__aiter__()
+                    emitted = False
+                    try:
+                        while True:
+                            try:
+                                text = await asyncio.wait_for(
+                                    iterator.__anext__(), timeout=settings.LLM_TIMEOUT_SECONDS
+                                )
+                            except StopAsyncIteration:
+                                break
+                            if not emitted:
+                                Metrics.observe('llm.first_token_ms', (time.perf_counter() - started) * 1000)
+                                emitted = True
+                            yield text
+                        cls._breaker.record_success()
+                        Metrics.observe('llm.stream_ms', (time.perf_counter() - started) * 1000)
+                        return
+                    except Exception as e:
+                        Metrics.increment('llm.errors')
+                        if emitted or not cls._is_retryable(e) or attempt == settings.LLM_MAX_RETRIES:
+                            cls._record_error(e)
+                            raise LLMError(f"LLM stream failed: {str(e) or type(e).__name__}") from e
+                        delay = cls._backoff_delay(attempt)
+                        logger.warning(f"LLM stream failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                        Metrics.increment('llm.retries')
+                        await asyncio.sleep(delay)
+                    finally:
+                        await iterator.aclose()
+            except (asyncio.CancelledError, GeneratorExit):
+                cls._breaker.record_abort()
+                raise
+        finally:
+            cls._release()
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Get concurrency and circuit breaker state"""
+        return {
+            'backend': settings.LLM_BACKEND,
+            'max_concurrency': settings.LLM_MAX_CONCURRENCY,
+            'in_flight': cls._in_flight,
+            'waiting': cls._waiting,
+            'circuit': cls._breaker.stats() if cls._breaker else None
+        }
@@ -0,0 +1,110 @@
+"""Metrics - Lightweight in-process histograms and counters"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+# Default bucket upper bounds for latency histograms (milliseconds)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Fixed-bucket histogram, safe to update from multiple threads"""
+
+    def __init__(self, buckets: Sequence[float]):
+        if not buckets:
+            raise ValueError("buckets cannot be empty")
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record a single observation"""
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self) -> Dict:
+        """Get a point-in-time copy of the histogram"""
+        with self._lock:
+            labels = [f"le_{bound:g}" for bound in self.buckets] + ['inf']
+            return {
+                'count': self._count,
+                'sum': round(self._sum, 3),
+                'avg': round(self._sum / self._count, 3) if self._count else 0.0,
+                'max': round(self._max, 3),
+                'buckets': dict(zip(labels, self._counts))
+            }
+
+
+class Metrics:
+    """Process-wide registry of named histograms and counters"""
+    _histograms: Dict[str, Histogram] = {}
+    _counters: Dict[str, int] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def histogram(cls, name: str, buckets: Optional[Sequence[float]] = None) -> Histogram:
+        """Get or create a histogram by name"""
+        with cls._lock:
+            if name not in cls._histograms:
+                cls._histograms[name] = Histogram(buckets or LATENCY_BUCKETS_MS)
+            return cls._histograms[name]
+
+    @classmethod
+    def observe(cls, name: str, value: float):
+        """Record a value into a latency histogram"""
+        cls.histogram(name).observe(value)
+
+    @classmethod
+    def increment(cls, name: str, amount: int = 1):
+        """Increment a named counter"""
+        with cls._lock:
+            cls._counters[name] = cls._counters.get(name, 0) + amount
+
+    @classmethod
+    def snapshot(cls) -> Dict:
+        """Get all metrics"""
+        with cls._lock:
+            histograms = dict(cls._histograms)
+            counters = dict(cls._counters)
+        return {
+            'histograms': {name: h.snapshot() for name, h in sorted(histograms.items())},
+            'counters': counters
+        }
+
+
+class StageTimer:
+    """Records per-stage wall time for one request and feeds the shared histograms"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as stage `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def record(self, name: str, elapsed_ms: float):
+        """Add an externally measured stage duration"""
+        self.timings[name] = round(self.timings.get(name, 0.0) + elapsed_ms, 2)
+        Metrics.observe(f"{self.prefix}.{name}_ms", elapsed_ms)
+
+    def finish(self) -> Dict[str, float]:
+        """Record the total time and return all stage timings"""
+        self.record('total', (time.perf_counter() - self._started) * 1000)
+        return dict(self.timings)
@@ -0,0 +1,448 @@
+"""NumPy Backend - Exact brute-force vector search over a memory-mapped matrix"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .vector_backends import FILTER_FIELDS, VectorBackend
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per matmul; keeps the float32 copy of an int8 block cache-sized
+SEARCH_BLOCK_ROWS = 8192
+# Scores buffered per query batch before a top-k selection (16 MB of float32)
+SEARCH_WINDOW_SCORES = 4 * 1024 * 1024
+INITIAL_CAPACITY = 1024
+# Compaction is not worth a rewrite below this many tombstones
+MIN_COMPACT_TOMBSTONES = 1024
+# Filtered searches gather only matching rows when they are under this share of the index;
+# above it a masked full scan of contiguous blocks is faster
+FILTER_GATHER_RATIO = 0.25
+
+
+class NumpyBackend(VectorBackend):
+    """Unit-normalized vectors in `vectors.npy` (float32, or int8 with per-row scales in
+    `scales.npy`), searched with one vectorized matmul per block.
+
+    Rows are append-only. IDs, texts and metadata live in side arrays rebuilt at startup
+    from `records.jsonl`, an append-only log of added rows and tombstones. An upsert
+    appends a new row and the older row with the same ID becomes a tombstone; tombstoned
+    rows are dropped by `compact()`. Live rows are also indexed by each FILTER_FIELDS
+    value, so filtered searches only score the matching rows.
+    """
+
+    name = 'numpy'
+
+    def __init__(self, path: Path, dimension: int, dtype: str = 'float32', compact_ratio: float = 0.2):
+        if dtype not in ('float32', 'int8'):
+            raise ValueError("dtype must be 'float32' or 'int8'")
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.dimension = dimension
+        self.dtype = dtype
+        self.compact_ratio = compact_ratio
+        self._vectors_path = path / 'vectors.npy'
+        self._scales_path = path / 'scales.npy'
+        self._log_path = path / 'records.jsonl'
+        self._compact_marker = path / 'compact.pending'
+        self._lock = threading.RLock()
+
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: List[str] = []
+        self._documents: List[str] = []
+        self._metadatas: List[Dict] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._rows_by_field: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FILTER_FIELDS}
+        # Sorted row arrays of filter values, rebuilt after the value's rows change
+        self._filter_arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        self._count = 0
+        self._tombstones = 0
+        self._load()
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+    # ========== Persistence ==========
+
+    def _swap_pairs(self):
+        return [
+            (self._vectors_path.with_suffix('.tmp.npy'), self._vectors_path),
+            (self._scales_path.with_suffix('.tmp.npy'), self._scales_path),
+            (self._log_path.with_suffix('.tmp'), self._log_path),
+        ]
+
+    def _load(self):
+        if self._compact_marker.exists():
+            # A compaction finished writing its files but crashed while swapping them in
+            for tmp_path, path in self._swap_pairs():
+                if tmp_path.exists():
+                    os.replace(tmp_path, path)
+            self._compact_marker.unlink()
+            logger.warning(f"Completed interrupted compaction of {self.path}")
+
+        if self._vectors_path.exists():
+            self._vectors = np.load(self._vectors_path, mmap_mode='r+')
+            stored_dtype = self._vectors.dtype.name
+            if stored_dtype != self.dtype:
+                logger.warning(f"Existing index at {self.path} is {stored_dtype}; ignoring NUMPY_INDEX_DTYPE={self.dtype}")
+                self.dtype = stored_dtype
+            if self._vectors.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Index dimension {self._vectors.shape[1]} does not match EMBEDDING_DIMENSION {self.dimension}"
+                )
+            if self.dtype == 'int8':
+                self._scales = np.load(self._scales_path, mmap_mode='r+')
+                if len(self._scales) < len(self._vectors):
+                    # Crash between growing the matrix and growing the scales
+                    self._count = len(self._scales)
+                    self._scales = self._grow(self._scales, self._scales_path, self._create_scales, len(self._vectors))
+                    self._count = 0
+        else:
+            self._vectors = self._create_matrix(self._vectors_path, INITIAL_CAPACITY)
+            if self.dtype == 'int8':
+                self._scales = self._create_scales(self._scales_path, INITIAL_CAPACITY)
+
+        self._alive = np.zeros(len(self._vectors), dtype=bool)
+        if self._log_path.exists():
+            self._replay_log()
+        logger.info(f"NumPy vector index loaded from {self.path}: {self._count - self._tombstones} vectors ({self.dtype})")
+
+    def _replay_log(self):
+        valid_bytes = 0
+        with open(self._log_path, 'rb') as log:
+            for line in log:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Torn write at the end of the log from a crash; drop it
+                    break
+                if 'delete' in record:
+                    self._tombstone(record['delete'])
+                elif record['row'] == self._count and record['row'] < len(self._vectors):
+                    self._append_record(record['id'], record.get('text', ''), record.get('metadata') or {})
+                else:
+                    break
+                valid_bytes += len(line)
+        if valid_bytes < self._log_path.stat().st_size:
+            logger.warning(f"Truncating {self._log_path.stat().st_size - valid_bytes} bytes of incomplete index log")
+            with open(self._log_path, 'r+b') as log:
+                log.truncate(valid_bytes)
+
+    def _create_matrix(self, path: Path, capacity: int) -> np.ndarray:
+        return np.lib.format.open_memmap(path, mode='w+', dtype=self.dtype, shape=(capacity, self.dimension))
+
+    def _create_scales(self, path: Path, capacity: int) -> np.ndarray:
+        return np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(capacity,))
+
+    def _ensure_capacity(self, extra: int):
+        needed = self._count + extra
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        new_capacity = max(capacity * 2, needed)
+        self._vectors = self._grow(self._vectors, self._vectors_path, self._create_matrix, new_capacity)
+        if self._scales is not None:
+            self._scales = self._grow(self._scales, self._scales_path, self._create_scales, new_capacity)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._count] = self._alive[:self._count]
+        self._alive = alive
+
+    def _grow(self, array: np.ndarray, path: Path, create, capacity: int) -> np.ndarray:
+        """Copy into a larger file and swap it in; readers holding the old map keep a valid view"""
+        tmp_path = path.with_suffix('.tmp.npy')
+        grown = create(tmp_path, capacity)
+        grown[:self._count] = array[:self._count]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+        return np.load(path, mmap_mode='r+')
+
+    def _write_log(self, records: List[Dict]):
+        self._log.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+        self._log.flush()
+
+    # ========== In-memory side arrays ==========
+
+    def _append_record(self, record_id: str, text: str, metadata: Dict):
+        row = self._count
+        previous = self._row_by_id.get(record_id)
+        if previous is not None:
+            self._tombstone(previous)
+        self._ids.append(record_id)
+        self._documents.append(text)
+        self._metadatas.append(metadata)
+        self._alive[row] = True
+        self._row_by_id[record_id] = row
+        for field, index in self._rows_by_field.items():
+            value = metadata.get(field)
+            if value is not None:
+                index.setdefault(value, set()).add(row)
+                self._filter_arrays.pop((field, value), None)
+        self._count += 1
+
+    def _tombstone(self, row: int):
+        if row >= self._count or not self._alive[row]:
+            return
+        self._alive[row] = False
+        self._tombstones += 1
+        record_id = self._ids[row]
+        if self._row_by_id.get(record_id) == row:
+            del self._row_by_id[record_id]
+        metadata = self._metadatas[row]
+        for field, index in self._rows_by_field.items():
+            value = metadata.get(field)
+            rows = index.get(value)
+            if rows is not None:
+                rows.discard(row)
+                self._filter_arrays.pop((field, value), None)
+                if not rows:
+                    del index[value]
+
+    # ========== VectorBackend ==========
+
+    def _encode(self, vectors: np.ndarray):
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1.0, norms)
+        if self.dtype == 'float32':
+            return vectors, None
+        peaks = np.max(np.abs(vectors), axis=1)
+        scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dim embeddings, got {vectors.shape[1]}")
+        encoded, scales = self._encode(vectors)
+
+        with self._lock:
+            self._ensure_capacity(len(ids))
+            start = self._count
+            # Vectors are written before the log, so a crash never leaves a logged row without its vector
+            self._vectors[start:start + len(ids)] = encoded
+            self._vectors.flush()
+            if scales is not None:
+                self._scales[start:start + len(ids)] = scales
+                self._scales.flush()
+            records = [
+                {'row': start + offset, 'id': record_id, 'text': text, 'metadata': metadata}
+                for offset, (record_id, text, metadata) in enumerate(zip(ids, documents, metadatas))
+            ]
+            self._write_log(records)
+            for record in records:
+                self._append_record(record['id'], record['text'], record['metadata'])
+            self._maybe_compact()
+
+    def _value_rows(self, field: str, value: str) -> np.ndarray:
+        key = (field, value)
+        rows = self._filter_arrays.get(key)
+        if rows is None:
+            matches = self._rows_by_field[field].get(value, ())
+            rows = np.fromiter(matches, dtype=np.int64, count=len(matches))
+            rows.sort()
+            self._filter_arrays[key] = rows
+        return rows
+
+    def _filter_rows(self, where: Dict[str, List[str]]) -> np.ndarray:
+        """Sorted live rows matching every field of `where`; the caller holds the lock"""
+        matches: Optional[np.ndarray] = None
+        for field, values in where.items():
+            if field not in self._rows_by_field:
+                raise ValueError(f"Cannot filter on '{field}'. Indexed fields: {FILTER_FIELDS}")
+            rows = [self._value_rows(field, value) for value in dict.fromkeys(values)]
+            rows = rows[0] if len(rows) == 1 else np.unique(np.concatenate(rows))
+            matches = rows if matches is None else np.intersect1d(matches, rows, assume_unique=True)
+            if len(matches) == 0:
+                break
+        return matches if matches is not None else np.zeros(0, dtype=np.int64)
+
+    def query_batch(self, embeddings, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[List[Dict]]:
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(queries, axis=1)
+        valid = norms > 0
+        if top_k <= 0 or not valid.any():
+            return [[] for _ in range(len(queries))]
+        queries = queries / np.where(valid, norms, 1.0)[:, None]
+
+        # Snapshot under the lock, score outside it: growth and compaction swap in new
+        # arrays and lists instead of mutating the ones captured here
+        with self._lock:
+            count = self._count
+            vectors, scales = self._vectors, self._scales
+            ids, documents, metadatas = self._ids, self._documents, self._metadatas
+            rows = self._filter_rows(where) if where else None
+            alive = self._alive[:count].copy() if rows is None else None
+        if rows is not None and len(rows) > FILTER_GATHER_RATIO * count:
+            alive = np.zeros(count, dtype=bool)
+            alive[rows] = True
+            rows = None
+        # Positions scanned: all rows (dead ones masked) or only the filtered rows
+        total = count if rows is None else len(rows)
+        matching = int(alive.sum()) if rows is None else total
+        if matching == 0:
+            return [[] for _ in range(len(queries))]
+
+        # Blocks are scored against all queries in one matmul each, into a window of at most
+        # SEARCH_WINDOW_SCORES; a running top-k per query is merged once per window
+        k = min(top_k, matching)
+        window = max(SEARCH_BLOCK_ROWS, SEARCH_WINDOW_SCORES // len(queries))
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+        for window_start in range(0, total, window):
+            window_stop = min(window_start + window, total)
+            scores = np.empty((len(queries), window_stop - window_start), dtype=np.float32)
+            for start in range(window_start, window_stop, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, window_stop)
+                selection = slice(start, stop) if rows is None else rows[start:stop]
+                block = vectors[selection]
+                if scales is None:
+                    block_scores = queries @ block.T
+                else:
+                    block_scores = (queries @ block.astype(np.float32).T) * scales[selection]
+                scores[:, start - window_start:stop - window_start] = block_scores
+            if rows is None:
+                window_rows = np.arange(window_start, window_stop)
+                scores[:, ~alive[window_start:window_stop]] = -np.inf
+            else:
+                window_rows = rows[window_start:window_stop]
+            candidates = np.broadcast_to(window_rows, scores.shape)
+            if window_stop - window_start > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+                candidates = window_rows[top]
+            merged_scores = np.concatenate([best_scores, scores], axis=1)
+            merged_rows = np.concatenate([best_rows, candidates], axis=1)
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(merged_scores, top, axis=1)
+            best_rows = np.take_along_axis(merged_rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        results = []
+        for q in range(len(queries)):
+            if not valid[q]:
+                results.append([])
+                continue
+            results.append([
+                {
+                    'id': ids[row],
+                    'text': documents[row],
+                    'metadata': metadatas[row],
+                    'distance': float(1.0 - score)
+                }
+                for row, score in zip(best_rows[q].tolist(), best_scores[q].tolist())
+                if score != -np.inf
+            ])
+        return results
+
+    def delete_document(self, doc_id: str) -> int:
+        with self._lock:
+            rows = sorted(self._rows_by_field['doc_id'].get(doc_id, ()))
+            if not rows:
+                return 0
+            self._write_log([{'delete': row} for row in rows])
+            for row in rows:
+                self._tombstone(row)
+            self._maybe_compact()
+        return len(rows)
+
+    def delete_ids(self, ids: List[str]) -> int:
+        with self._lock:
+            rows = sorted({self._row_by_id[record_id] for record_id in ids if record_id in self._row_by_id})
+            if not rows:
+                return 0
+            self._write_log([{'delete': row} for row in rows])
+            for row in rows:
+                self._tombstone(row)
+            self._maybe_compact()
+        return len(rows)
+
+    def document_metadatas(self, doc_id: str) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._rows_by_field['doc_id'].get(doc_id, ())
+            return {self._ids[row]: dict(self._metadatas[row]) for row in rows}
+
+    def count(self) -> int:
+        return self._count - self._tombstones
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'backend': self.name,
+                'dtype': self.dtype,
+                'total_chunks': self._count - self._tombstones,
+                'rows': self._count,
+                'tombstones': self._tombstones,
+                'capacity': len(self._vectors),
+                'matrix_bytes': int(self._vectors.nbytes)
+            }
+
+    # ========== Compaction ==========
+
+    def _maybe_compact(self):
+        if self._tombstones >= MIN_COMPACT_TOMBSTONES and self._tombstones > self.compact_ratio * self._count:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the matrix and log without tombstoned rows"""
+        with self._lock:
+            keep = np.flatnonzero(self._alive[:self._count])
+            capacity = max(INITIAL_CAPACITY, len(keep))
+            vectors_tmp = self._vectors_path.with_suffix('.tmp.npy')
+            vectors = self._create_matrix(vectors_tmp, capacity)
+            scales = None
+            if self._scales is not None:
+                scales_tmp = self._scales_path.with_suffix('.tmp.npy')
+                scales = self._create_scales(scales_tmp, capacity)
+            for start in range(0, len(keep), SEARCH_BLOCK_ROWS):
+                rows = keep[start:start + SEARCH_BLOCK_ROWS]
+                vectors[start:start + len(rows)] = self._vectors[rows]
+                if scales is not None:
+                    scales[start:start + len(rows)] = self._scales[rows]
+            vectors.flush()
+            del vectors
+            if scales is not None:
+                scales.flush()
+                del scales
+
+            log_tmp = self._log_path.with_suffix('.tmp')
+            with open(log_tmp, 'w', encoding='utf-8') as log:
+                for new_row, row in enumerate(keep):
+                    log.write(json.dumps({
+                        'row': new_row,
+                        'id': self._ids[row],
+                        'text': self._documents[row],
+                        'metadata': self._metadatas[row]
+                    }, ensure_ascii=False) + '\n')
+
+            # The marker makes the three swaps below roll forward after a crash
+            self._compact_marker.touch()
+            self._log.close()
+            for tmp_path, path in self._swap_pairs():
+                if tmp_path.exists():
+                    os.replace(tmp_path, path)
+            self._compact_marker.unlink()
+
+            removed = self._tombstones
+            self._vectors = self._scales = None
+            self._ids, self._documents, self._metadatas = [], [], []
+            self._row_by_id = {}
+            self._rows_by_field = {field: {} for field in FILTER_FIELDS}
+            self._filter_arrays = {}
+            self._count = self._tombstones = 0
+            self._load()
+            self._log = open(self._log_path, 'a', encoding='utf-8')
+            logger.info(f"Compacted NumPy vector index: removed {removed} tombstones, {self._count} rows left")
+
+    def close(self):
+        with self._lock:
+            self._vectors.flush()
+            if self._scales is not None:
+                self._scales.flush()
+            self._log.close()
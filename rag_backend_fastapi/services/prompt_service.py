@@ -1,13 +1,127 @@
 """Prompt Service - Generate prompts for LLM"""
 import logging
-from typing import Dict, List
+import re
+from typing import Dict, List, Optional
 
 logger = logging.getLogger(__name__)
 
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+# Chunks this close are separated only by whitespace that TextSplitter stripped
+_MAX_JOIN_GAP = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count: one per word or punctuation mark
+
+    Gemini's tokenizer is not available offline; word and punctuation counts follow it
+    closely enough for budgeting (Vietnamese syllables are mostly single tokens).
+    """
+    return len(_TOKEN_RE.findall(text))
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text after `max_tokens` estimated tokens, preferring a sentence end"""
+    cut = None
+    for count, match in enumerate(_TOKEN_RE.finditer(text), start=1):
+        if count == max_tokens:
+            cut = match.end()
+            break
+    if cut is None:
+        return text
+    sentence_end = max(text.rfind('.', 0, cut), text.rfind('!', 0, cut), text.rfind('?', 0, cut))
+    if sentence_end > cut // 2:
+        cut = sentence_end + 1
+    return text[:cut].rstrip()
+
+
+def _merge_span(passage: Dict, chunk: Dict, text: str) -> Optional[str]:
+    """Text to append to `passage` to cover `chunk`, or None if the spans are not contiguous
+
+    Offsets are exact (document[start:end] == text), so an overlap is the shared prefix
+    and a short gap is the whitespace TextSplitter strips between chunks.
+    """
+    gap = chunk['start'] - passage['end']
+    if gap > _MAX_JOIN_GAP:
+        return None
+    if gap > 0:
+        return ' ' + text
+    overlap = -gap
+    if chunk['end'] <= passage['end']:
+        return ''
+    if not passage['text'].endswith(text[:overlap]):
+        return None
+    return text[overlap:]
+
 
 class PromptService:
     """Service for building prompts for LLM"""
     
+    @staticmethod
+    def pack_context(context_chunks: List[Dict], max_tokens: int = 0) -> Dict:
+        """Merge overlapping chunks and fill the context up to `max_tokens` in relevance order
+
+        `context_chunks` are ordered by relevance. Chunks of one document whose `start`/`end`
+        offsets overlap or touch become a single passage ranked at its best chunk, and
+        repeated texts are kept once. Passages that do not fit the remaining budget are
+        skipped (the first one is truncated instead); `max_tokens` <= 0 means no budget.
+        Returns {chunks, stats} with estimated tokens before and after packing.
+        """
+        stats = {'chunks': len(context_chunks), 'duplicates': 0, 'merged': 0, 'dropped': 0, 'tokens_in': 0}
+        passages: List[Dict] = []
+        spans: Dict[str, List] = {}
+        seen_texts = set()
+        
+        for rank, chunk in enumerate(context_chunks):
+            text = (chunk.get('text') or '').strip()
+            if not text:
+                continue
+            stats['tokens_in'] += estimate_tokens(text)
+            if text in seen_texts:
+                stats['duplicates'] += 1
+                continue
+            seen_texts.add(text)
+            start, end = chunk.get('start'), chunk.get('end')
+            if chunk.get('doc_id') and start is not None and end is not None and end - start == len(text):
+                spans.setdefault(chunk['doc_id'], []).append((start, rank, chunk, text))
+            else:
+                # No usable offsets (e.g. chunks stored before offsets were kept): verbatim
+                passages.append({**chunk, 'text': text, 'rank': rank, 'ids': [chunk.get('id')]})
+        
+        # Walk each document's chunks in text order, extending the current passage while
+        # the next chunk overlaps or touches it
+        for doc_chunks in spans.values():
+            doc_chunks.sort(key=lambda item: item[0])
+            passage = None
+            for start, rank, chunk, text in doc_chunks:
+                tail = _merge_span(passage, chunk, text) if passage is not None else None
+                if tail is None:
+                    passage = {**chunk, 'text': text, 'rank': rank, 'ids': [chunk.get('id')]}
+                    passages.append(passage)
+                    continue
+                passage['text'] += tail
+                passage['end'] = max(passage['end'], chunk['end'])
+                passage['rank'] = min(passage['rank'], rank)
+                passage['ids'].append(chunk.get('id'))
+                stats['merged'] += 1
+        
+        packed = []
+        tokens_out = 0
+        for passage in sorted(passages, key=lambda item: item['rank']):
+            tokens = estimate_tokens(passage['text'])
+            if max_tokens > 0 and tokens_out + tokens > max_tokens:
+                if packed:
+                    stats['dropped'] += 1
+                    continue
+                passage['text'] = _truncate_tokens(passage['text'], max_tokens)
+                tokens = estimate_tokens(passage['text'])
+            packed.append(passage)
+            tokens_out += tokens
+        
+        stats['passages'] = len(packed)
+        stats['tokens_out'] = tokens_out
+        stats['tokens_saved'] = stats['tokens_in'] - tokens_out
+        return {'chunks': packed, 'stats': stats}
+
     @staticmethod
     def build_rag_prompt(query: str, context_chunks: List[Dict]) -> str:
         """Build RAG prompt with context"""
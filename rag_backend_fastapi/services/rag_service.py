@@ -1,148 +1,661 @@
 """RAG Service - Main RAG pipeline orchestration"""
+import asyncio
+import hashlib
+import itertools
 import logging
-from typing import Dict
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
-import google.generativeai as genai
+import numpy as np
 
 from config import settings
+from .answer_cache import AnswerCache
 from .embedding_service import EmbeddingService
+from .document_loader import TextSegment
+from .executor_service import ExecutorBusyError, ExecutorService
 from .firebase_service import FirebaseService
+from .lexical_service import LexicalService
+from .llm_service import LLMError, LLMService
+from .metrics import Metrics, StageTimer
 from .prompt_service import PromptService
+from .rerank_service import RerankService
 from .text_splitter import TextSplitter
 from .vectorstore_service import VectorstoreService
 
 logger = logging.getLogger(__name__)
 
+NO_CONTEXT_ANSWER = 'Không tìm thấy thông tin liên quan trong cơ sở dữ liệu.'
+EMPTY_LLM_ANSWER = 'Không thể tạo phản hồi. Vui lòng thử lại.'
+
+# Bucket upper bounds for the packed context size histogram (estimated tokens)
+CONTEXT_TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000)
+
+
+class DocumentNotFoundError(LookupError):
+    """An upload asked to replace a document that does not exist or belongs to another owner"""
+
+
+def _chunk_id(search_result: Dict) -> str:
+    """Firestore chunk ID of a search result; chunks ingested before IDs were shared carry it in metadata"""
+    return search_result['metadata'].get('firestore_id') or search_result['id']
+
+
+def _page_fields(chunk: Dict) -> Dict:
+    """Page numbers of a chunk, present only for paged documents (PDF)"""
+    return {key: chunk[key] for key in ('page', 'page_end') if key in chunk}
+
+
+def _offset_fields(chunk: Dict) -> Dict:
+    """Character offsets of a chunk in its document, absent for chunks stored before they were kept"""
+    return {key: chunk[key] for key in ('start', 'end') if key in chunk}
+
+
+def _content_hash(text: str) -> str:
+    """Hash identifying a chunk's text"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _is_stored(chunk: Dict, stored: Optional[Dict], filter_metadata: Dict) -> bool:
+    """Whether a chunk is already stored under its ID with the same text, position and filter fields"""
+    if stored is None:
+        return False
+    expected = {**filter_metadata, **chunk}
+    return all(
+        stored.get(key) == expected.get(key)
+        for key in ('content_hash', 'page', 'page_end', 'start', 'end', 'file_type', 'owner')
+    )
+
+
+def _reciprocal_rank_fusion(rankings: List[List[Dict]], k: int) -> List[Dict]:
+    """Merge ranked result lists by summed 1 / (k + rank); a chunk keeps its first list's payload"""
+    fused: Dict[str, Dict] = {}
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            chunk_id = _chunk_id(result)
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            fused.setdefault(chunk_id, result)
+    order = sorted(scores, key=scores.get, reverse=True)
+    return [{**fused[chunk_id], 'rrf_score': scores[chunk_id]} for chunk_id in order]
+
 
 class RAGService:
-    
-    @staticmethod
-    def process_document(file_content: str, doc_id: str, metadata: Dict):
-        """Process uploaded document: chunk, embed, store"""
+    _answer_cache: Optional[AnswerCache] = None
+    _background_tasks: Set[asyncio.Task] = set()
+    # Ingestion lock and number of holders/waiters per document ID
+    _document_locks: Dict[str, List] = {}
+
+    @classmethod
+    def get_answer_cache(cls) -> Optional[AnswerCache]:
+        """Lazy create the semantic answer cache (None when disabled)"""
+        if cls._answer_cache is None and settings.ANSWER_CACHE_ENABLED:
+            cls._answer_cache = AnswerCache(
+                dimension=settings.EMBEDDING_DIMENSION,
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                max_size=settings.ANSWER_CACHE_SIZE,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+            )
+        return cls._answer_cache
+
+    @classmethod
+    def invalidate_document(cls, doc_id: str):
+        """Drop cached answers built from a document"""
+        cache = cls.get_answer_cache()
+        if cache is not None:
+            cache.invalidate_document(doc_id)
+
+    @classmethod
+    @asynccontextmanager
+    async def document_lock(cls, doc_id: str):
+        """Serialize ingestion of one document ID (within this process)
+        
+        Held around writing a document's metadata and chunks, so two uploads replacing
+        the same document do not interleave their chunk writes and deletions.
+        """
+        entry = cls._document_locks.get(doc_id)
+        if entry is None:
+            entry = cls._document_locks[doc_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
         try:
-            logger.info(f"Processing document {doc_id}...")
-            
-            # Split text into chunks
-            splitter = TextSplitter(
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del cls._document_locks[doc_id]
+
+    @staticmethod
+    def get_splitter() -> TextSplitter:
+        """Text splitter sized in characters or, with CHUNK_SIZE_UNIT=tokens, in embedding model tokens"""
+        if settings.CHUNK_SIZE_UNIT != 'tokens':
+            return TextSplitter(
                 chunk_size=settings.CHUNK_SIZE,
                 chunk_overlap=settings.CHUNK_OVERLAP
             )
-            chunks = splitter.split_text(file_content)
+        
+        # Loads the embedding model for its tokenizer; longer chunks would be truncated
+        max_tokens = EmbeddingService.max_tokens()
+        chunk_tokens = min(settings.CHUNK_TOKENS, max_tokens) if settings.CHUNK_TOKENS > 0 else max_tokens
+        return TextSplitter(
+            chunk_size=chunk_tokens,
+            chunk_overlap=min(settings.CHUNK_TOKEN_OVERLAP, chunk_tokens - 1),
+            token_spans=EmbeddingService.token_spans
+        )
+
+    @staticmethod
+    async def process_document(
+        segments: Iterable[TextSegment],
+        doc_id: str,
+        metadata: Dict,
+        start_chunk: int = 0,
+        on_progress: Optional[Callable[[int], Awaitable[None]]] = None
+    ):
+        """Process uploaded document batch by batch: chunk, embed, store
+
+        `segments` is consumed lazily, so peak memory is bounded by INGEST_BATCH_SIZE
+        chunks rather than by the document size. The first `start_chunk` chunks are
+        split but not stored again (resuming a job), and `on_progress` is awaited with
+        the number of stored chunks after each batch.
+
+        Re-processing a document ID (a replacing upload or a resumed job) removes the
+        chunks past the end of the new version; with INGEST_DEDUP_ENABLED it only writes
+        chunks whose text or position changed.
+        """
+        try:
+            logger.info(f"Processing document {doc_id}...")
+            RAGService.invalidate_document(doc_id)
             
-            if not chunks:
-                raise ValueError("No chunks generated from document")
+            # Split text into chunks
+            splitter = await ExecutorService.run_cpu(RAGService.get_splitter)
+            chunk_iter = splitter.iter_chunks(segments)
+            chunks_count = 0
+            chunks_unchanged = 0
+            # Filterable fields copied onto every chunk in the vector store
+            filter_metadata = {key: metadata[key] for key in ('file_type', 'owner') if metadata.get(key)}
             
-            logger.info(f"Generated {len(chunks)} chunks for document {doc_id}")
+            # Chunks already stored for this document; the vector store is written last,
+            # so a chunk found there is in Firestore and the BM25 index too
+            stored = await ExecutorService.run_io(
+                VectorstoreService.get_document_chunks, doc_id, metadata.get('owner')
+            )
+            dedup = settings.INGEST_DEDUP_ENABLED
             
-            # Generate embeddings
-            chunk_texts = [chunk['text'] for chunk in chunks]
-            embeddings = EmbeddingService.generate_embeddings_batch(chunk_texts)
+            if start_chunk > 0:
+                chunks_count = await ExecutorService.run_cpu(
+                    lambda: sum(1 for _ in itertools.islice(chunk_iter, start_chunk))
+                )
+                logger.info(f"Document {doc_id}: resuming after {chunks_count} stored chunks")
             
-            # Save chunks with vectors to Firestore
-            chunks_with_vectors = [
-                {'text': chunk['text'], 'vector': embeddings[idx]}
-                for idx, chunk in enumerate(chunks)
-            ]
-            FirebaseService.save_chunks(doc_id, chunks_with_vectors)
+            while True:
+                # Pull the next batch; this drives extraction and splitting
+                chunks = await ExecutorService.run_cpu(
+                    lambda: list(itertools.islice(chunk_iter, settings.INGEST_BATCH_SIZE))
+                )
+                if not chunks:
+                    break
+                
+                changed = []
+                for idx, chunk in enumerate(chunks, start=chunks_count):
+                    chunk['content_hash'] = _content_hash(chunk['text'])
+                    if not dedup or not _is_stored(chunk, stored.get(f"{doc_id}_{idx}"), filter_metadata):
+                        changed.append((idx, chunk))
+                chunks_unchanged += len(chunks) - len(changed)
+                
+                if changed:
+                    # Generate embeddings (identical chunk text reuses its stored vector)
+                    embeddings = await ExecutorService.run_cpu(
+                        EmbeddingService.embed_chunks, [chunk['text'] for _, chunk in changed]
+                    )
+                    # Chunk IDs are positional, so changed chunks are written in runs of consecutive indexes
+                    position = 0
+                    for _, run in itertools.groupby(enumerate(changed), key=lambda item: item[1][0] - item[0]):
+                        run_chunks = [chunk for _, (_, chunk) in run]
+                        await RAGService._store_chunks(
+                            doc_id,
+                            run_chunks,
+                            embeddings[position:position + len(run_chunks)],
+                            changed[position][0],
+                            filter_metadata
+                        )
+                        position += len(run_chunks)
+                
+                chunks_count += len(chunks)
+                logger.debug(f"Document {doc_id}: {chunks_count} chunks stored")
+                if on_progress is not None:
+                    await on_progress(chunks_count)
             
-            # Get Firestore chunk IDs and prepare for ChromaDB
-            firestore_chunks = FirebaseService.get_all_chunks_for_doc(doc_id)
-            chunks_for_chroma = [
-                {
-                    'text': chunk['text'],
-                    'firestore_id': firestore_chunks[idx]['id'] if idx < len(firestore_chunks) else ''
-                }
-                for idx, chunk in enumerate(chunks)
-            ]
+            if chunks_count == 0:
+                raise ValueError("No chunks generated from document")
             
-            # Add to ChromaDB
-            VectorstoreService.add_chunks(doc_id, chunks_for_chroma, embeddings)
+            # A shorter new version leaves chunks past its end behind
+            stale_ids = [chunk_id for chunk_id, chunk in stored.items() if chunk.get('index', 0) >= chunks_count]
+            if stale_ids:
+                await ExecutorService.run_io(
+                    VectorstoreService.delete_chunks, doc_id, stale_ids, metadata.get('owner')
+                )
+                await ExecutorService.run_cpu(LexicalService.delete_chunks, stale_ids)
+                await ExecutorService.run_io(FirebaseService.delete_chunks, stale_ids)
+            if stored:
+                # Answers cached while the old chunks were still searchable
+                RAGService.invalidate_document(doc_id)
+            Metrics.increment('ingest.chunks_unchanged', chunks_unchanged)
+            Metrics.increment('ingest.chunks_deleted', len(stale_ids))
             
-            logger.info(f"Document {doc_id} processed successfully with {len(chunks)} chunks")
-            return {'doc_id': doc_id, 'chunks_count': len(chunks), 'status': 'processed'}
+            logger.info(
+                f"Document {doc_id} processed successfully with {chunks_count} chunks "
+                f"({chunks_unchanged} unchanged, {len(stale_ids)} stale removed)"
+            )
+            return {
+                'doc_id': doc_id,
+                'chunks_count': chunks_count,
+                'chunks_unchanged': chunks_unchanged,
+                'chunks_deleted': len(stale_ids),
+                'status': 'processed'
+            }
         except Exception as e:
             logger.error(f"Error processing document {doc_id}: {str(e)}", exc_info=True)
             raise
 
     @staticmethod
-    def query_rag(query: str) -> Dict:
-        """RAG query pipeline"""
+    async def _store_chunks(
+        doc_id: str,
+        chunks: List[Dict],
+        embeddings: np.ndarray,
+        start_index: int,
+        filter_metadata: Dict
+    ):
+        """Write consecutive chunks with their vectors to Firestore, the BM25 index and the vector store"""
+        # Same `{doc_id}_{index}` IDs everywhere, so no read-back is needed to link them
+        chunks_with_vectors = [
+            {
+                'text': chunk['text'],
+                'vector': embeddings[idx],
+                'content_hash': chunk['content_hash'],
+                **_page_fields(chunk),
+                **_offset_fields(chunk)
+            }
+            for idx, chunk in enumerate(chunks)
+        ]
+        await ExecutorService.run_io(
+            FirebaseService.save_chunks, doc_id, chunks_with_vectors, start_index
+        )
+        await ExecutorService.run_cpu(
+            LexicalService.add_chunks, doc_id, chunks, start_index, filter_metadata
+        )
+        await ExecutorService.run_io(
+            VectorstoreService.add_chunks, doc_id, chunks, embeddings, start_index, filter_metadata
+        )
+
+    @staticmethod
+    async def find_existing_document(
+        content_hash: str,
+        owner: Optional[str] = None,
+        doc_id: Optional[str] = None
+    ) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Documents an upload matches: (identical document, document it replaces)
+
+        An upload only replaces a document when it names it with `doc_id`; that document
+        must have the same owner (DocumentNotFoundError otherwise) and is re-processed in
+        place. With INGEST_DEDUP_ENABLED, the identical document is the owner's fully
+        processed upload with the same file hash (for a replacing upload: the replaced
+        document itself, when unchanged).
+        """
+        if doc_id is not None:
+            document = await ExecutorService.run_io(FirebaseService.get_document_metadata, doc_id)
+            if document is None or document.get('owner') != owner:
+                raise DocumentNotFoundError(f"Document '{doc_id}' not found")
+            document = {'doc_id': doc_id, **document}
+            if settings.INGEST_DEDUP_ENABLED and document.get('content_hash') == content_hash:
+                return document, document
+            return None, document
+        
+        if not settings.INGEST_DEDUP_ENABLED:
+            return None, None
+        duplicates = await ExecutorService.run_io(
+            FirebaseService.find_documents, 'content_hash', content_hash, owner
+        )
+        return (duplicates[0] if duplicates else None), None
+
+    @staticmethod
+    async def _load_context(similar_chunks: List[Dict]) -> List[Dict]:
+        """Build context chunks from search results according to RETRIEVAL_SOURCE"""
+        if settings.RETRIEVAL_SOURCE == 'firestore':
+            chunk_ids = [_chunk_id(chunk) for chunk in similar_chunks]
+            return await ExecutorService.run_io(FirebaseService.get_chunks_by_ids, chunk_ids)
+        
+        context_chunks = [
+            {
+                'id': _chunk_id(chunk),
+                'text': chunk.get('text') or '',
+                'doc_id': chunk['metadata'].get('doc_id', ''),
+                'index': chunk['metadata'].get('index', 0),
+                **_offset_fields(chunk['metadata'])
+            }
+            for chunk in similar_chunks
+            if chunk.get('text')
+        ]
+        
+        if settings.RETRIEVAL_VERIFY_FIRESTORE and context_chunks:
+            existing_ids = await ExecutorService.run_io(
+                FirebaseService.get_existing_chunk_ids,
+                [chunk['id'] for chunk in context_chunks]
+            )
+            stale_count = len(context_chunks) - len(existing_ids)
+            if stale_count > 0:
+                logger.warning(f"Dropping {stale_count} chunks missing from Firestore")
+            context_chunks = [chunk for chunk in context_chunks if chunk['id'] in existing_ids]
+        
+        return context_chunks
+
+    @staticmethod
+    def _within_distance(similar_chunks: List[Dict]) -> List[Dict]:
+        """Drop vector hits farther than RETRIEVAL_MAX_DISTANCE"""
+        max_distance = settings.RETRIEVAL_MAX_DISTANCE
+        if max_distance is None:
+            return similar_chunks
+        kept = [
+            chunk for chunk in similar_chunks
+            if chunk.get('distance') is None or chunk['distance'] <= max_distance
+        ]
+        if len(kept) < len(similar_chunks):
+            Metrics.increment('retrieval.beyond_max_distance', len(similar_chunks) - len(kept))
+        return kept
+
+    @staticmethod
+    def _above_bm25_score(lexical_chunks: List[Dict]) -> List[Dict]:
+        """Drop BM25 hits scoring below RETRIEVAL_MIN_BM25_SCORE"""
+        min_score = settings.RETRIEVAL_MIN_BM25_SCORE
+        if min_score is None:
+            return lexical_chunks
+        kept = [chunk for chunk in lexical_chunks if chunk.get('score', 0.0) >= min_score]
+        if len(kept) < len(lexical_chunks):
+            Metrics.increment('retrieval.below_min_bm25_score', len(lexical_chunks) - len(kept))
+        return kept
+
+    @staticmethod
+    async def _lexical_search(query: str, timer: StageTimer, filters: Optional[Dict[str, List[str]]]) -> List[Dict]:
+        started = time.perf_counter()
+        results = await ExecutorService.run_cpu(LexicalService.search, query, settings.HYBRID_CANDIDATES, filters)
+        timer.record('lexical', (time.perf_counter() - started) * 1000)
+        return results
+
+    @staticmethod
+    async def _retrieve(query: str, timer: StageTimer, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Embed the query, check the answer cache and load context chunks (dense + BM25 when hybrid)"""
+        # BM25 needs no embedding, so it runs while the query is embedded and searched
+        lexical_task = None
+        if LexicalService.get_index() is not None:
+            lexical_task = asyncio.ensure_future(RAGService._lexical_search(query, timer, filters))
+            lexical_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
         try:
-            logger.debug(f"Processing RAG query: {query[:100]}...")
+            with timer.stage('embed'):
+                query_embedding = await EmbeddingService.generate_embedding_async(query)
             
-            # Generate query embedding
-            query_embedding = EmbeddingService.generate_embedding(query)
+            # Serve paraphrases of answered questions from the semantic cache. Cached answers
+            # are not scoped, so filtered queries bypass it
+            answer_cache = RAGService.get_answer_cache() if not filters else None
+            with timer.stage('answer_cache'):
+                cached = answer_cache.lookup(query_embedding) if answer_cache else None
+            if cached is not None:
+                logger.info(f"Answer cache hit (similarity={cached['similarity']:.3f})")
+                return {'query_embedding': query_embedding, 'cached': cached, 'context_chunks': []}
             
-            # Search for similar chunks
-            similar_chunks = VectorstoreService.search_similar(
-                query_embedding,
-                top_k=settings.TOP_K_CHUNKS
+            # Search for similar chunks, fusing dense and BM25 rankings when hybrid. With
+            # reranking, RERANK_CANDIDATES are kept for the cross-encoder to choose from
+            candidates_k = settings.RERANK_CANDIDATES if settings.RERANK_ENABLED else settings.TOP_K_CHUNKS
+            candidates_k = max(candidates_k, settings.TOP_K_CHUNKS)
+            with timer.stage('search'):
+                similar_chunks = await ExecutorService.run_io(
+                    VectorstoreService.search_similar,
+                    query_embedding,
+                    top_k=max(settings.HYBRID_CANDIDATES, candidates_k) if lexical_task else candidates_k,
+                    where=filters
+                )
+                # The distance cutoff applies to dense hits only; BM25 hits have their own score
+                # threshold, so exact keyword matches the embedding misses are kept
+                similar_chunks = RAGService._within_distance(similar_chunks)
+                if lexical_task is not None:
+                    lexical_chunks = RAGService._above_bm25_score(await lexical_task)
+                    similar_chunks = _reciprocal_rank_fusion(
+                        [similar_chunks, lexical_chunks], settings.RRF_K
+                    )
+                similar_chunks = similar_chunks[:candidates_k]
+        finally:
+            if lexical_task is not None:
+                lexical_task.cancel()
+        
+        if settings.RERANK_ENABLED and similar_chunks:
+            with timer.stage('rerank'):
+                similar_chunks = await RerankService.rerank(query, similar_chunks, settings.TOP_K_CHUNKS)
+        
+        context_chunks = []
+        if not similar_chunks:
+            Metrics.increment('rag.no_relevant_context')
+            logger.info("No similar chunks found for query")
+        else:
+            with timer.stage('context'):
+                context_chunks = await RAGService._load_context(similar_chunks)
+            if not context_chunks:
+                logger.warning("No context chunks retrieved")
+        
+        return {'query_embedding': query_embedding, 'cached': None, 'context_chunks': context_chunks}
+
+    @staticmethod
+    async def search_batch(queries: List[str], top_k: int, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """Embed many queries in one batch and search them with one vector store call"""
+        timer = StageTimer('rag.search_batch')
+        with timer.stage('embed'):
+            query_embeddings = await ExecutorService.run_cpu(EmbeddingService.generate_embeddings_batch, queries)
+        with timer.stage('search'):
+            batches = await ExecutorService.run_io(
+                VectorstoreService.search_similar_batch,
+                query_embeddings,
+                top_k=top_k,
+                where=filters
             )
+        
+        results = []
+        for query, similar_chunks in zip(queries, batches):
+            results.append({
+                'query': query,
+                'hits': [
+                    {
+                        'chunk_id': _chunk_id(chunk),
+                        'doc_id': chunk['metadata'].get('doc_id', ''),
+                        'index': chunk['metadata'].get('index', 0),
+                        'text': chunk.get('text') or '',
+                        'distance': chunk.get('distance'),
+                        **_page_fields(chunk['metadata'])
+                    }
+                    for chunk in similar_chunks
+                ]
+            })
+        
+        timings = timer.finish()
+        logger.info(f"Batch search for {len(queries)} queries in {timings['total']:.1f}ms")
+        return {'results': results, 'timings': timings}
+
+    @staticmethod
+    def _build_prompt(query: str, context_chunks: List[Dict]) -> Tuple[str, Optional[Dict]]:
+        """Pack the context (CONTEXT_PACKING_ENABLED) and build the prompt; returns it with packing stats"""
+        if not settings.CONTEXT_PACKING_ENABLED:
+            return PromptService.build_rag_prompt(query, context_chunks), None
+        
+        packed = PromptService.pack_context(context_chunks, settings.CONTEXT_MAX_TOKENS)
+        stats = packed['stats']
+        Metrics.histogram('prompt.context_tokens', CONTEXT_TOKEN_BUCKETS).observe(stats['tokens_out'])
+        Metrics.increment('prompt.tokens_saved', stats['tokens_saved'])
+        logger.debug(f"Packed {stats['chunks']} chunks into {stats['passages']} passages ({stats['tokens_saved']} tokens saved)")
+        return PromptService.build_rag_prompt(query, packed['chunks']), stats
+
+    @staticmethod
+    def _remember_answer(query: str, query_embedding: List[float], answer: str, context_chunks: List[Dict]):
+        """Store a fresh LLM answer in the semantic cache"""
+        answer_cache = RAGService.get_answer_cache()
+        if answer_cache is None:
+            return
+        answer_cache.store(
+            query,
+            query_embedding,
+            answer,
+            doc_ids=[chunk['doc_id'] for chunk in context_chunks if chunk.get('doc_id')],
+            chunk_ids=[chunk['id'] for chunk in context_chunks],
+            chunks_count=len(context_chunks)
+        )
+
+    @staticmethod
+    async def query_rag(query: str, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
+        """RAG query pipeline"""
+        try:
+            logger.debug(f"Processing RAG query: {query[:100]}...")
+            timer = StageTimer('rag.query')
+            retrieval = await RAGService._retrieve(query, timer, filters)
             
-            if not similar_chunks:
-                logger.info("No similar chunks found for query")
+            cached = retrieval['cached']
+            if cached is not None:
+                with timer.stage('history'):
+                    await ExecutorService.run_io(
+                        FirebaseService.save_chat_history, query, cached['answer'], {'cached': True}
+                    )
                 return {
-                    'answer': 'Không tìm thấy thông tin liên quan trong cơ sở dữ liệu.',
-                    'context_used': False,
-                    'chunks_count': 0
+                    'answer': cached['answer'],
+                    'context_used': True,
+                    'chunks_count': cached['chunks_count'],
+                    'cached': True,
+                    'timings': timer.finish()
                 }
             
-            # Get chunks from Firestore
-            firestore_ids = [
-                chunk['metadata'].get('firestore_id')
-                for chunk in similar_chunks
-                if chunk['metadata'].get('firestore_id')
-            ]
-            
-            context_chunks = FirebaseService.get_chunks_by_ids(firestore_ids)
-            
+            context_chunks = retrieval['context_chunks']
             if not context_chunks:
-                logger.warning("No context chunks retrieved from Firestore")
                 return {
-                    'answer': 'Không tìm thấy thông tin liên quan trong cơ sở dữ liệu.',
+                    'answer': NO_CONTEXT_ANSWER,
                     'context_used': False,
-                    'chunks_count': 0
+                    'chunks_count': 0,
+                    'timings': timer.finish()
                 }
             
             # Build prompt and call LLM
-            prompt = PromptService.build_rag_prompt(query, context_chunks)
-            answer = RAGService._call_llm(prompt)
+            with timer.stage('prompt'):
+                prompt, context_stats = RAGService._build_prompt(query, context_chunks)
+            with timer.stage('llm'):
+                answer = await LLMService.generate(prompt)
+            
+            if answer and answer.strip():
+                if not filters:
+                    RAGService._remember_answer(query, retrieval['query_embedding'], answer, context_chunks)
+            else:
+                logger.warning("Empty response from LLM")
+                answer = EMPTY_LLM_ANSWER
             
             # Save chat history
-            FirebaseService.save_chat_history(query, answer)
+            with timer.stage('history'):
+                await ExecutorService.run_io(FirebaseService.save_chat_history, query, answer)
             
-            logger.info(f"RAG query processed successfully with {len(context_chunks)} context chunks")
+            timings = timer.finish()
+            logger.info(
+                f"RAG query processed successfully with {len(context_chunks)} context chunks "
+                f"(timings ms: {timings})"
+            )
             return {
                 'answer': answer,
                 'context_used': True,
-                'chunks_count': len(context_chunks)
+                'chunks_count': len(context_chunks),
+                'cached': False,
+                'context': context_stats,
+                'timings': timings
             }
         except Exception as e:
             logger.error(f"Error in RAG query: {str(e)}", exc_info=True)
             raise
 
     @staticmethod
-    def _call_llm(prompt: str) -> str:
-        """Call LLM (Gemini)"""
+    async def stream_rag(query: str, filters: Optional[Dict[str, List[str]]] = None) -> AsyncIterator[Dict]:
+        """RAG query pipeline that yields a meta event, answer tokens and a done event"""
+        timer = StageTimer('rag.stream')
+        retrieval = await RAGService._retrieve(query, timer, filters)
+        cached = retrieval['cached']
+        context_chunks = retrieval['context_chunks']
+        
+        yield {
+            'type': 'meta',
+            'context_used': cached is not None or bool(context_chunks),
+            'chunks_count': cached['chunks_count'] if cached else len(context_chunks),
+            'cached': cached is not None,
+            'sources': [
+                {'doc_id': chunk['doc_id'], 'chunk_id': chunk['id']}
+                for chunk in context_chunks
+            ]
+        }
+        
+        if cached is not None:
+            yield {'type': 'token', 'text': cached['answer']}
+            RAGService._save_history_later(query, cached['answer'], {'cached': True})
+            yield {'type': 'done', 'timings': timer.finish()}
+            return
+        
+        if not context_chunks:
+            yield {'type': 'token', 'text': NO_CONTEXT_ANSWER}
+            yield {'type': 'done', 'timings': timer.finish()}
+            return
+        
+        with timer.stage('prompt'):
+            prompt, context_stats = RAGService._build_prompt(query, context_chunks)
+        parts = []
+        llm_started = time.perf_counter()
         try:
-            if not settings.GOOGLE_API_KEY:
-                logger.error("GOOGLE_API_KEY not configured")
-                return "LLM API key not configured. Please set GOOGLE_API_KEY in environment variables."
-            
-            if settings.LLM_MODEL.startswith('gemini'):
-                genai.configure(api_key=settings.GOOGLE_API_KEY)
-                model = genai.GenerativeModel(settings.LLM_MODEL)
-                response = model.generate_content(prompt)
-                
-                if not response.text:
-                    logger.warning("Empty response from LLM")
-                    return "Không thể tạo phản hồi. Vui lòng thử lại."
-                
-                return response.text
-            else:
-                logger.warning(f"Unsupported LLM model: {settings.LLM_MODEL}")
-                return "LLM model not supported. Please configure a Gemini model."
-        except Exception as e:
-            logger.error(f"Error calling LLM: {str(e)}", exc_info=True)
-            return f"Lỗi khi gọi LLM: {str(e)}"
+            async for text in LLMService.stream(prompt):
+                if 'first_token' not in timer.timings:
+                    timer.record('first_token', (time.perf_counter() - llm_started) * 1000)
+                parts.append(text)
+                yield {'type': 'token', 'text': text}
+        except ExecutorBusyError:
+            raise
+        except LLMError as e:
+            logger.error(f"Error streaming from LLM: {str(e)}")
+            yield {'type': 'error', 'message': f"Lỗi khi gọi LLM: {str(e)}"}
+            return
+        timer.record('llm', (time.perf_counter() - llm_started) * 1000)
+        
+        answer = "".join(parts)
+        if answer.strip():
+            if not filters:
+                RAGService._remember_answer(query, retrieval['query_embedding'], answer, context_chunks)
+        else:
+            logger.warning("Empty response from LLM")
+            answer = EMPTY_LLM_ANSWER
+            yield {'type': 'token', 'text': answer}
+        RAGService._save_history_later(query, answer)
+        
+        yield {'type': 'done', 'context': context_stats, 'timings': timer.finish()}
 
+    @classmethod
+    def _save_history_later(cls, question: str, answer: str, metadata: Dict = None):
+        """Save chat history in the background without delaying the response"""
+        async def _save():
+            try:
+                await ExecutorService.run_io(FirebaseService.save_chat_history, question, answer, metadata)
+            except Exception as e:
+                logger.error(f"Failed to save chat history: {str(e)}", exc_info=True)
+        
+        task = asyncio.create_task(_save())
+        cls._background_tasks.add(task)
+        task.add_done_callback(cls._background_tasks.discard)
+
+    @staticmethod
+    async def delete_document(doc_id: str) -> bool:
+        """Delete a document from Firestore, ChromaDB and Storage"""
+        metadata = await ExecutorService.run_io(FirebaseService.get_document_metadata, doc_id)
+        if metadata is None:
+            return False
+        
+        await ExecutorService.run_io(VectorstoreService.delete_document_chunks, doc_id, metadata.get('owner'))
+        await ExecutorService.run_io(LexicalService.delete_document_chunks, doc_id)
+        await ExecutorService.run_io(FirebaseService.delete_document, doc_id)
+        if metadata.get('file_url'):
+            await ExecutorService.run_io(FirebaseService.delete_file, metadata['file_url'])
+        RAGService.invalidate_document(doc_id)
+        
+        logger.info(f"Document {doc_id} deleted")
+        return True
@@ -0,0 +1,156 @@
+"""Rerank Service - Cross-encoder rescoring of retrieved chunks under a latency budget"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import settings
+from .executor_service import BoundedExecutor, ExecutorBusyError, ExecutorService
+from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RerankService:
+    """Scores (query, chunk) pairs with a local cross-encoder and keeps the best chunks
+
+    Reranking never fails a request: when the model is still loading, every rerank
+    worker is busy, scoring errors or RERANK_BUDGET_MS runs out, the incoming (vector or
+    fused) order is kept. Scoring runs on its own RERANK_WORKERS threads with no queue:
+    a scoring call that outlives its budget keeps running there, so timed-out reranks
+    cannot pile up on the CPU pool used by embedding and chunking.
+    """
+    _model = None
+    _executor: Optional[BoundedExecutor] = None
+    _model_lock = threading.Lock()
+    _loading: Optional[asyncio.Future] = None
+    _load_failed = False
+
+    @classmethod
+    def get_model(cls):
+        """Lazy load the cross-encoder (blocking)"""
+        if cls._model is None:
+            with cls._model_lock:
+                if cls._model is None:
+                    try:
+                        # Imported here so servers without reranking (e.g. on the ONNX embedding
+                        # backend) do not need PyTorch installed
+                        from sentence_transformers import CrossEncoder
+
+                        logger.info(f"Loading rerank model: {settings.RERANK_MODEL}")
+                        cls._model = CrossEncoder(settings.RERANK_MODEL, max_length=settings.RERANK_MAX_LENGTH)
+                        logger.info("Rerank model loaded successfully")
+                    except Exception as e:
+                        cls._load_failed = True
+                        logger.error(f"Failed to load rerank model: {str(e)}", exc_info=True)
+                        raise Exception(f"Failed to load rerank model: {str(e)}")
+        return cls._model
+
+    @classmethod
+    def _load_in_background(cls):
+        """Start loading the model on the CPU pool once, without waiting for it"""
+        if cls._loading is not None or cls._load_failed:
+            return
+
+        def _done(future: asyncio.Future):
+            cls._loading = None
+            if not future.cancelled() and future.exception() is not None:
+                logger.warning(f"Rerank model not loaded: {str(future.exception())}")
+
+        cls._loading = asyncio.ensure_future(ExecutorService.run_cpu(cls.get_model))
+        cls._loading.add_done_callback(_done)
+
+    @classmethod
+    def _get_executor(cls) -> BoundedExecutor:
+        if cls._executor is None:
+            cls._executor = BoundedExecutor('rerank', settings.RERANK_WORKERS, 0)
+        return cls._executor
+
+    @classmethod
+    def score(cls, query: str, texts: List[str]) -> List[float]:
+        """Relevance scores of texts for a query, in one forward pass"""
+        model = cls.get_model()
+        started = time.perf_counter()
+        scores = model.predict(
+            [(query, text) for text in texts],
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        Metrics.observe('rerank.score_ms', (time.perf_counter() - started) * 1000)
+        return [float(value) for value in scores]
+
+    @classmethod
+    def warm_up(cls):
+        """Load the model and run one forward pass (not recorded in the score metrics)"""
+        cls.get_model().predict(
+            [("warm-up query", "warm-up passage")],
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+
+    @classmethod
+    async def rerank(cls, query: str, candidates: List[Dict], top_k: int) -> List[Dict]:
+        """Best `top_k` candidates by cross-encoder score (tagged `rerank_score`)
+
+        Candidates scoring below RERANK_MIN_SCORE are dropped, so the result may be
+        empty when nothing is relevant. On fallback the first `top_k` candidates are
+        returned unchanged.
+        """
+        scored = [candidate for candidate in candidates if candidate.get('text')]
+        if not scored or (len(scored) == 1 and settings.RERANK_MIN_SCORE is None):
+            return candidates[:top_k]
+
+        if cls._model is None:
+            # Never block a request on the model download/load
+            cls._load_in_background()
+            Metrics.increment('rerank.fallback_cold')
+            return candidates[:top_k]
+
+        try:
+            scores = await asyncio.wait_for(
+                cls._get_executor().run(cls.score, query, [candidate['text'] for candidate in scored]),
+                timeout=settings.RERANK_BUDGET_MS / 1000
+            )
+        except asyncio.TimeoutError:
+            Metrics.increment('rerank.fallback_timeout')
+            logger.warning(f"Rerank exceeded {settings.RERANK_BUDGET_MS:g}ms budget, keeping retrieval order")
+            return candidates[:top_k]
+        except ExecutorBusyError:
+            Metrics.increment('rerank.fallback_busy')
+            return candidates[:top_k]
+        except Exception as e:
+            Metrics.increment('rerank.fallback_error')
+            logger.error(f"Rerank failed, keeping retrieval order: {str(e)}", exc_info=True)
+            return candidates[:top_k]
+
+        ranked = sorted(
+            ({**candidate, 'rerank_score': value} for candidate, value in zip(scored, scores)),
+            key=lambda candidate: candidate['rerank_score'],
+            reverse=True
+        )
+        if settings.RERANK_MIN_SCORE is not None:
+            kept = [candidate for candidate in ranked if candidate['rerank_score'] >= settings.RERANK_MIN_SCORE]
+            Metrics.increment('rerank.below_min_score', len(ranked) - len(kept))
+            ranked = kept
+        Metrics.increment('rerank.reranked')
+        return ranked[:top_k]
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Get rerank model state"""
+        return {
+            'enabled': settings.RERANK_ENABLED,
+            'model': settings.RERANK_MODEL,
+            'loaded': cls._model is not None,
+            'load_failed': cls._load_failed,
+            'executor': cls._executor.stats() if cls._executor is not None else None
+        }
+
+    @classmethod
+    def shutdown(cls):
+        """Shut down the rerank worker threads"""
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False)
+            cls._executor = None
@@ -0,0 +1,138 @@
+"""Startup Service - Timed startup phases, model warm-up and readiness"""
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from config import settings
+from .embedding_service import EmbeddingService
+from .executor_service import ExecutorService
+from .metrics import StageTimer
+from .rerank_service import RerankService
+from .vectorstore_service import VectorstoreService
+
+logger = logging.getLogger(__name__)
+
+
+class StartupService:
+    """Times startup phases, warms up the models and tracks readiness
+
+    The server is live (GET /health) once the lifespan startup has run. It is ready
+    (GET /ready) only after the warm-up has loaded and run the models, so a load balancer
+    keeps traffic away from a cold instance. A failed warm-up is retried with backoff; when
+    the retries run out the server is no longer live either, so the orchestrator restarts it.
+    Phase durations are logged, kept in the `startup.<phase>_ms` metrics and reported by status().
+    """
+    _timer: Optional[StageTimer] = None
+    _state = 'starting'  # starting -> warming_up -> ready | failed, stopping on shutdown
+    _error: Optional[str] = None
+    _task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def _get_timer(cls) -> StageTimer:
+        if cls._timer is None:
+            cls._timer = StageTimer('startup')
+        return cls._timer
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str):
+        """Time the enclosed startup step as phase `name`"""
+        with cls._get_timer().stage(name):
+            yield
+
+    @classmethod
+    def _summary(cls) -> str:
+        return ', '.join(f"{name}={ms:.0f}ms" for name, ms in cls._get_timer().timings.items())
+
+    @classmethod
+    def started(cls):
+        """End of the lifespan startup: warm up in the background, or be ready right away"""
+        timer = cls._get_timer()
+        timer.record('live', sum(timer.timings.values()))
+        logger.info(f"Startup phases: {cls._summary()}")
+        if not settings.STARTUP_WARMUP_ENABLED:
+            cls._mark_ready()
+            return
+        cls._state = 'warming_up'
+        cls._task = asyncio.create_task(cls.warm_up())
+
+    @classmethod
+    async def warm_up(cls):
+        """Warm up, retrying failures with backoff, then mark the server ready (or failed)"""
+        attempt = 0
+        while True:
+            try:
+                await cls._warm_up_once()
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                cls._error = str(e)
+                if attempt >= settings.STARTUP_WARMUP_RETRIES:
+                    cls._state = 'failed'
+                    logger.error(f"Warm-up failed, server is not live: {str(e)}", exc_info=True)
+                    return
+                delay = settings.STARTUP_WARMUP_RETRY_SECONDS * 2 ** attempt
+                attempt += 1
+                logger.warning(
+                    f"Warm-up failed ({str(e)}), retry {attempt}/{settings.STARTUP_WARMUP_RETRIES} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+        cls._error = None
+        cls._mark_ready()
+
+    @classmethod
+    async def _warm_up_once(cls):
+        """Load and run the models and search the vector index once"""
+        with cls.phase('embedding_model'):
+            await ExecutorService.run_cpu(EmbeddingService.get_model)
+        with cls.phase('embedding_encode'):
+            embedding = await ExecutorService.run_cpu(EmbeddingService.warm_up)
+        if settings.EMBEDDING_PROCESSES > 0:
+            with cls.phase('embedding_processes'):
+                await ExecutorService.run_cpu(EmbeddingService.warm_up_processes)
+        # The first query loads the shared collection's index into memory
+        with cls.phase('vector_search'):
+            await ExecutorService.run_io(VectorstoreService.warm_up, embedding)
+        if settings.RERANK_ENABLED:
+            with cls.phase('rerank_model'):
+                try:
+                    await ExecutorService.run_cpu(RerankService.warm_up)
+                except Exception as e:
+                    logger.warning(f"Rerank model unavailable, keeping retrieval order: {str(e)}")
+
+    @classmethod
+    def _mark_ready(cls):
+        cls._get_timer().finish()
+        cls._state = 'ready'
+        logger.info(f"Server ready: {cls._summary()}")
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._state == 'ready'
+
+    @classmethod
+    def is_live(cls) -> bool:
+        """False once the warm-up has failed for good"""
+        return cls._state != 'failed'
+
+    @classmethod
+    def status(cls) -> Dict:
+        """Readiness state and phase durations in milliseconds"""
+        status = {'state': cls._state, 'phases_ms': dict(cls._get_timer().timings)}
+        if cls._error is not None:
+            status['error'] = cls._error
+        return status
+
+    @classmethod
+    async def shutdown(cls):
+        """Stop reporting ready and cancel an unfinished warm-up"""
+        cls._state = 'stopping'
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
@@ -1,15 +1,103 @@
 """Text Splitter - Chunk text into smaller pieces"""
+import bisect
 import logging
 import re
-from typing import Dict, List
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Places a chunk may end, by preference: after a paragraph break, a line break or a
+# sentence end. One regex pass finds all three; the group that matched gives the kind
+_BOUNDARY_RE = re.compile(r'(\n[^\S\n]*\n)|(\n)|([.!?…]+["\'”’)\]]*(?=\s))')
+_NON_SPACE_RE = re.compile(r'\S')
+_SPACE_RE = re.compile(r'\s')
+# Boundaries this close to the end of the buffered text may still change with the next segment
+_LOOKAHEAD = 8
+# Small segments (e.g. DOCX paragraphs) are gathered up to this many characters before scanning
+_READ_SIZE = 16384
+
+# Maps a text to the (start, end) character span of each model token in it
+TokenSpans = Callable[[str], Sequence[Tuple[int, int]]]
+
+
+class _Window:
+    """Buffered tail of a document stream with its boundaries and token spans
+
+    All positions are offsets into the document (the concatenated segments).
+    """
+
+    def __init__(self, token_spans: Optional[TokenSpans]):
+        self.text = ''
+        self.offset = 0  # document position of text[0]
+        self.bounds: Tuple[List[int], ...] = ([], [], [])  # paragraph, line, sentence
+        self.scanned = 0  # boundaries before this position are final
+        self.token_spans = token_spans
+        self.token_starts: List[int] = []
+        self.token_ends: List[int] = []
+        self.tokenized = 0  # tokens before this position are final
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.text)
+
+    def append(self, text: str, final: bool):
+        self.text += text
+        self._scan(final)
+        if self.token_spans is not None:
+            self._tokenize(final)
+
+    def _scan(self, final: bool):
+        pos = self.scanned - self.offset
+        safe_end = len(self.text) if final else len(self.text) - _LOOKAHEAD
+        for match in _BOUNDARY_RE.finditer(self.text, pos):
+            if match.end() > safe_end:
+                pos = match.start()
+                break
+            self.bounds[match.lastindex - 1].append(self.offset + match.end())
+            pos = match.end()
+        else:
+            pos = max(pos, safe_end)
+        self.scanned = self.offset + pos
+
+    def _tokenize(self, final: bool):
+        start = self.tokenized - self.offset
+        stop = len(self.text)
+        if not final:
+            # Only tokenize whole words; the last one may continue in the next segment
+            stop = max(self.text.rfind(' ', start), self.text.rfind('\n', start))
+        if stop <= start:
+            return
+        base = self.offset + start
+        for token_start, token_end in self.token_spans(self.text[start:stop]):
+            self.token_starts.append(base + token_start)
+            self.token_ends.append(base + token_end)
+        self.tokenized = base + stop - start
+
+    def trim(self, position: int):
+        """Forget text, boundaries and tokens before `position`"""
+        cut = position - self.offset
+        if cut <= 0:
+            return
+        self.text = self.text[cut:]
+        self.offset = position
+        for bounds in self.bounds:
+            del bounds[:bisect.bisect_right(bounds, position)]
+        first_token = bisect.bisect_left(self.token_starts, position)
+        del self.token_starts[:first_token]
+        del self.token_ends[:first_token]
+
 
 class TextSplitter:
-    """Service for splitting text into chunks with overlap"""
-    
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """Service for splitting text into chunks with overlap
+
+    Chunks end at the last paragraph break, line break, sentence end or (failing those)
+    space that keeps them within `chunk_size`, and carry `start`/`end` offsets into the
+    original text (text == document[start:end]). With `token_spans` (e.g.
+    EmbeddingService.token_spans) sizes are counted in model tokens instead of characters,
+    so no chunk is cut off by the embedding model's window.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, token_spans: Optional[TokenSpans] = None):
         if chunk_size <= 0:
             raise ValueError("chunk_size must be greater than 0")
         if chunk_overlap < 0:
@@ -19,6 +107,10 @@ class TextSplitter:
         
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.token_spans = token_spans
+        # Boundaries closer than this to the chunk start are ignored, so a chunk is never
+        # cut to a sliver and the next chunk always starts after this one does
+        self.min_size = max(chunk_size // 2, chunk_overlap + 1)
 
     def split_text(self, text: str) -> List[Dict]:
         """Split text into chunks with overlap"""
@@ -26,37 +118,128 @@ class TextSplitter:
             logger.warning("Empty text provided to split_text")
             return []
         
-        # Normalize whitespace
-        text = re.sub(r'\s+', ' ', text).strip()
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = min(start + self.chunk_size, text_length)
-            
-            # Try to break at sentence boundaries
-            if end < text_length:
-                sentence_end = max(
-                    text.rfind('.', start, end),
-                    text.rfind('!', start, end),
-                    text.rfind('?', start, end),
-                    text.rfind('\n', start, end)
-                )
-                if sentence_end > start:
-                    end = sentence_end + 1
-            
-            chunk_text = text[start:end].strip()
-            if chunk_text:
-                chunks.append({
-                    'text': chunk_text,
-                    'start': start,
-                    'end': end
-                })
-            
-            # Move start position with overlap
-            start = max(start + 1, end - self.chunk_overlap)
-        
+        chunks = list(self.iter_chunks([text]))
         logger.debug(f"Split text into {len(chunks)} chunks")
         return chunks
 
+    def iter_chunks(self, segments: Iterable[Union[str, Tuple[str, Optional[int]]]]) -> Iterator[Dict]:
+        """Split a stream of consecutive text segments, keeping only a window of text in memory
+
+        Segments may be `(text, page)` pairs; chunks then get the `page` and `page_end`
+        they start and end on. Offsets count from the start of the first segment.
+        """
+        window = _Window(self.token_spans)
+        start = 0  # document position where the next chunk starts
+        length = 0  # document length read so far
+        pending: List[str] = []
+        pending_length = 0
+        # Document positions where each page begins, for pages still inside the window
+        page_starts: List[int] = []
+        page_numbers: List[int] = []
+        
+        def with_pages(chunk: Dict) -> Dict:
+            if page_starts:
+                first = bisect.bisect_right(page_starts, chunk['start']) - 1
+                last = bisect.bisect_right(page_starts, chunk['end'] - 1) - 1
+                chunk['page'] = page_numbers[max(first, 0)]
+                chunk['page_end'] = page_numbers[max(last, 0)]
+            return chunk
+        
+        for segment in segments:
+            page = None
+            if isinstance(segment, tuple):
+                segment, page = segment
+            if not segment:
+                continue
+            if page is not None and (not page_numbers or page_numbers[-1] != page):
+                page_starts.append(length)
+                page_numbers.append(page)
+            length += len(segment)
+            pending.append(segment)
+            pending_length += len(segment)
+            if pending_length < _READ_SIZE:
+                continue
+        
+            window.append(''.join(pending), final=False)
+            pending = []
+            pending_length = 0
+            while True:
+                chunk, next_start = self._next_chunk(window, start, final=False)
+                if next_start is None:
+                    break
+                start = next_start
+                if chunk:
+                    yield with_pages(chunk)
+        
+            window.trim(start)
+            # Forget pages that end before the window starts
+            while len(page_starts) > 1 and page_starts[1] <= start:
+                del page_starts[0]
+                del page_numbers[0]
+        
+        window.append(''.join(pending), final=True)
+        while start < window.end:
+            chunk, next_start = self._next_chunk(window, start, final=True)
+            if next_start is None:
+                break
+            start = next_start
+            if chunk:
+                yield with_pages(chunk)
+
+    def _next_chunk(self, window: _Window, start: int, final: bool) -> Tuple[Optional[Dict], Optional[int]]:
+        """Cut one chunk at or after `start`; returns the chunk and the next start position
+
+        The next start is None when more text must be read first (or, at the end of the
+        document, when only whitespace is left).
+        """
+        text = window.text
+        offset = window.offset
+        first = _NON_SPACE_RE.search(text, start - offset)
+        if first is None:
+            return None, None
+        chunk_start = offset + first.start()
+        
+        # Furthest allowed end and the closest useful end, in document positions
+        if self.token_spans is None:
+            limit = chunk_start + self.chunk_size
+            min_end = chunk_start + self.min_size
+        else:
+            first_token = bisect.bisect_left(window.token_starts, chunk_start)
+            tokens_left = len(window.token_ends) - first_token
+            limit = window.token_ends[first_token + self.chunk_size - 1] if tokens_left >= self.chunk_size else None
+            min_end = window.token_ends[first_token + self.min_size - 1] if tokens_left >= self.min_size else None
+        
+        if limit is None or limit >= window.end or limit > window.scanned:
+            if not final:
+                return None, None
+            # The rest of the document fits in this last chunk
+            chunk_text = text[chunk_start - offset:].rstrip()
+            return {'text': chunk_text, 'start': chunk_start, 'end': chunk_start + len(chunk_text)}, window.end
+        
+        cut = None
+        for bounds in window.bounds:
+            idx = bisect.bisect_right(bounds, limit) - 1
+            if idx >= 0 and bounds[idx] >= min_end:
+                cut = bounds[idx]
+                break
+        if cut is None:
+            # No sentence in range: end at the last space, or hard at the limit
+            space = max(text.rfind(' ', min_end - offset, limit - offset), text.rfind('\n', min_end - offset, limit - offset))
+            cut = offset + space if space >= 0 else limit
+        
+        chunk_text = text[chunk_start - offset:cut - offset].rstrip()
+        chunk = {'text': chunk_text, 'start': chunk_start, 'end': chunk_start + len(chunk_text)}
+        if self.chunk_overlap == 0:
+            return chunk, cut
+        
+        # Start the overlap at the first word beginning `chunk_overlap` before the cut
+        if self.token_spans is None:
+            target = cut - self.chunk_overlap
+        else:
+            cut_token = bisect.bisect_right(window.token_ends, cut)
+            target = window.token_starts[max(cut_token - self.chunk_overlap, first_token + 1)]
+        if not text[target - offset - 1].isspace():
+            space = _SPACE_RE.search(text, target - offset, cut - offset)
+            target = offset + space.end() if space else target
+        next_start = target
+        return chunk, max(next_start, chunk_start + 1)
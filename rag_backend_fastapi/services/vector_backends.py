@@ -0,0 +1,202 @@
+"""Vector Backends - Storage/search engines behind VectorstoreService"""
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields that searches can be scoped by
+FILTER_FIELDS = ('doc_id', 'file_type', 'owner')
+# Collection used when neither tenants nor shards are configured
+DEFAULT_COLLECTION = "rag_chunks"
+
+try:
+    import chromadb
+    from chromadb.config import Settings
+    CHROMADB_AVAILABLE = True
+except ImportError:
+    CHROMADB_AVAILABLE = False
+
+
+class VectorBackend:
+    """Interface of a vector store: upsert records, cosine top-k search, delete by document
+
+    Search results are dicts {id, text, metadata, distance} ordered by ascending
+    cosine distance (1 - cosine similarity). `where` restricts a search to records whose
+    metadata matches every given field, e.g. {'owner': ['alice'], 'doc_id': ['d1', 'd2']}
+    (one of the listed values per field); backends apply it before ranking, so the top-k
+    are the nearest matching records.
+    """
+
+    name = 'base'
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        raise NotImplementedError
+
+    def query(self, embedding, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+        return self.query_batch([embedding], top_k, where)[0]
+
+    def query_batch(self, embeddings, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[List[Dict]]:
+        """Search several query embeddings at once, returning one result list per query"""
+        raise NotImplementedError
+
+    def delete_document(self, doc_id: str) -> int:
+        """Delete all records of a document, returning how many were removed"""
+        raise NotImplementedError
+
+    def delete_ids(self, ids: List[str]) -> int:
+        """Delete records by ID (unknown IDs are ignored), returning how many were removed"""
+        raise NotImplementedError
+
+    def document_metadatas(self, doc_id: str) -> Dict[str, Dict]:
+        """Metadata of every record of a document, by record ID"""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {'backend': self.name, 'total_chunks': self.count()}
+
+    def close(self):
+        pass
+
+
+def _float_lists(embeddings) -> List[List[float]]:
+    """Embeddings (lists or float32 arrays) as plain float lists, which Chroma validates"""
+    return np.asarray(embeddings, dtype=np.float32).tolist()
+
+
+class ChromaBackend(VectorBackend):
+    """ChromaDB persistent collection with an HNSW cosine index"""
+
+    name = 'chroma'
+
+    def __init__(self, path, collection_name: str = DEFAULT_COLLECTION):
+        self._client = chroma_client(path)
+        self._collection = self._client.get_or_create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+    def upsert(self, ids: List[str], embeddings, documents: List[str], metadatas: List[Dict]):
+        # Upsert: re-ingesting a batch (e.g. a resumed job) replaces the same IDs
+        self._collection.upsert(
+            ids=ids,
+            embeddings=_float_lists(embeddings),
+            documents=documents,
+            metadatas=metadatas
+        )
+
+    @staticmethod
+    def _where_clause(where: Optional[Dict[str, List[str]]]) -> Optional[Dict]:
+        """Translate a filter into a Chroma `where` clause"""
+        if not where:
+            return None
+        conditions = [
+            {field: values[0] if len(values) == 1 else {'$in': list(values)}}
+            for field, values in where.items()
+        ]
+        return conditions[0] if len(conditions) == 1 else {'$and': conditions}
+
+    def query_batch(self, embeddings, top_k: int, where: Optional[Dict[str, List[str]]] = None) -> List[List[Dict]]:
+        # One request for all queries; Chroma searches the HNSW index once per embedding
+        results = self._collection.query(
+            query_embeddings=_float_lists(embeddings),
+            n_results=top_k,
+            where=self._where_clause(where)
+        )
+        batches = []
+        for q, ids in enumerate(results.get('ids') or []):
+            similar_chunks = []
+            for i in range(len(ids)):
+                similar_chunks.append({
+                    'id': ids[i],
+                    'text': results['documents'][q][i] if results.get('documents') else '',
+                    'metadata': results['metadatas'][q][i] if results.get('metadatas') else {},
+                    'distance': results['distances'][q][i] if results.get('distances') else None
+                })
+            batches.append(similar_chunks)
+        return batches
+
+    def delete_document(self, doc_id: str) -> int:
+        results = self._collection.get(where={'doc_id': doc_id}, include=[])
+        if results['ids']:
+            self._collection.delete(ids=results['ids'])
+        return len(results['ids'])
+
+    def delete_ids(self, ids: List[str]) -> int:
+        existing = self._collection.get(ids=list(ids), include=[])['ids']
+        if existing:
+            self._collection.delete(ids=existing)
+        return len(existing)
+
+    def document_metadatas(self, doc_id: str) -> Dict[str, Dict]:
+        results = self._collection.get(where={'doc_id': doc_id}, include=['metadatas'])
+        return dict(zip(results['ids'], results['metadatas']))
+
+    def count(self) -> int:
+        return self._collection.count()
+
+
+def chroma_client(path):
+    """Persistent Chroma client; clients for the same path share one underlying system"""
+    path.mkdir(parents=True, exist_ok=True)
+    client_settings = Settings(anonymized_telemetry=False)
+    if settings.CHROMA_MEMORY_LIMIT_BYTES > 0:
+        client_settings = Settings(
+            anonymized_telemetry=False,
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=settings.CHROMA_MEMORY_LIMIT_BYTES
+        )
+    return chromadb.PersistentClient(path=str(path), settings=client_settings)
+
+
+def numpy_collection_path(collection: str):
+    """Directory of a NumPy collection; the default one stays at NUMPY_INDEX_PATH itself"""
+    if collection == DEFAULT_COLLECTION:
+        return settings.NUMPY_INDEX_PATH
+    return settings.NUMPY_INDEX_PATH / 'collections' / collection
+
+
+def create_backend(name: Optional[str] = None, collection: str = DEFAULT_COLLECTION) -> Optional[VectorBackend]:
+    """Create the backend selected by VECTOR_BACKEND (None if it cannot be used here)"""
+    name = name or settings.VECTOR_BACKEND
+    if name == 'chroma':
+        if not CHROMADB_AVAILABLE:
+            logger.warning("ChromaDB not installed. Vector search will be disabled.")
+            return None
+        return ChromaBackend(settings.CHROMA_DB_PATH, collection)
+    if name == 'numpy':
+        from .numpy_backend import NumpyBackend
+        return NumpyBackend(
+            numpy_collection_path(collection),
+            dimension=settings.EMBEDDING_DIMENSION,
+            dtype=settings.NUMPY_INDEX_DTYPE,
+            compact_ratio=settings.NUMPY_INDEX_COMPACT_RATIO
+        )
+    raise ValueError(f"Unsupported vector backend: {name}")
+
+
+def list_collections(name: Optional[str] = None) -> List[str]:
+    """Names of the collections that exist on disk for a backend"""
+    name = name or settings.VECTOR_BACKEND
+    if name == 'chroma':
+        if not CHROMADB_AVAILABLE:
+            return []
+        collections = chroma_client(settings.CHROMA_DB_PATH).list_collections()
+        return [getattr(collection, 'name', collection) for collection in collections]
+    if name == 'numpy':
+        names = []
+        if (settings.NUMPY_INDEX_PATH / 'vectors.npy').exists():
+            names.append(DEFAULT_COLLECTION)
+        collections_dir = settings.NUMPY_INDEX_PATH / 'collections'
+        if collections_dir.is_dir():
+            names.extend(sorted(
+                path.name for path in collections_dir.iterdir() if (path / 'vectors.npy').exists()
+            ))
+        return names
+    raise ValueError(f"Unsupported vector backend: {name}")
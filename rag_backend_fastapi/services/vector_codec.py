@@ -0,0 +1,52 @@
+"""Vector Codec - Compact encodings for embedding vectors stored in Firestore"""
+from typing import Dict, Optional
+
+import numpy as np
+
+# "list" keeps the original array-of-doubles format; "none" stores no vector
+# (ChromaDB keeps its own copy)
+ENCODINGS = ('list', 'none', 'float32', 'float16', 'int8')
+
+
+def encode_vector(vector, encoding: str) -> Dict:
+    """Return the Firestore fields that store `vector` in the given encoding"""
+    if encoding == 'none':
+        return {}
+    values = np.asarray(vector, dtype=np.float32)
+    if encoding == 'list':
+        return {'vector': values.tolist()}
+    if encoding == 'float32':
+        return {'vector': values.astype('<f4').tobytes(), 'vector_encoding': 'float32'}
+    if encoding == 'float16':
+        return {'vector': values.astype('<f2').tobytes(), 'vector_encoding': 'float16'}
+    if encoding == 'int8':
+        # Symmetric scalar quantization: value ≈ code * scale
+        peak = float(np.max(np.abs(values))) if values.size else 0.0
+        scale = peak / 127.0 if peak > 0 else 1.0
+        codes = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return {'vector': codes.tobytes(), 'vector_encoding': 'int8', 'vector_scale': scale}
+    raise ValueError(f"Unsupported vector encoding: {encoding}")
+
+
+def decode_vector(data: Dict) -> Optional[np.ndarray]:
+    """Decode the vector of a Firestore chunk document as float32, whatever its encoding"""
+    raw = data.get('vector')
+    if raw is None:
+        return None
+    encoding = data.get('vector_encoding', 'list')
+    if encoding == 'list':
+        return np.asarray(raw, dtype=np.float32)
+    if encoding == 'float32':
+        return np.frombuffer(raw, dtype='<f4').astype(np.float32)
+    if encoding == 'float16':
+        return np.frombuffer(raw, dtype='<f2').astype(np.float32)
+    if encoding == 'int8':
+        return np.frombuffer(raw, dtype=np.int8).astype(np.float32) * np.float32(data['vector_scale'])
+    raise ValueError(f"Unsupported vector encoding: {encoding}")
+
+
+def vector_encoding_of(data: Dict) -> str:
+    """Encoding a chunk document is currently stored in"""
+    if data.get('vector') is None:
+        return 'none'
+    return data.get('vector_encoding', 'list')
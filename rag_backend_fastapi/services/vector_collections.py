@@ -0,0 +1,152 @@
+"""Vector Collections - Tenant/shard routing and an LRU pool of open collection handles"""
+import hashlib
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .vector_backends import DEFAULT_COLLECTION, VectorBackend, create_backend, list_collections
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(doc_id: str, shards: int) -> int:
+    """Shard holding a document's chunks (stable across processes and restarts)"""
+    if shards <= 1:
+        return 0
+    return zlib.crc32(doc_id.encode('utf-8')) % shards
+
+
+def collection_name(tenant: Optional[str], shard: int = 0, shards: int = 1) -> str:
+    """Collection of a tenant shard; without tenant and shards this is DEFAULT_COLLECTION
+
+    Tenant names are slugged and suffixed with a hash, keeping names within Chroma's
+    3-63 character [a-zA-Z0-9._-] rule while staying unique per tenant.
+    """
+    name = DEFAULT_COLLECTION
+    if tenant:
+        slug = re.sub(r'[^a-zA-Z0-9_-]+', '-', tenant).strip('-_')[:24]
+        digest = hashlib.sha1(tenant.encode('utf-8')).hexdigest()[:8]
+        name = f"{DEFAULT_COLLECTION}_t_{slug}_{digest}" if slug else f"{DEFAULT_COLLECTION}_t_{digest}"
+    if shards > 1:
+        name = f"{name}_s{shard}"
+    return name
+
+
+class CollectionPool:
+    """Lazily opened collection handles, closing the least recently used beyond `max_open`
+
+    Handles are checked out with `acquire()`; a handle in use is never closed, so the
+    pool may briefly exceed `max_open` while every open handle is busy.
+    """
+
+    def __init__(self, backend_name: Optional[str] = None, max_open: int = 32):
+        self.backend_name = backend_name
+        self.max_open = max(1, max_open)
+        self._handles: "OrderedDict[str, VectorBackend]" = OrderedDict()
+        self._in_use: Dict[str, int] = {}
+        self._open_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._known: Optional[set] = None
+        self.hits = 0
+        self.opens = 0
+        self.evictions = 0
+
+    def names(self) -> List[str]:
+        """Collections that exist, on disk or opened by this pool"""
+        with self._lock:
+            if self._known is None:
+                self._known = set(list_collections(self.backend_name))
+            return sorted(self._known | set(self._handles))
+
+    def _checkout(self, name: str) -> Optional[VectorBackend]:
+        # Caller holds self._lock
+        backend = self._handles.get(name)
+        if backend is not None:
+            self._handles.move_to_end(name)
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+            self.hits += 1
+        return backend
+
+    def _open(self, name: str, create: bool) -> Optional[VectorBackend]:
+        with self._lock:
+            backend = self._checkout(name)
+            if backend is not None:
+                return backend
+            open_lock = self._open_locks.setdefault(name, threading.Lock())
+
+        evicted: List[Tuple[str, VectorBackend]] = []
+        with open_lock:
+            with self._lock:
+                # Another thread may have opened it while we waited
+                backend = self._checkout(name)
+                if backend is not None:
+                    return backend
+            if not create and name not in self.names():
+                return None
+            backend = create_backend(self.backend_name, name)
+            if backend is None:
+                return None
+            with self._lock:
+                self._handles[name] = backend
+                self._in_use[name] = 1
+                if self._known is not None:
+                    self._known.add(name)
+                self.opens += 1
+                for candidate in list(self._handles):
+                    if len(self._handles) <= self.max_open:
+                        break
+                    if self._in_use.get(candidate, 0) == 0:
+                        evicted.append((candidate, self._handles.pop(candidate)))
+                        self._in_use.pop(candidate, None)
+                        self.evictions += 1
+
+        for evicted_name, evicted_backend in evicted:
+            with self._open_locks.setdefault(evicted_name, threading.Lock()):
+                evicted_backend.close()
+            logger.debug(f"Closed least recently used vector collection {evicted_name}")
+        return backend
+
+    def _release(self, name: str):
+        with self._lock:
+            remaining = self._in_use.get(name, 0) - 1
+            if remaining > 0:
+                self._in_use[name] = remaining
+            else:
+                self._in_use.pop(name, None)
+
+    @contextmanager
+    def acquire(self, name: str, create: bool = True) -> Iterator[Optional[VectorBackend]]:
+        """Check out a collection handle (None if it does not exist and `create` is False)"""
+        backend = self._open(name, create)
+        try:
+            yield backend
+        finally:
+            if backend is not None:
+                self._release(name)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            open_chunks = 0
+            for backend in self._handles.values():
+                open_chunks += backend.count()
+            return {
+                'open_collections': len(self._handles),
+                'max_open_collections': self.max_open,
+                'open_chunks': open_chunks,
+                'hits': self.hits,
+                'opens': self.opens,
+                'evictions': self.evictions
+            }
+
+    def close(self):
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+            self._in_use.clear()
+            self._known = None
+        for backend in handles:
+            backend.close()
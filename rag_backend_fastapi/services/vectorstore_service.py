@@ -1,69 +1,138 @@
-"""Vectorstore Service - ChromaDB operations for ANN search"""
+"""Vectorstore Service - Vector storage and similarity search over a pluggable backend"""
 import logging
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from config import settings
+from .vector_backends import CHROMADB_AVAILABLE
+from .vector_collections import CollectionPool, collection_name, shard_of
 
 logger = logging.getLogger(__name__)
 
-try:
-    import chromadb
-    from chromadb.config import Settings
-    CHROMADB_AVAILABLE = True
-except ImportError:
-    CHROMADB_AVAILABLE = False
-    logger.warning("ChromaDB not installed. Vector search will be disabled.")
+WhereFilter = Dict[str, List[str]]
 
 
 class VectorstoreService:
-    _client = None
-    _collection = None
+    _pool: Optional[CollectionPool] = None
+    _fanout_executor: Optional[ThreadPoolExecutor] = None
+    _initialized = False
 
     @classmethod
     def initialize(cls):
-        """Initialize ChromaDB client and collection"""
-        if not CHROMADB_AVAILABLE:
-            logger.warning("ChromaDB not available. Skipping initialization.")
+        """Initialize the collection pool of the backend selected by VECTOR_BACKEND"""
+        if cls._initialized:
+            logger.debug("Vector store already initialized")
             return
         
-        if cls._client is not None:
-            logger.debug("ChromaDB already initialized")
+        cls._initialized = True
+        if settings.VECTOR_BACKEND == 'chroma' and not CHROMADB_AVAILABLE:
+            logger.warning("ChromaDB not installed. Vector search will be disabled.")
             return
-        
         try:
-            settings.CHROMA_DB_PATH.mkdir(parents=True, exist_ok=True)
-            cls._client = chromadb.PersistentClient(
-                path=str(settings.CHROMA_DB_PATH),
-                settings=Settings(anonymized_telemetry=False)
-            )
-            cls._collection = cls._client.get_or_create_collection(
-                name="rag_chunks",
-                metadata={"hnsw:space": "cosine"}
+            pool = CollectionPool(settings.VECTOR_BACKEND, settings.VECTOR_MAX_OPEN_COLLECTIONS)
+            # Open the shared collection up front so a broken store fails at startup
+            with pool.acquire(collection_name(None, 0, settings.VECTOR_SHARDS)):
+                pass
+            cls._pool = pool
+            if settings.VECTOR_SHARDS > 1 or settings.VECTOR_TENANT_ISOLATION:
+                cls._fanout_executor = ThreadPoolExecutor(
+                    max_workers=settings.VECTOR_FANOUT_WORKERS,
+                    thread_name_prefix="vector-fanout"
+                )
+            logger.info(
+                f"Vector store initialized successfully (backend={settings.VECTOR_BACKEND}, "
+                f"shards={settings.VECTOR_SHARDS}, tenant_isolation={settings.VECTOR_TENANT_ISOLATION})"
             )
-            logger.info("ChromaDB initialized successfully")
         except Exception as e:
-            logger.error(f"ChromaDB initialization failed: {str(e)}", exc_info=True)
-            cls._client = None
-            cls._collection = None
+            logger.error(f"Vector store initialization failed: {str(e)}", exc_info=True)
+            cls._pool = None
 
     @classmethod
-    def get_collection(cls):
-        """Get ChromaDB collection"""
-        if not CHROMADB_AVAILABLE:
-            return None
-        if cls._collection is None:
+    def get_pool(cls) -> Optional[CollectionPool]:
+        """Get the collection pool (None when the vector store is unavailable)"""
+        if not cls._initialized:
             cls.initialize()
-        return cls._collection
+        return cls._pool
+
+    @staticmethod
+    def _collection_for(doc_id: str, owner: Optional[str]) -> str:
+        """Collection that stores a document's chunks"""
+        tenant = owner if settings.VECTOR_TENANT_ISOLATION else None
+        return collection_name(tenant, shard_of(doc_id, settings.VECTOR_SHARDS), settings.VECTOR_SHARDS)
 
     @classmethod
-    def add_chunks(cls, doc_id: str, chunks: List[Dict], embeddings: List[List[float]]):
-        """Add chunks with embeddings to ChromaDB"""
-        collection = cls.get_collection()
-        if collection is None:
-            logger.warning("ChromaDB not available. Skipping vector storage.")
+    def _collections_for_query(cls, where: Optional[WhereFilter]) -> Tuple[List[str], Optional[WhereFilter]]:
+        """Collections a search must visit, and the filter left to apply inside them"""
+        shards = settings.VECTOR_SHARDS
+        shard_ids = range(shards)
+        if where and where.get('doc_id'):
+            # Documents live in a single shard each
+            shard_ids = sorted({shard_of(doc_id, shards) for doc_id in where['doc_id']})
+        
+        shared = [collection_name(None, shard, shards) for shard in shard_ids]
+        if not settings.VECTOR_TENANT_ISOLATION:
+            return shared, where
+        
+        if where and where.get('owner'):
+            # Each owner has its own collections, so the owner filter is implied
+            residual = {field: values for field, values in where.items() if field != 'owner'} or None
+            names = [collection_name(owner, shard, shards) for owner in where['owner'] for shard in shard_ids]
+            return names, residual
+        
+        # With tenant isolation a search without an owner only sees chunks without one,
+        # never other tenants' collections
+        return shared, where
+
+    @classmethod
+    def _search_collection(cls, pool: CollectionPool, name: str, query_embeddings, top_k: int, where: Optional[WhereFilter]):
+        with pool.acquire(name, create=False) as backend:
+            if backend is None:
+                return [[] for _ in query_embeddings]
+            return backend.query_batch(query_embeddings, top_k, where)
+
+    @classmethod
+    def _search(cls, query_embeddings, top_k: int, where: Optional[WhereFilter]) -> List[List[Dict]]:
+        """Search every routed collection, in parallel when there are several, and merge top-k by distance"""
+        pool = cls.get_pool()
+        names, residual = cls._collections_for_query(where)
+        if len(names) == 1 or cls._fanout_executor is None:
+            partials = [cls._search_collection(pool, name, query_embeddings, top_k, residual) for name in names]
+        else:
+            futures = [
+                cls._fanout_executor.submit(cls._search_collection, pool, name, query_embeddings, top_k, residual)
+                for name in names
+            ]
+            partials = [future.result() for future in futures]
+        
+        if len(partials) == 1:
+            return partials[0]
+        merged = []
+        for q in range(len(query_embeddings)):
+            hits = [hit for partial in partials for hit in partial[q]]
+            hits.sort(key=lambda hit: hit['distance'] if hit['distance'] is not None else float('inf'))
+            merged.append(hits[:top_k])
+        return merged
+
+    @classmethod
+    def add_chunks(
+        cls,
+        doc_id: str,
+        chunks: List[Dict],
+        embeddings: List[List[float]],
+        start_index: int = 0,
+        extra_metadata: Optional[Dict] = None
+    ):
+        """Add chunks with embeddings to the vector store
+
+        `extra_metadata` (e.g. owner, file_type) is stored on every chunk so searches can be
+        filtered by it; with VECTOR_TENANT_ISOLATION its owner also selects the collection.
+        """
+        pool = cls.get_pool()
+        if pool is None:
+            logger.warning("Vector store not available. Skipping vector storage.")
             return
         
-        if not chunks or not embeddings:
+        if not chunks or len(embeddings) == 0:
             logger.warning("Empty chunks or embeddings provided")
             return
         
@@ -74,85 +143,161 @@ class VectorstoreService:
         documents = []
         metadatas = []
         
-        for idx, chunk in enumerate(chunks):
+        for idx, chunk in enumerate(chunks, start=start_index):
             chunk_id = f"{doc_id}_{idx}"
             ids.append(chunk_id)
             documents.append(chunk.get('text', ''))
-            metadatas.append({
+            metadata = {
                 'doc_id': doc_id,
                 'index': idx,
-                'firestore_id': chunk.get('firestore_id', '')
-            })
+                **(extra_metadata or {})
+            }
+            # ChromaDB metadata values cannot be None, so position fields are only set when
+            # known (pages for PDFs, character offsets for chunks from TextSplitter)
+            for key in ('page', 'page_end', 'start', 'end', 'content_hash'):
+                if key in chunk:
+                    metadata[key] = chunk[key]
+            metadatas.append(metadata)
         
+        name = cls._collection_for(doc_id, (extra_metadata or {}).get('owner'))
         try:
-            collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
-            )
-            logger.info(f"Added {len(chunks)} chunks to ChromaDB for document {doc_id}")
+            with pool.acquire(name) as backend:
+                backend.upsert(ids, embeddings, documents, metadatas)
+            logger.info(f"Added {len(chunks)} chunks to vector store collection {name} for document {doc_id}")
         except Exception as e:
-            logger.error(f"Failed to add chunks to ChromaDB: {str(e)}", exc_info=True)
+            logger.error(f"Failed to add chunks to vector store: {str(e)}", exc_info=True)
             raise
 
     @classmethod
-    def search_similar(cls, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
-        """Search for similar chunks using ANN"""
-        collection = cls.get_collection()
-        if collection is None:
-            logger.warning("ChromaDB not available. Returning empty results.")
+    def search_similar(
+        cls,
+        query_embedding: List[float],
+        top_k: int = 5,
+        where: Optional[Dict[str, List[str]]] = None
+    ) -> List[Dict]:
+        """Search for the chunks closest to the query embedding, optionally within a metadata filter"""
+        if cls.get_pool() is None:
+            logger.warning("Vector store not available. Returning empty results.")
             return []
         
-        if not query_embedding:
+        if query_embedding is None or len(query_embedding) == 0:
             logger.warning("Empty query embedding provided")
             return []
         
         try:
-            results = collection.query(
-                query_embeddings=[query_embedding],
-                n_results=top_k
-            )
-            
-            similar_chunks = []
-            if results.get('ids') and len(results['ids'][0]) > 0:
-                for i in range(len(results['ids'][0])):
-                    similar_chunks.append({
-                        'id': results['ids'][0][i],
-                        'text': results['documents'][0][i] if results.get('documents') else '',
-                        'metadata': results['metadatas'][0][i] if results.get('metadatas') else {},
-                        'distance': results['distances'][0][i] if results.get('distances') else None
-                    })
-            
+            similar_chunks = cls._search([query_embedding], top_k, where)[0]
             logger.debug(f"Found {len(similar_chunks)} similar chunks")
             return similar_chunks
         except Exception as e:
-            logger.error(f"ChromaDB search failed: {str(e)}", exc_info=True)
+            logger.error(f"Vector search failed: {str(e)}", exc_info=True)
             return []
 
     @classmethod
-    def delete_document_chunks(cls, doc_id: str):
-        """Delete all chunks for a document from ChromaDB"""
-        collection = cls.get_collection()
-        if collection is None:
+    def warm_up(cls, query_embedding: List[float]):
+        """Search the shared collection once, raising on errors instead of returning no hits"""
+        pool = cls.get_pool()
+        if pool is None:
+            if settings.VECTOR_BACKEND == 'chroma' and not CHROMADB_AVAILABLE:
+                # Vector search is disabled, not broken
+                return
+            raise RuntimeError("Vector store failed to initialize")
+        cls._search([query_embedding], 1, None)
+
+    @classmethod
+    def search_similar_batch(
+        cls,
+        query_embeddings: List[List[float]],
+        top_k: int = 5,
+        where: Optional[Dict[str, List[str]]] = None
+    ) -> List[List[Dict]]:
+        """Search for the chunks closest to each query embedding in one call per collection"""
+        if cls.get_pool() is None:
+            logger.warning("Vector store not available. Returning empty results.")
+            return [[] for _ in query_embeddings]
+        
+        if len(query_embeddings) == 0:
+            return []
+        
+        try:
+            results = cls._search(query_embeddings, top_k, where)
+            logger.debug(f"Batch search for {len(query_embeddings)} queries returned {sum(map(len, results))} chunks")
+            return results
+        except Exception as e:
+            logger.error(f"Batch vector search failed: {str(e)}", exc_info=True)
+            return [[] for _ in query_embeddings]
+
+    @classmethod
+    def delete_document_chunks(cls, doc_id: str, owner: Optional[str] = None):
+        """Delete all chunks for a document from the vector store"""
+        pool = cls.get_pool()
+        if pool is None:
             return
         
         try:
-            results = collection.get(where={'doc_id': doc_id})
-            if results['ids']:
-                collection.delete(ids=results['ids'])
+            with pool.acquire(cls._collection_for(doc_id, owner), create=False) as backend:
+                if backend is not None:
+                    backend.delete_document(doc_id)
         except Exception as e:
-            print(f"⚠️ Warning: Failed to delete chunks from ChromaDB: {str(e)}")
+            logger.warning(f"Failed to delete chunks from vector store: {str(e)}")
+
+    @classmethod
+    def delete_chunks(cls, doc_id: str, chunk_ids: List[str], owner: Optional[str] = None) -> int:
+        """Delete some chunks of a document (e.g. the tail left over by a shorter re-upload)"""
+        pool = cls.get_pool()
+        if pool is None or not chunk_ids:
+            return 0
+        
+        with pool.acquire(cls._collection_for(doc_id, owner), create=False) as backend:
+            if backend is None:
+                return 0
+            return backend.delete_ids(chunk_ids)
+
+    @classmethod
+    def get_document_chunks(cls, doc_id: str, owner: Optional[str] = None) -> Dict[str, Dict]:
+        """Metadata of the chunks stored for a document, by chunk ID"""
+        pool = cls.get_pool()
+        if pool is None:
+            return {}
+        
+        with pool.acquire(cls._collection_for(doc_id, owner), create=False) as backend:
+            if backend is None:
+                return {}
+            return backend.document_metadatas(doc_id)
 
     @classmethod
     def get_collection_stats(cls) -> Dict:
-        """Get collection statistics"""
-        collection = cls.get_collection()
-        if collection is None:
+        """Get collection statistics
+
+        `total_chunks` counts the collections currently open, which is every collection
+        unless there are more than VECTOR_MAX_OPEN_COLLECTIONS.
+        """
+        pool = cls.get_pool()
+        if pool is None:
             return {'total_chunks': 0, 'status': 'not_available'}
         try:
-            count = collection.count()
-            return {'total_chunks': count}
+            stats = {
+                'backend': settings.VECTOR_BACKEND,
+                'shards': settings.VECTOR_SHARDS,
+                'tenant_isolation': settings.VECTOR_TENANT_ISOLATION,
+                'collections': len(pool.names()),
+                **pool.stats()
+            }
+            stats['total_chunks'] = stats.pop('open_chunks')
+            if stats['collections'] == 1:
+                with pool.acquire(pool.names()[0], create=False) as backend:
+                    if backend is not None:
+                        stats.update(backend.stats())
+            return stats
         except Exception as e:
             return {'total_chunks': 0, 'error': str(e)}
 
+    @classmethod
+    def shutdown(cls):
+        """Flush and close every open collection"""
+        if cls._fanout_executor is not None:
+            cls._fanout_executor.shutdown(wait=True)
+            cls._fanout_executor = None
+        if cls._pool is not None:
+            cls._pool.close()
+            cls._pool = None
+        cls._initialized = False